@@ -0,0 +1,209 @@
+import math
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import orjson
+from jose import JWTError, jwt
+
+from config import Config
+
+
+class TokenBuckets:
+    """
+    Per-client token buckets: `burst` tokens each, refilled at `rate` per second.
+
+    Only touched from the event loop, so no locking. At most `max_clients`
+    buckets are kept; the least recently seen client is forgotten first,
+    which simply hands it a full bucket if it comes back.
+    """
+
+    def __init__(self, rate: float, burst: int, max_clients: int = Config.RATE_LIMIT_MAX_CLIENTS):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.max_clients = max_clients
+        self._buckets: "OrderedDict[str, List[float]]" = OrderedDict()
+
+    def take(self, key: str, now: float) -> float:
+        """
+        Take one token for `key`; returns 0 if granted, else seconds until one is available.
+        """
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= self.max_clients:
+                self._buckets.popitem(last=False)
+            bucket = self._buckets[key] = [float(self.burst), now]
+        else:
+            self._buckets.move_to_end(key)
+        tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+        bucket[1] = now
+        if tokens >= 1:
+            bucket[0] = tokens - 1
+            return 0.0
+        bucket[0] = tokens
+        return (1 - tokens) / self.rate
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class RouteClass:
+    """
+    One class of routes sharing a per-client rate limit and a per-worker concurrency cap.
+    """
+
+    def __init__(self, name: str, rate: float, burst: int, concurrency: int):
+        self.name = name
+        self.buckets = TokenBuckets(rate, burst) if rate > 0 else None
+        self.concurrency = concurrency
+        self.in_flight = 0
+        self.admitted = 0
+        self.rate_limited = 0
+        self.shed = 0
+
+
+class AdmissionController:
+    """
+    Decides, from the method and path alone, whether a request may proceed.
+
+    Requests fall into three classes: "auth" (login and sign-up, which run
+    bcrypt), "write" (every other mutation under /urls and /users) and "read"
+    (GETs, redirects included). Health, metrics and docs are never limited.
+    A client over its class's token bucket gets 429; a class already at its
+    concurrency cap in this worker sheds the request with 503. Both carry
+    Retry-After and happen before any database or hashing work.
+    """
+
+    def __init__(
+        self,
+        prefix: str = Config.URL_PREFIX,
+        trust_forwarded_for: bool = Config.RATE_LIMIT_TRUST_FORWARDED_FOR,
+    ):
+        self.prefix = prefix
+        self.trust_forwarded_for = trust_forwarded_for
+        self.classes: Dict[str, RouteClass] = {
+            "auth": RouteClass(
+                "auth", Config.RATE_LIMIT_AUTH_RATE, Config.RATE_LIMIT_AUTH_BURST, Config.CONCURRENCY_LIMIT_AUTH
+            ),
+            "write": RouteClass(
+                "write", Config.RATE_LIMIT_WRITE_RATE, Config.RATE_LIMIT_WRITE_BURST, Config.CONCURRENCY_LIMIT_WRITE
+            ),
+            "read": RouteClass(
+                "read", Config.RATE_LIMIT_READ_RATE, Config.RATE_LIMIT_READ_BURST, Config.CONCURRENCY_LIMIT_READ
+            ),
+        }
+
+    def classify(self, method: str, path: str) -> Optional[RouteClass]:
+        if not path.startswith(self.prefix) or method == "OPTIONS":
+            return None
+        path = path[len(self.prefix):]
+        if method == "POST" and path in ("/auth/token", "/users"):
+            return self.classes["auth"]
+        if path.startswith(("/urls", "/users")):
+            return self.classes["read" if method in ("GET", "HEAD") else "write"]
+        return None
+
+    def client_key(self, scope) -> str:
+        """
+        "user:<id>" for a valid bearer token, otherwise "ip:<address>".
+        """
+        forwarded = None
+        for name, value in scope["headers"]:
+            if name == b"authorization":
+                scheme, _, token = value.decode("latin-1").partition(" ")
+                if scheme.lower() == "bearer" and token:
+                    user = self._token_user(token)
+                    if user is not None:
+                        return f"user:{user}"
+            elif name == b"x-forwarded-for" and self.trust_forwarded_for:
+                forwarded = value.decode("latin-1").split(",")[0].strip()
+        client = scope.get("client")
+        return f"ip:{forwarded or (client[0] if client else 'unknown')}"
+
+    @staticmethod
+    def _token_user(token: str) -> Optional[str]:
+        # Signature checked, so clients cannot spread a flood across made-up user ids
+        try:
+            claims = jwt.decode(token, Config.SECRET_KEY, algorithms=[Config.ALGORITHM])
+        except JWTError:
+            return None
+        user = claims.get("uid", claims.get("sub"))
+        return str(user) if user is not None else None
+
+    def admit(self, route_class: RouteClass, scope) -> Optional[Tuple[int, float]]:
+        """
+        Count the request in, or return (status, retry_after) to reject it with.
+        """
+        if route_class.buckets is not None:
+            wait = route_class.buckets.take(self.client_key(scope), time.monotonic())
+            if wait:
+                route_class.rate_limited += 1
+                return 429, wait
+        if route_class.concurrency and route_class.in_flight >= route_class.concurrency:
+            route_class.shed += 1
+            return 503, 1.0
+        route_class.in_flight += 1
+        route_class.admitted += 1
+        return None
+
+    @staticmethod
+    def release(route_class: RouteClass) -> None:
+        route_class.in_flight -= 1
+
+    def stats(self) -> dict:
+        stats = {}
+        for name, route_class in self.classes.items():
+            stats[f"{name}_in_flight"] = route_class.in_flight
+            stats[f"{name}_admitted"] = route_class.admitted
+            stats[f"{name}_rate_limited"] = route_class.rate_limited
+            stats[f"{name}_shed"] = route_class.shed
+            stats[f"{name}_clients"] = len(route_class.buckets) if route_class.buckets is not None else 0
+        return stats
+
+
+admission = AdmissionController()
+
+REJECTION_DETAILS = {
+    429: orjson.dumps({"detail": "Too many requests, please retry later."}),
+    503: orjson.dumps({"detail": "Server is busy, please retry shortly."}),
+}
+
+
+class AdmissionMiddleware:
+    """
+    Pure ASGI middleware applying the AdmissionController ahead of the redirect
+    fast path, routing and dependency injection.
+    """
+
+    def __init__(self, app, controller: AdmissionController = admission):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        route_class = None
+        if scope["type"] == "http":
+            route_class = self.controller.classify(scope["method"], scope["path"])
+        if route_class is None:
+            await self.app(scope, receive, send)
+            return
+
+        rejection = self.controller.admit(route_class, scope)
+        if rejection is not None:
+            status_code, retry_after = rejection
+            body = REJECTION_DETAILS[status_code]
+            await send({
+                "type": "http.response.start",
+                "status": status_code,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+                ],
+            })
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(route_class)
@@ -5,7 +5,7 @@ from sqlalchemy.orm import Session
 from app.database import get_db  # ✅ Fixed import path
 from app.database.models import DBUser
 from app.database.hash import Hash
-from app.authentication.authentication import create_access_token
+from app.authentication.authentication import create_access_token, token_claims
 
 router = APIRouter(
     prefix="/auth",
@@ -20,15 +20,25 @@ def get_token(
     """
     Authenticates user and returns a JWT access token.
     """
-    user = db.query(DBUser).filter(DBUser.user_name == form_data.username).first()
+    user = db.query(DBUser).filter(
+        DBUser.user_name == form_data.username, DBUser.deleted_at.is_(None)
+    ).first()
     
-    if not user or not Hash.verify(form_data.password, user.password):
+    verified, new_hash = (
+        Hash.verify_and_update(form_data.password, user.password) if user else (False, None)
+    )
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid credentials."
         )
 
-    access_token = create_access_token(data={"sub": user.user_name})
+    if new_hash:
+        # BCRYPT_ROUNDS changed since this hash was made; upgrade it transparently
+        user.password = new_hash
+        db.commit()
+
+    access_token = create_access_token(data=token_claims(user))
     
     return {
         "access_token": access_token,
@@ -0,0 +1,50 @@
+from fastapi import APIRouter, Depends, status, HTTPException
+from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import get_async_db
+from app.database.models import DBUser
+from app.database.hash import Hash
+from app.authentication.authentication import create_access_token, token_claims
+
+router = APIRouter(
+    prefix="/auth",
+    tags=["Authentication"]
+)
+
+@router.post("/token", name="token")
+async def get_token(
+    form_data: OAuth2PasswordRequestForm = Depends(),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Authenticates user and returns a JWT access token.
+    """
+    result = await db.execute(
+        select(DBUser).where(DBUser.user_name == form_data.username, DBUser.deleted_at.is_(None))
+    )
+    user = result.scalars().first()
+
+    verified, new_hash = (
+        await Hash.verify_and_update_async(form_data.password, user.password)
+        if user else (False, None)
+    )
+    if not verified:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid credentials."
+        )
+
+    if new_hash:
+        # BCRYPT_ROUNDS changed since this hash was made; upgrade it transparently
+        user.password = new_hash
+        await db.commit()
+
+    access_token = create_access_token(data=token_claims(user))
+
+    return {
+        "access_token": access_token,
+        "token_type": "bearer",
+        "user_name": user.user_name
+    }
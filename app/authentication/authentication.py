@@ -5,15 +5,28 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from config import Config
+from app.schemas import AuthenticatedUser
 from app.database.db_user import get_user
-from app.database import get_db  # ✅ Correct import now
+from app.database.cache import user_cache
+from app.database.models import DBUser
+from app.database import db_user_async
+from app.database import get_db, get_async_db  # ✅ Correct import now
 
 # OAuth2 token dependency
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{Config.URL_PREFIX}/auth/token")
 
 
+def credentials_exception() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials.",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
 def create_access_token(data: dict, expire_delta: Optional[timedelta] = None) -> str:
     """
     Creates a JWT access token with optional expiration.
@@ -26,27 +39,90 @@ def create_access_token(data: dict, expire_delta: Optional[timedelta] = None) ->
     return jwt.encode(to_encode, key=Config.SECRET_KEY, algorithm=Config.ALGORITHM)
 
 
+def token_claims(user: DBUser) -> dict:
+    """
+    Claims that let get_current_user resolve the user without a lookup by name.
+    """
+    return {"sub": user.user_name, "uid": user.id, "ver": user.token_version}
+
+
+def decode_access_token(token: str) -> dict:
+    """
+    Validates the access token and returns its claims.
+    """
+    try:
+        payload = jwt.decode(token, Config.SECRET_KEY, algorithms=[Config.ALGORITHM])
+    except JWTError:
+        raise credentials_exception()
+    if payload.get("sub") is None:
+        raise credentials_exception()
+    return payload
+
+
+def cached_user(claims: dict) -> Optional[AuthenticatedUser]:
+    """
+    Return the cached user for these claims if the token version still matches.
+    """
+    user_id = claims.get("uid")
+    if user_id is None:
+        return None
+    user = user_cache.get(user_id)
+    if user is not None and user.token_version == claims.get("ver", 0):
+        return user
+    return None
+
+
+def remember_user(user: Optional[DBUser], claims: dict) -> AuthenticatedUser:
+    """
+    Check a freshly loaded user against the token claims and cache it.
+
+    Tokens issued before a password change or account deletion carry an older
+    `ver` and are rejected here, as is any token of a deleted account.
+    """
+    if user is None or user.deleted_at is not None or user.token_version != claims.get("ver", 0):
+        raise credentials_exception()
+    authenticated = AuthenticatedUser.model_validate(user)
+    user_cache.set(authenticated.id, authenticated)
+    return authenticated
+
+
 def get_current_user(
     token: str = Depends(oauth2_scheme),
     db: Session = Depends(get_db)
-):
+) -> AuthenticatedUser:
     """
     Validates the access token and retrieves the authenticated user.
+
+    Users are served from a short-lived in-process cache keyed by the `uid`
+    claim, so most authenticated requests never query the users table.
     """
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials.",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-    try:
-        payload = jwt.decode(token, Config.SECRET_KEY, algorithms=[Config.ALGORITHM])
-        user_name: Optional[str] = payload.get("sub")
-        if user_name is None:
-            raise credentials_exception
-    except JWTError:
-        raise credentials_exception
+    claims = decode_access_token(token)
+    user = cached_user(claims)
+    if user is not None:
+        return user
+
+    if claims.get("uid") is not None:
+        db_user = db.get(DBUser, claims["uid"])
+    else:
+        # Tokens issued before uid/ver claims existed
+        db_user = get_user(user_name=claims["sub"], db=db)
+    return remember_user(db_user, claims)
+
+
+async def get_current_user_async(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_async_db)
+) -> AuthenticatedUser:
+    """
+    Async counterpart of get_current_user for the DATABASE_ASYNC mode.
+    """
+    claims = decode_access_token(token)
+    user = cached_user(claims)
+    if user is not None:
+        return user
 
-    user = get_user(user_name=user_name, db=db)
-    if not user:
-        raise credentials_exception
-    return user
+    if claims.get("uid") is not None:
+        db_user = await db.get(DBUser, claims["uid"])
+    else:
+        db_user = await db_user_async.get_user(user_name=claims["sub"], db=db)
+    return remember_user(db_user, claims)
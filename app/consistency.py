@@ -0,0 +1,47 @@
+import math
+from typing import Mapping
+
+from config import Config
+
+# Present (until it expires) on clients that wrote within READ_YOUR_WRITES_WINDOW
+READ_PRIMARY_COOKIE = "read_primary"
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+def prefers_primary(cookies: Mapping[str, str]) -> bool:
+    """
+    True if this client recently wrote and must not read from a lagging replica.
+    """
+    return READ_PRIMARY_COOKIE in cookies
+
+
+class ReadYourWritesMiddleware:
+    """
+    Pure ASGI middleware that marks clients after a successful mutation.
+
+    The cookie carries a Max-Age of READ_YOUR_WRITES_WINDOW, so the browser
+    (or any cookie-aware client) drops it once replicas have had time to
+    catch up, and any worker can honour it without shared state. Clients
+    that do not send cookies back, as most Bearer-token API clients do not,
+    keep reading replicas; they should send the cookie themselves or allow
+    for replica lag. Redirects are covered either way: a code invalidated
+    within the window is reloaded from the primary (see UrlCache.recently_purged).
+    """
+
+    def __init__(self, app, window: float = Config.READ_YOUR_WRITES_WINDOW):
+        self.app = app
+        self.cookie = (
+            f"{READ_PRIMARY_COOKIE}=1; Max-Age={math.ceil(window)}; Path=/; HttpOnly; SameSite=Lax"
+        ).encode("latin-1")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in SAFE_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                message["headers"] = list(message.get("headers", [])) + [(b"set-cookie", self.cookie)]
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
@@ -1,16 +1,278 @@
-from typing import Generator
+import time
+import itertools
+import threading
+from typing import AsyncGenerator, Dict, Generator, List
 
-from sqlalchemy import create_engine
+from fastapi import Request
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
 from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.ext.horizontal_shard import ShardedSession
 
+from app.consistency import prefers_primary
+from app.database.shards import (
+    PRIMARY,
+    SHARD_IDS,
+    SHARDED,
+    execute_chooser,
+    identity_chooser,
+    shard_chooser,
+    shard_for,
+)
 from config import Config
 
+
+class CheckoutTimingMixin:
+    """
+    Records how long callers wait to check a connection out of the pool.
+    """
+
+    def _init_timing(self) -> None:
+        if not hasattr(self, "_timing_lock"):
+            self._timing_lock = threading.Lock()
+            self.checkouts = 0
+            self.checkout_wait_total = 0.0
+            self.checkout_wait_max = 0.0
+
+    def _do_get(self):
+        self._init_timing()
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            waited = time.perf_counter() - start
+            with self._timing_lock:
+                self.checkouts += 1
+                self.checkout_wait_total += waited
+                self.checkout_wait_max = max(self.checkout_wait_max, waited)
+
+    def stats(self) -> dict:
+        self._init_timing()
+        with self._timing_lock:
+            return {
+                "size": self.size(),
+                "checked_out": self.checkedout(),
+                "overflow": self.overflow(),
+                "checked_in": self.checkedin(),
+                "checkouts": self.checkouts,
+                "checkout_wait_avg_ms": round(
+                    self.checkout_wait_total / self.checkouts * 1000, 3
+                ) if self.checkouts else 0.0,
+                "checkout_wait_max_ms": round(self.checkout_wait_max * 1000, 3),
+            }
+
+
+class TimedQueuePool(CheckoutTimingMixin, QueuePool):
+    pass
+
+
+class TimedAsyncAdaptedQueuePool(CheckoutTimingMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def is_in_memory_sqlite(url: str) -> bool:
+    parsed = make_url(url)
+    return parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:")
+
+
+def engine_options(url: str, async_engine: bool = False) -> dict:
+    """
+    Pool settings from Config; in-memory SQLite keeps SQLAlchemy's own pool.
+    """
+    if is_in_memory_sqlite(url):
+        return {}
+    return {
+        "poolclass": TimedAsyncAdaptedQueuePool if async_engine else TimedQueuePool,
+        "pool_size": Config.DB_POOL_SIZE,
+        "max_overflow": Config.DB_MAX_OVERFLOW,
+        "pool_timeout": Config.DB_POOL_TIMEOUT,
+        "pool_recycle": Config.DB_POOL_RECYCLE,
+        "pool_pre_ping": Config.DB_POOL_PRE_PING,
+    }
+
+
+def set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    """
+    WAL lets readers run alongside the writer; NORMAL sync is durable in WAL mode
+    except for the last transactions on power loss.
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA mmap_size={Config.SQLITE_MMAP_SIZE}")
+    cursor.execute(f"PRAGMA cache_size=-{Config.SQLITE_CACHE_SIZE_KB}")
+    cursor.execute(f"PRAGMA busy_timeout={Config.SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.close()
+
+
+def async_url(url: str) -> str:
+    return Config.ASYNC_DB_PROTOCOL + url[url.index("://"):]
+
+
+def configure_engine(engine: Engine) -> Engine:
+    if engine.dialect.name == "sqlite" and Config.SQLITE_PERFORMANCE_MODE:
+        event.listen(engine, "connect", set_sqlite_pragmas)
+    return engine
+
+
 # Create database engine
-engine = create_engine(Config.DATABASE_URL)
+engine = configure_engine(
+    create_engine(Config.DATABASE_URL, **engine_options(Config.DATABASE_URL))
+)
 
 # Create a configured "Session" class
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine/session factory, only created when DATABASE_ASYNC is enabled
+async_engine = None
+AsyncSessionLocal = None
+if Config.DATABASE_ASYNC:
+    async_engine = create_async_engine(
+        Config.ASYNC_DATABASE_URL,
+        **engine_options(Config.ASYNC_DATABASE_URL, async_engine=True)
+    )
+    configure_engine(async_engine.sync_engine)
+    AsyncSessionLocal = async_sessionmaker(
+        bind=async_engine, autoflush=False, expire_on_commit=False
+    )
+
+# URL shards: with DATABASE_SHARD_URLS set, SessionLocal / AsyncSessionLocal
+# become ShardedSession factories that send users to the primary and URL rows
+# to the shard owning their short code (see app.database.shards).
+shard_engines: Dict[str, Engine] = {}
+ShardSessionLocals: Dict[str, sessionmaker] = {}
+async_shard_engines: Dict[str, AsyncEngine] = {}
+AsyncShardSessionLocals: Dict[str, async_sessionmaker] = {}
+if SHARDED:
+    choosers = {
+        "shard_chooser": shard_chooser,
+        "identity_chooser": identity_chooser,
+        "execute_chooser": execute_chooser,
+    }
+    for shard_id, url in zip(SHARD_IDS, Config.SHARD_DATABASE_URLS):
+        shard_engines[shard_id] = configure_engine(create_engine(url, **engine_options(url)))
+        ShardSessionLocals[shard_id] = sessionmaker(
+            autocommit=False, autoflush=False, bind=shard_engines[shard_id]
+        )
+    SessionLocal = sessionmaker(
+        class_=ShardedSession, autocommit=False, autoflush=False,
+        shards={PRIMARY: engine, **shard_engines}, **choosers
+    )
+    if Config.DATABASE_ASYNC:
+        for shard_id, url in zip(SHARD_IDS, Config.SHARD_DATABASE_URLS):
+            shard = create_async_engine(async_url(url), **engine_options(async_url(url), async_engine=True))
+            configure_engine(shard.sync_engine)
+            async_shard_engines[shard_id] = shard
+            AsyncShardSessionLocals[shard_id] = async_sessionmaker(
+                bind=shard, autoflush=False, expire_on_commit=False
+            )
+        AsyncSessionLocal = async_sessionmaker(
+            sync_session_class=ShardedSession, autoflush=False, expire_on_commit=False,
+            shards={
+                PRIMARY: async_engine.sync_engine,
+                **{shard_id: shard.sync_engine for shard_id, shard in async_shard_engines.items()},
+            },
+            **choosers
+        )
+
+
+def url_engines() -> List[Engine]:
+    """
+    Every engine holding URL rows: the shards, or just the primary.
+    """
+    return list(shard_engines.values()) or [engine]
+
+
+# Read replicas, used round-robin by get_read_db / get_async_read_db
+replica_engines: List[Engine] = [
+    configure_engine(create_engine(url, **engine_options(url)))
+    for url in Config.REPLICA_DATABASE_URLS
+]
+ReplicaSessionLocals = [
+    sessionmaker(autocommit=False, autoflush=False, bind=replica) for replica in replica_engines
+]
+async_replica_engines = []
+AsyncReplicaSessionLocals = []
+if Config.DATABASE_ASYNC:
+    for url in Config.REPLICA_DATABASE_URLS:
+        replica = create_async_engine(async_url(url), **engine_options(async_url(url), async_engine=True))
+        configure_engine(replica.sync_engine)
+        async_replica_engines.append(replica)
+        AsyncReplicaSessionLocals.append(
+            async_sessionmaker(bind=replica, autoflush=False, expire_on_commit=False)
+        )
+
+_replica_turn = itertools.count()
+
+
+def read_sessionmaker(primary: bool = False) -> sessionmaker:
+    """
+    Session factory for a read: the next replica, or the primary if asked or none exist.
+    Replicas mirror the primary only, so sharded deployments always read the shards.
+    """
+    if primary or not ReplicaSessionLocals or SHARDED:
+        return SessionLocal
+    return ReplicaSessionLocals[next(_replica_turn) % len(ReplicaSessionLocals)]
+
+
+def async_read_sessionmaker(primary: bool = False) -> async_sessionmaker:
+    if primary or not AsyncReplicaSessionLocals or SHARDED:
+        return AsyncSessionLocal
+    return AsyncReplicaSessionLocals[next(_replica_turn) % len(AsyncReplicaSessionLocals)]
+
+
+def read_engine(primary: bool = False) -> Engine:
+    """
+    Engine for a raw read connection, chosen like read_sessionmaker.
+    """
+    if primary or not replica_engines:
+        return engine
+    return replica_engines[next(_replica_turn) % len(replica_engines)]
+
+
+def async_read_engine(primary: bool = False):
+    if primary or not async_replica_engines:
+        return async_engine
+    return async_replica_engines[next(_replica_turn) % len(async_replica_engines)]
+
+
+def url_read_engine(short_url: str, primary: bool = False) -> Engine:
+    """
+    Engine for a raw read of one short code: its shard, else as read_engine.
+    """
+    if SHARDED:
+        return shard_engines[shard_for(short_url)]
+    return read_engine(primary)
+
+
+def async_url_read_engine(short_url: str, primary: bool = False) -> AsyncEngine:
+    if SHARDED:
+        return async_shard_engines[shard_for(short_url)]
+    return async_read_engine(primary)
+
+
+def pool_stats() -> dict:
+    """
+    Connection pool occupancy and checkout wait times for each engine.
+    """
+    stats = {}
+    for name, pool in (
+        ("sync", engine.pool),
+        ("async", async_engine.pool if async_engine is not None else None),
+        *((f"replica_{i}", replica.pool) for i, replica in enumerate(replica_engines)),
+        *((f"async_replica_{i}", replica.pool) for i, replica in enumerate(async_replica_engines)),
+        *((shard_id, shard.pool) for shard_id, shard in shard_engines.items()),
+        *((f"async_{shard_id}", shard.pool) for shard_id, shard in async_shard_engines.items()),
+    ):
+        if isinstance(pool, CheckoutTimingMixin):
+            stats[name] = pool.stats()
+        elif pool is not None:
+            stats[name] = {"status": pool.status()}
+    return stats
+
+
 def get_db() -> Generator[Session, None, None]:
     """
     Yields a database session and ensures it is properly closed.
@@ -20,3 +282,30 @@ def get_db() -> Generator[Session, None, None]:
         yield db
     finally:
         db.close()
+
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Yields an async database session and ensures it is properly closed.
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def get_read_db(request: Request) -> Generator[Session, None, None]:
+    """
+    Yields a session on a read replica (the primary right after this client wrote).
+    """
+    db = read_sessionmaker(prefers_primary(request.cookies))()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_read_db(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    """
+    Yields an async session on a read replica (the primary right after this client wrote).
+    """
+    async with async_read_sessionmaker(prefers_primary(request.cookies))() as db:
+        yield db
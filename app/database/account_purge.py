@@ -0,0 +1,198 @@
+import time
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, FrozenSet, List, Optional, Set
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.engine import Connection, Engine, Row
+
+from app.database.models import DBUrl, DBUrlStats, DBUser
+from app.database.cache import url_cache
+from app.database.clicks import click_buffer
+from app.database.purge import purge_log
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class AccountPurger:
+    """
+    Finishes account deletions: removes a soft-deleted user's URLs in batches, then the user.
+
+    delete_user only stamps users.deleted_at, so the request stays one
+    small UPDATE however many links the account owns. From then on the
+    user's codes are not served (`is_deleted`), and every run deletes up to
+    `max_batches` batches of at most `batch_size` URLs (with their click
+    stats), each in its own short transaction on the owning database. The
+    users row goes once no URLs are left, which also frees the user name and
+    email again.
+
+    Other workers learn about a deletion on their next run (or `refresh`
+    when purging is disabled there), so codes they have cached can be served
+    for up to ACCOUNT_PURGE_INTERVAL seconds.
+    """
+
+    def __init__(
+        self,
+        engine: Optional[Engine] = None,
+        batch_size: int = Config.ACCOUNT_PURGE_BATCH_SIZE,
+        max_batches: int = Config.ACCOUNT_PURGE_MAX_BATCHES,
+        pause: float = Config.ACCOUNT_PURGE_BATCH_PAUSE,
+    ):
+        self.engine = engine
+        self.batch_size = batch_size
+        self.max_batches = max_batches
+        self.pause = pause
+        self._lock = threading.Lock()
+        self._run_lock = threading.RLock()
+        self._deleted: FrozenSet[int] = frozenset()
+        # Users marked while a run is reading the deleted ones
+        self._marked_during_run: Optional[Set[int]] = None
+        # user id -> {"deleted_at", "urls_deleted"} for accounts still being purged
+        self._progress: Dict[int, dict] = {}
+        self.runs = 0
+        self.batches = 0
+        self.urls_deleted = 0
+        self.users_deleted = 0
+        self.last_run_seconds = 0.0
+
+    def _get_engines(self) -> List[Engine]:
+        if self.engine is not None:
+            return [self.engine]
+        from app.database import url_engines
+        return url_engines()
+
+    def _get_primary(self) -> Engine:
+        if self.engine is not None:
+            return self.engine
+        from app.database import engine
+        return engine
+
+    def is_deleted(self, user_id: Optional[int]) -> bool:
+        return user_id in self._deleted
+
+    def mark_deleted(self, user_id: int, deleted_at: datetime) -> None:
+        """
+        Stop serving the user's codes in this process right away (after delete_user commits).
+        """
+        with self._lock:
+            self._deleted = self._deleted | {user_id}
+            self._progress.setdefault(user_id, {"deleted_at": deleted_at, "urls_deleted": 0})
+            if self._marked_during_run is not None:
+                self._marked_during_run.add(user_id)
+
+    def _purge_batch(self, conn: Connection, user_id: int) -> List[str]:
+        rows = conn.execute(
+            select(DBUrl.id, DBUrl.short_url)
+            .where(DBUrl.user_id == user_id)
+            .order_by(DBUrl.id)
+            .limit(self.batch_size)
+        ).all()
+        if rows:
+            codes = [row.short_url for row in rows]
+            conn.execute(delete(DBUrlStats).where(DBUrlStats.short_url.in_(codes)))
+            conn.execute(delete(DBUrl).where(DBUrl.id.in_([row.id for row in rows])))
+            return codes
+        return []
+
+    def refresh(self) -> List[Row]:
+        """
+        Reload the soft-deleted users (any worker's), oldest deletion first.
+        """
+        with self._run_lock:
+            with self._lock:
+                self._marked_during_run = set()
+            try:
+                with self._get_primary().connect() as conn:
+                    pending = conn.execute(
+                        select(DBUser.id, DBUser.deleted_at)
+                        .where(DBUser.deleted_at.is_not(None))
+                        .order_by(DBUser.deleted_at)
+                    ).all()
+            except Exception:
+                with self._lock:
+                    self._marked_during_run = None
+                raise
+            with self._lock:
+                self._deleted = frozenset(user_id for user_id, _ in pending) | self._marked_during_run
+                self._marked_during_run = None
+                self._progress = {
+                    user_id: self._progress.get(user_id, {"deleted_at": deleted_at, "urls_deleted": 0})
+                    for user_id, deleted_at in pending
+                }
+            return pending
+
+    def run(self) -> int:
+        """
+        Purge up to `max_batches` batches across all deleted accounts; returns the number of URLs deleted.
+        """
+        with self._run_lock:
+            started = time.perf_counter()
+            primary = self._get_primary()
+            pending = self.refresh()
+            deleted = 0
+            batches = 0
+            for user_id, _ in pending:
+                done = True
+                for engine in self._get_engines():
+                    while batches < self.max_batches:
+                        if batches:
+                            time.sleep(self.pause)
+                        with engine.begin() as conn:
+                            codes = self._purge_batch(conn, user_id)
+                        batches += 1
+                        for short_url in codes:
+                            url_cache.invalidate(short_url)
+                            click_buffer.discard(short_url)
+                        purge_log.record(codes, "account")
+                        deleted += len(codes)
+                        self._progress[user_id]["urls_deleted"] += len(codes)
+                        if len(codes) < self.batch_size:
+                            break
+                    else:
+                        done = False
+                        break
+                if not done:
+                    break
+                with primary.begin() as conn:
+                    conn.execute(delete(DBUser).where(DBUser.id == user_id, DBUser.deleted_at.is_not(None)))
+                with self._lock:
+                    self._deleted = self._deleted - {user_id}
+                    purged = self._progress.pop(user_id)["urls_deleted"]
+                logger.info("Purged account %d (%d URLs)", user_id, purged)
+                self.users_deleted += 1
+
+            self.runs += 1
+            self.batches += batches
+            self.urls_deleted += deleted
+            self.last_run_seconds = time.perf_counter() - started
+            return deleted
+
+    def progress(self) -> List[dict]:
+        """
+        Accounts still being purged, oldest deletion first, with the URLs removed so far and left.
+        """
+        with self._lock:
+            progress = [{"user_id": user_id, **entry} for user_id, entry in self._progress.items()]
+        for entry in progress:
+            entry["urls_remaining"] = 0
+            for engine in self._get_engines():
+                with engine.connect() as conn:
+                    entry["urls_remaining"] += conn.execute(
+                        select(func.count()).select_from(DBUrl).where(DBUrl.user_id == entry["user_id"])
+                    ).scalar_one()
+        return progress
+
+    def stats(self) -> dict:
+        return {
+            "pending_users": len(self._deleted),
+            "runs": self.runs,
+            "batches": self.batches,
+            "urls_deleted": self.urls_deleted,
+            "users_deleted": self.users_deleted,
+            "last_run_seconds": round(self.last_run_seconds, 4),
+        }
+
+
+account_purger = AccountPurger()
@@ -0,0 +1,368 @@
+import math
+import time
+import base64
+import hashlib
+import logging
+import secrets
+import threading
+from collections import deque
+from typing import Deque, List, Optional, Set
+
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import IntegrityError
+
+from app.database.models import DBCodeSequence, DBShortCode, DBUrl
+from config import Config
+
+BASE62_ALPHABET = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+
+logger = logging.getLogger(__name__)
+
+
+def base62_encode(value: int, width: int = 0) -> str:
+    """
+    Encode a non-negative integer in base62, left-padded with "0" to `width`.
+    """
+    if value < 0:
+        raise ValueError("base62_encode expects a non-negative integer.")
+    chars = []
+    while value:
+        value, remainder = divmod(value, 62)
+        chars.append(BASE62_ALPHABET[remainder])
+    return "".join(reversed(chars)).rjust(width, "0") or "0"
+
+
+class ShortCodeAllocator:
+    """
+    Base class for short-code allocators.
+
+    `attempt` is the retry number after a unique-constraint collision, so
+    deterministic allocators can vary their output on retries.
+    """
+
+    # Whether allocate() may query the database (async callers run it in the threadpool)
+    blocking = False
+
+    def allocate(self, long_url: str, attempt: int = 0) -> str:
+        raise NotImplementedError
+
+
+class HashAllocator(ShortCodeAllocator):
+    """
+    Legacy allocator: truncated base64 SHA-256 of the long URL (salted on retries).
+    """
+
+    def __init__(self, length: int = Config.SHORT_URL_LENGTH):
+        self.length = length
+
+    def allocate(self, long_url: str, attempt: int = 0) -> str:
+        source = long_url if attempt == 0 else f"{long_url}#{secrets.token_hex(8)}"
+        sha256 = hashlib.sha256(source.encode()).digest()
+        encoded = base64.urlsafe_b64encode(sha256).decode().rstrip("=")
+        return encoded[:self.length]
+
+
+class BlockCounterAllocator(ShortCodeAllocator):
+    """
+    Counter-based allocator that reserves blocks of IDs from the database.
+
+    One short UPDATE per `block_size` codes is the only database work; every
+    other allocation is a local increment. IDs are scrambled by multiplying
+    with a number near 62**length / phi that shares no factor with 62 (and
+    so is coprime to 62**length), which is a bijection on the code space,
+    so codes are fixed-width, collision-free and not trivially enumerable.
+    """
+
+    SEQUENCE_NAME = "urls"
+    blocking = True
+
+    def __init__(
+        self,
+        engine: Optional[Engine] = None,
+        block_size: int = Config.SHORT_CODE_BLOCK_SIZE,
+        length: int = Config.SHORT_URL_LENGTH,
+        sequence_name: str = SEQUENCE_NAME,
+    ):
+        self.engine = engine
+        self.sequence_name = sequence_name
+        self.block_size = block_size
+        self.length = length
+        self.space = 62 ** length
+        # Golden-ratio fraction of the space spreads consecutive ids far apart
+        self.multiplier = int(self.space * 0.6180339887498949)
+        while math.gcd(self.multiplier, 62) != 1:
+            self.multiplier += 1
+        self._next = 0
+        self._end = 0
+        self._lock = threading.Lock()
+
+    def _get_engine(self) -> Engine:
+        if self.engine is None:
+            from app.database import engine
+            self.engine = engine
+        return self.engine
+
+    def _reserve_block(self) -> None:
+        """
+        Atomically advance the shared sequence by one block and claim it.
+        """
+        engine = self._get_engine()
+        while True:
+            with engine.begin() as conn:
+                result = conn.execute(
+                    update(DBCodeSequence)
+                    .where(DBCodeSequence.name == self.sequence_name)
+                    .values(next_value=DBCodeSequence.next_value + self.block_size)
+                )
+                if result.rowcount:
+                    end = conn.execute(
+                        select(DBCodeSequence.next_value)
+                        .where(DBCodeSequence.name == self.sequence_name)
+                    ).scalar_one()
+                    break
+            try:
+                # First allocation ever: seed the sequence (IDs start at 1)
+                with engine.begin() as conn:
+                    conn.execute(
+                        insert(DBCodeSequence).values(name=self.sequence_name, next_value=1)
+                    )
+            except IntegrityError:
+                pass  # Another worker seeded it first
+        self._next, self._end = end - self.block_size, end
+
+    def next_id(self) -> int:
+        with self._lock:
+            if self._next >= self._end:
+                self._reserve_block()
+            value = self._next
+            self._next += 1
+        if value >= self.space:
+            raise RuntimeError("Short-code space exhausted; increase SHORT_URL_LENGTH.")
+        return value
+
+    def allocate(self, long_url: str, attempt: int = 0) -> str:
+        return base62_encode((self.next_id() * self.multiplier) % self.space, self.length)
+
+
+class PooledAllocator(ShortCodeAllocator):
+    """
+    Hands out random codes from a table of pre-generated, pre-verified unused ones.
+
+    `refill()` runs in the background and tops the pool up to `target` codes
+    once it drops below `low_water`, checking candidates against every URL
+    database in batches. Workers claim `claim_batch` codes at a time with a
+    single DELETE ... RETURNING into a local queue, so creating a URL never
+    probes for uniqueness. If the pool runs dry, codes are generated on the
+    spot and the insert's unique constraint (with create_url's retries) is
+    the only check.
+    """
+
+    blocking = True
+
+    def __init__(
+        self,
+        engine: Optional[Engine] = None,
+        length: int = Config.SHORT_URL_LENGTH,
+        claim_batch: int = Config.SHORT_CODE_POOL_CLAIM_BATCH,
+        low_water: int = Config.SHORT_CODE_POOL_LOW_WATER,
+        target: int = Config.SHORT_CODE_POOL_TARGET,
+        refill_batch: int = Config.SHORT_CODE_POOL_REFILL_BATCH,
+    ):
+        self.engine = engine
+        self.length = length
+        self.claim_batch = claim_batch
+        self.low_water = low_water
+        self.target = target
+        self.refill_batch = refill_batch
+        self._queue: Deque[str] = deque()
+        self._lock = threading.Lock()
+        self._refill_lock = threading.Lock()
+        # Set when a claim came back empty, so allocations skip the database until a refill
+        self._dry = False
+        self.claims = 0
+        self.claimed = 0
+        self.fallbacks = 0
+        self.generated = 0
+        self.rejected = 0
+        self.pool_size = 0
+
+    def _get_engine(self) -> Engine:
+        if self.engine is None:
+            from app.database import engine
+            self.engine = engine
+        return self.engine
+
+    def _get_url_engines(self) -> List[Engine]:
+        if self.engine is not None:
+            return [self.engine]
+        from app.database import url_engines
+        return url_engines()
+
+    def random_code(self) -> str:
+        return "".join(secrets.choice(BASE62_ALPHABET) for _ in range(self.length))
+
+    def _claim(self, conn: Connection) -> List[str]:
+        """
+        Take up to `claim_batch` codes out of the pool in one atomic statement.
+        """
+        if conn.dialect.delete_returning:
+            batch = (
+                select(DBShortCode.code)
+                .where(DBShortCode.claimed_by.is_(None))
+                .limit(self.claim_batch)
+                .with_for_update(skip_locked=True)
+            )
+            return list(conn.execute(
+                delete(DBShortCode).where(DBShortCode.code.in_(batch)).returning(DBShortCode.code)
+            ).scalars())
+        # MySQL: tag a batch with a token (UPDATE ... LIMIT), then read and drop it
+        token = secrets.token_hex(16)
+        conn.execute(
+            update(DBShortCode)
+            .where(DBShortCode.claimed_by.is_(None))
+            .values(claimed_by=token)
+            .with_dialect_options(mysql_limit=self.claim_batch)
+        )
+        codes = list(conn.execute(select(DBShortCode.code).where(DBShortCode.claimed_by == token)).scalars())
+        conn.execute(delete(DBShortCode).where(DBShortCode.claimed_by == token))
+        return codes
+
+    def allocate(self, long_url: str, attempt: int = 0) -> str:
+        with self._lock:
+            if not self._queue and not self._dry:
+                with self._get_engine().begin() as conn:
+                    codes = self._claim(conn)
+                self.claims += 1
+                self.claimed += len(codes)
+                self._queue.extend(codes)
+                self._dry = not codes
+            if self._queue:
+                return self._queue.popleft()
+            self.fallbacks += 1
+        return self.random_code()
+
+    def _unused(self, candidates: Set[str]) -> Set[str]:
+        """
+        Drop candidates already taken by a URL on any database or already in the pool.
+        """
+        for engine in self._get_url_engines():
+            with engine.connect() as conn:
+                candidates -= set(conn.execute(
+                    select(DBUrl.short_url).where(DBUrl.short_url.in_(candidates))
+                ).scalars())
+        with self._get_engine().connect() as conn:
+            candidates -= set(conn.execute(
+                select(DBShortCode.code).where(DBShortCode.code.in_(candidates))
+            ).scalars())
+        return candidates
+
+    def refill(self) -> int:
+        """
+        Top the pool up to `target` if it is below `low_water`; returns how many codes were added.
+        """
+        with self._refill_lock:
+            engine = self._get_engine()
+            with engine.connect() as conn:
+                self.pool_size = conn.execute(select(func.count()).select_from(DBShortCode)).scalar_one()
+            if self.pool_size >= self.low_water:
+                return 0
+            added = 0
+            while self.pool_size < self.target:
+                wanted = min(self.refill_batch, self.target - self.pool_size)
+                candidates = {self.random_code() for _ in range(wanted)}
+                codes = self._unused(set(candidates))
+                self.rejected += len(candidates) - len(codes)
+                if not codes:
+                    break
+                try:
+                    with engine.begin() as conn:
+                        conn.execute(insert(DBShortCode), [{"code": code} for code in codes])
+                except IntegrityError:
+                    # Another worker's refill added one of these meanwhile; try again next run
+                    logger.info("Short-code pool refill raced another worker; retrying later")
+                    break
+                added += len(codes)
+                self.pool_size += len(codes)
+            self.generated += added
+            if self.pool_size:
+                self._dry = False
+            return added
+
+    def stats(self) -> dict:
+        with self._lock:
+            queued = len(self._queue)
+        return {
+            "pool_size": self.pool_size,
+            "queued": queued,
+            "claims": self.claims,
+            "claimed": self.claimed,
+            "fallbacks": self.fallbacks,
+            "generated": self.generated,
+            "rejected": self.rejected,
+        }
+
+
+class SnowflakeAllocator(ShortCodeAllocator):
+    """
+    Snowflake-style allocator: 41-bit millisecond timestamp, 10-bit worker id
+    and 12-bit sequence, base62-encoded. Needs no database access at all, but
+    every worker must run with a distinct WORKER_ID.
+    """
+
+    EPOCH_MS = 1_704_067_200_000  # 2024-01-01T00:00:00Z
+    WORKER_BITS = 10
+    SEQUENCE_BITS = 12
+
+    def __init__(self, worker_id: int = Config.WORKER_ID):
+        if not 0 <= worker_id < (1 << self.WORKER_BITS):
+            raise ValueError(f"worker_id must be in [0, {1 << self.WORKER_BITS}).")
+        self.worker_id = worker_id
+        self._last_ms = -1
+        self._sequence = 0
+        self._lock = threading.Lock()
+
+    def next_id(self) -> int:
+        with self._lock:
+            now = int(time.time() * 1000)
+            if now < self._last_ms:
+                # Clock moved backwards: keep issuing from the last timestamp
+                now = self._last_ms
+            if now == self._last_ms:
+                self._sequence = (self._sequence + 1) & ((1 << self.SEQUENCE_BITS) - 1)
+                if self._sequence == 0:
+                    while now <= self._last_ms:
+                        now = int(time.time() * 1000)
+            else:
+                self._sequence = 0
+            self._last_ms = now
+            return (
+                ((now - self.EPOCH_MS) << (self.WORKER_BITS + self.SEQUENCE_BITS))
+                | (self.worker_id << self.SEQUENCE_BITS)
+                | self._sequence
+            )
+
+    def allocate(self, long_url: str, attempt: int = 0) -> str:
+        return base62_encode(self.next_id())
+
+
+def build_allocator(name: str = Config.SHORT_CODE_ALLOCATOR) -> ShortCodeAllocator:
+    """
+    Build the allocator selected by SHORT_CODE_ALLOCATOR.
+    """
+    allocators = {
+        "counter": BlockCounterAllocator,
+        "pool": PooledAllocator,
+        "snowflake": SnowflakeAllocator,
+        "hash": HashAllocator,
+    }
+    if name not in allocators:
+        raise ValueError(f"Unknown SHORT_CODE_ALLOCATOR {name!r}; expected one of {sorted(allocators)}.")
+    return allocators[name]()
+
+
+allocator = build_allocator()
+
+# Sharded deployments cannot rely on per-database autoincrement, so URL ids
+# come from a shared block-reserved sequence on the primary instead
+url_id_allocator = BlockCounterAllocator(sequence_name="url_ids") if Config.SHARD_DATABASE_URLS else None
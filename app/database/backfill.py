@@ -0,0 +1,82 @@
+"""
+Fill DBUrl.long_url_hash for rows created before per-user dedupe existed.
+
+    python -m app.database.backfill [--batch-size 1000]
+
+Walks every URL database (the shards, or the primary) by id in batches, each
+updated in its own short transaction, so it can run against a live
+deployment and be interrupted and restarted at any time.
+"""
+import json
+import argparse
+import logging
+from typing import Dict
+
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.engine import Engine
+
+from app.database import engine, shard_engines
+from app.database.models import DBUrl, add_missing_columns
+from app.database.normalize import long_url_hash
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+def backfill_hashes(source: Engine, batch_size: int) -> int:
+    """
+    Hash every row of `source` that has no long_url_hash yet; returns how many.
+    """
+    table = DBUrl.__table__
+    statement = (
+        update(table)
+        .where(table.c.id == bindparam("row_id"))
+        .values(long_url_hash=bindparam("url_hash"))
+    )
+    filled = 0
+    last_id = 0
+    while True:
+        with source.begin() as conn:
+            rows = conn.execute(
+                select(table.c.id, table.c.long_url)
+                .where(table.c.id > last_id, table.c.long_url_hash.is_(None))
+                .order_by(table.c.id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                return filled
+            conn.execute(statement, [
+                {"row_id": row_id, "url_hash": long_url_hash(long_url)} for row_id, long_url in rows
+            ])
+        last_id = rows[-1].id
+        filled += len(rows)
+
+
+def backfill(batch_size: int = Config.EXPORT_BATCH_SIZE) -> Dict[str, int]:
+    """
+    Backfill every URL database; returns the rows filled per database.
+    """
+    summary = {}
+    for name, source in (shard_engines or {"primary": engine}).items():
+        # The job may run before the app has started on the new schema
+        add_missing_columns(source, DBUrl.__table__)
+        for index in DBUrl.__table__.indexes:
+            index.create(bind=source, checkfirst=True)
+        summary[name] = backfill_hashes(source, batch_size)
+        logger.info("Filled long_url_hash on %d rows of %s", summary[name], name)
+    return summary
+
+
+def cli() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--batch-size", type=int, default=Config.EXPORT_BATCH_SIZE, help="Rows updated per transaction"
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+    print(json.dumps(backfill(args.batch_size), indent=2))
+
+
+if __name__ == "__main__":
+    cli()
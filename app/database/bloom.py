@@ -0,0 +1,175 @@
+import math
+import hashlib
+import logging
+import threading
+from typing import Iterable, List, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.engine import Engine
+
+from app.database.models import DBUrl
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter over strings using double hashing on one BLAKE2b digest.
+
+    `might_contain` never returns False for an added key; it returns True for
+    absent keys with probability close to `error_rate` while the filter holds
+    no more than `capacity` keys.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        capacity = max(capacity, 1)
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str) -> Iterable[int]:
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.hash_count):
+            yield (first + i * second) % self.size
+
+    def add(self, key: str) -> None:
+        changed = False
+        for position in self._positions(key):
+            mask = 1 << (position & 7)
+            if not self.bits[position >> 3] & mask:
+                self.bits[position >> 3] |= mask
+                changed = True
+        # A key whose bits were all set already (e.g. added twice) is not counted again
+        if changed:
+            self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class ShortCodeFilter:
+    """
+    Bloom filter of every short code in the urls table, used to answer
+    "definitely unknown" codes without a database round trip.
+
+    Until the first `rebuild` completes it reports every code as possibly
+    present, so lookups fall through to the database. Codes other workers
+    create reach this one through the purge log ("create" entries, passed to
+    `on_purge` by `PurgeLog.follow`), so they may 404 here for up to one
+    follow interval. Deleted codes stay in the filter (harmless false
+    positives) until the next periodic rebuild.
+    """
+
+    def __init__(
+        self,
+        engine: Optional[Engine] = None,
+        enabled: bool = True,
+        capacity: int = Config.BLOOM_FILTER_CAPACITY,
+        error_rate: float = Config.BLOOM_FILTER_ERROR_RATE,
+    ):
+        self.engine = engine
+        self.enabled = enabled
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self._filter: Optional[BloomFilter] = None
+        # Codes added while a rebuild is scanning the table
+        self._added_during_rebuild: Optional[List[str]] = None
+        self._lock = threading.Lock()
+        self._rebuild_lock = threading.Lock()
+        self.rebuilds = 0
+        self.rejected = 0
+
+    def _get_engines(self) -> List[Engine]:
+        if self.engine is not None:
+            return [self.engine]
+        from app.database import url_engines
+        return url_engines()
+
+    def add(self, short_url: str) -> None:
+        """
+        Record a newly committed short code.
+        """
+        with self._lock:
+            if self._filter is not None:
+                self._filter.add(short_url)
+            if self._added_during_rebuild is not None:
+                self._added_during_rebuild.append(short_url)
+
+    def on_purge(self, short_urls: List[str], reason: str) -> None:
+        """
+        Purge-log listener adding codes any worker logged as created.
+        """
+        if reason == "create":
+            for short_url in short_urls:
+                self.add(short_url)
+
+    def might_contain(self, short_url: str) -> bool:
+        """
+        False only if `short_url` is certainly not in the urls table.
+        """
+        current = self._filter
+        if not self.enabled or current is None:
+            return True
+        with self._lock:
+            present = short_url in current
+            if not present:
+                self.rejected += 1
+        return present
+
+    def rebuild(self) -> int:
+        """
+        Rebuild the filter from the urls table and swap it in; returns the code count.
+        """
+        if not self.enabled:
+            return 0
+        with self._rebuild_lock:
+            with self._lock:
+                self._added_during_rebuild = []
+            try:
+                engines = self._get_engines()
+                total = 0
+                for engine in engines:
+                    with engine.connect() as conn:
+                        total += conn.execute(select(func.count()).select_from(DBUrl)).scalar_one()
+                # Leave headroom so codes created before the next rebuild
+                # do not push the false-positive rate over the target
+                fresh = BloomFilter(max(self.capacity, total * 2), self.error_rate)
+                for engine in engines:
+                    with engine.connect() as conn:
+                        rows = conn.execution_options(stream_results=True, yield_per=10000).execute(
+                            select(DBUrl.short_url)
+                        )
+                        for short_url in rows.scalars():
+                            fresh.add(short_url)
+                with self._lock:
+                    for short_url in self._added_during_rebuild:
+                        fresh.add(short_url)
+                    self._filter = fresh
+            finally:
+                with self._lock:
+                    self._added_during_rebuild = None
+            self.rebuilds += 1
+            logger.info("Rebuilt short-code Bloom filter with %d codes", fresh.count)
+            return fresh.count
+
+    def stats(self) -> dict:
+        current = self._filter
+        return {
+            "enabled": self.enabled,
+            "ready": current is not None,
+            "codes": current.count if current else 0,
+            "size_bytes": len(current.bits) if current else 0,
+            "hash_count": current.hash_count if current else 0,
+            "rebuilds": self.rebuilds,
+            "rejected": self.rejected,
+        }
+
+
+short_code_filter = ShortCodeFilter(enabled=Config.BLOOM_FILTER_ENABLED)
@@ -0,0 +1,288 @@
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional
+
+import orjson
+from starlette.concurrency import run_in_threadpool
+
+from app.database.shared_cache import create_backend
+from config import Config
+
+
+class CachedUrl:
+    """
+    Redirect cache entry: the target plus the limits checked on every hit.
+
+    `expires_at` is a Unix timestamp, `status` the link's own redirect
+    status (None for the configured default) and `user_id` its owner, so
+    links of deleted accounts stop resolving even while cached. `clicks` starts from the stored count
+    when the entry is loaded and grows with every redirect served from it, so
+    `max_clicks` holds exactly within one worker; other workers can overshoot
+    it by the clicks they serve before their own entry is reloaded.
+    """
+
+    __slots__ = ("long_url", "expires_at", "max_clicks", "clicks", "status", "user_id")
+
+    _lock = threading.Lock()
+
+    def __init__(
+        self,
+        long_url: str,
+        expires_at: Optional[float] = None,
+        max_clicks: Optional[int] = None,
+        clicks: int = 0,
+        status: Optional[int] = None,
+        user_id: Optional[int] = None,
+    ):
+        self.long_url = long_url
+        self.expires_at = expires_at
+        self.max_clicks = max_clicks
+        self.clicks = clicks
+        self.status = status
+        self.user_id = user_id
+
+    def claim(self) -> bool:
+        """
+        Count one redirect; False (and nothing counted) once the link expired or ran out of clicks.
+        """
+        if self.expires_at is not None and self.expires_at <= time.time():
+            return False
+        if self.max_clicks is None:
+            return True
+        with self._lock:
+            if self.clicks >= self.max_clicks:
+                return False
+            self.clicks += 1
+            return True
+
+    def encode(self) -> bytes:
+        """
+        Serialized form for a shared backend; only entries without max_clicks are shared.
+        """
+        return orjson.dumps((self.long_url, self.expires_at, self.status, self.user_id))
+
+    @classmethod
+    def decode(cls, data: bytes) -> "CachedUrl":
+        # Entries written before user_id was added have three fields until they expire
+        long_url, expires_at, status, user_id = (*orjson.loads(data), None)[:4]
+        return cls(long_url, expires_at, status=status, user_id=user_id)
+
+
+class LRUCache:
+    """
+    Thread-safe, size-bounded LRU cache whose entries expire after a fixed TTL.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Return the cached value for `key`, or None if it is missing or expired.
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """
+        Store `value` under `key`, evicting the least recently used entry if full.
+        """
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        """
+        Drop `key` from the cache if present.
+        """
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """
+        Drop every entry (counters are kept).
+        """
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return hit/miss/eviction counters and current occupancy.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class UrlCache:
+    """
+    Redirect cache: a process-local LRUCache, optionally backed by a tier shared by every worker.
+
+    Entries with max_clicks stay process-local, because their click count is
+    only exact where it is incremented. Invalidations delete the shared entry
+    and are broadcast so every worker drops its local copy: over pub/sub when
+    the backend has it, otherwise through PurgeLog.follow() (wired up in the
+    app lifespan).
+
+    Codes invalidated in the last `purge_window` seconds are reported by
+    `recently_purged`, so a cache miss on them is refilled from the primary
+    rather than from a replica that may still hold the old row.
+    """
+
+    def __init__(self, local: LRUCache, shared=None, purge_window: float = Config.READ_YOUR_WRITES_WINDOW):
+        self.local = local
+        self.shared = shared
+        self.purge_window = purge_window
+        self.shared_hits = 0
+        # Code -> monotonic time its purge window ends, oldest first
+        self._purged: "OrderedDict[str, float]" = OrderedDict()
+        self._purged_lock = threading.Lock()
+
+    def start(self) -> bool:
+        """
+        Start receiving other workers' invalidations; False if the backend cannot deliver them.
+        """
+        return self.shared is not None and self.shared.listen(self._forget)
+
+    def _forget(self, key: str) -> None:
+        self.local.invalidate(key)
+        if self.purge_window <= 0:
+            return
+        now = time.monotonic()
+        with self._purged_lock:
+            self._purged.pop(key, None)
+            self._purged[key] = now + self.purge_window
+            while next(iter(self._purged.values())) <= now:
+                self._purged.popitem(last=False)
+
+    def recently_purged(self, key: str) -> bool:
+        """
+        True if `key` was invalidated (by any worker, as far as this one knows) within the purge window.
+        """
+        deadline = self._purged.get(key)
+        return deadline is not None and deadline > time.monotonic()
+
+    def _get_shared(self, key: str) -> Optional[CachedUrl]:
+        data = self.shared.get(key)
+        if data is None:
+            return None
+        value = CachedUrl.decode(data)
+        self.shared_hits += 1
+        if self.shared.fronted:
+            self.local.set(key, value)
+        return value
+
+    def get_nowait(self, key: str) -> Optional[CachedUrl]:
+        """
+        Look `key` up in the tiers that answer without a network round trip.
+        """
+        value = self.local.get(key)
+        if value is None and self.shared is not None and not self.shared.blocking:
+            value = self._get_shared(key)
+        return value
+
+    def get(self, key: str) -> Optional[CachedUrl]:
+        """
+        Look `key` up in every tier, blocking on a remote backend (sync handlers only).
+        """
+        value = self.get_nowait(key)
+        if value is None and self.shared is not None and self.shared.blocking:
+            value = self._get_shared(key)
+        return value
+
+    async def get_async(self, key: str) -> Optional[CachedUrl]:
+        """
+        Like `get`, with the remote lookup in the threadpool so the event loop never waits on it.
+        """
+        value = self.get_nowait(key)
+        if value is None and self.shared is not None and self.shared.blocking:
+            value = await run_in_threadpool(self._get_shared, key)
+        return value
+
+    def set(self, key: str, value: CachedUrl) -> None:
+        if self.shared is None or value.max_clicks is not None:
+            self.local.set(key, value)
+            return
+        self.shared.set(key, value.encode())
+        if self.shared.fronted:
+            self.local.set(key, value)
+
+    def invalidate(self, key: str) -> None:
+        """
+        Drop `key` here and from the shared tier, and tell the other workers.
+        """
+        self._forget(key)
+        if self.shared is not None:
+            self.shared.delete(key)
+            self.shared.publish(key)
+
+    def drop_local(self, keys: List[str], reason: str = "") -> None:
+        """
+        Purge-log listener: forget local copies of codes changed by any worker.
+        """
+        for key in keys:
+            self._forget(key)
+
+    def clear(self) -> None:
+        self.local.clear()
+        if self.shared is not None:
+            self.shared.clear()
+
+    def close(self) -> None:
+        if self.shared is not None:
+            self.shared.close()
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self.local.stats()
+        stats["backend"] = self.shared.name if self.shared is not None else "memory"
+        if self.shared is not None:
+            stats["shared_hits"] = self.shared_hits
+            stats.update({f"shared_{name}": value for name, value in self.shared.stats().items()})
+        return stats
+
+    def __len__(self) -> int:
+        return len(self.local)
+
+
+# Short code -> CachedUrl; the local tier is shared by every request handled in this process
+url_cache = UrlCache(LRUCache(maxsize=Config.URL_CACHE_SIZE, ttl=Config.URL_CACHE_TTL), create_backend())
+
+# User id -> AuthenticatedUser, lets get_current_user skip the users query
+user_cache = LRUCache(maxsize=Config.USER_CACHE_SIZE, ttl=Config.USER_CACHE_TTL)
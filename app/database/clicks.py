@@ -0,0 +1,160 @@
+import logging
+import threading
+from datetime import datetime, timezone
+from operator import itemgetter
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import update
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+
+from app.database.models import DBUrlStats
+from app.database.shards import SHARDED, group_by_shard
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class ClickBuffer:
+    """
+    Aggregates redirect clicks in memory and flushes them as batched UPSERTs.
+
+    `record` is a dict update under a lock, so the redirect path never waits
+    on the database; `flush` is called periodically and on shutdown.
+    """
+
+    def __init__(self, engine: Optional[Engine] = None, enabled: bool = True):
+        self.engine = engine
+        self.enabled = enabled
+        self._pending: Dict[str, Tuple[int, datetime]] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self.flushed_clicks = 0
+        self.flushes = 0
+
+    def _engine_groups(self, rows: List[dict]) -> List[Tuple[Engine, List[dict]]]:
+        """
+        Split rows by the engine holding their short code (the shard, when sharded).
+        """
+        if self.engine is not None or not SHARDED:
+            if self.engine is None:
+                from app.database import engine
+                self.engine = engine
+            return [(self.engine, rows)]
+        from app.database import shard_engines
+        return [
+            (shard_engines[shard_id], shard_rows)
+            for shard_id, shard_rows in group_by_shard(rows, itemgetter("short_url")).items()
+        ]
+
+    def record(self, short_url: str) -> None:
+        """
+        Count one click for `short_url`.
+        """
+        if not self.enabled:
+            return
+        now = datetime.now(timezone.utc)
+        with self._lock:
+            count, _ = self._pending.get(short_url, (0, now))
+            self._pending[short_url] = (count + 1, now)
+
+    def pending(self, short_url: str) -> Tuple[int, Optional[datetime]]:
+        """
+        Return clicks for `short_url` that are buffered but not yet flushed.
+        """
+        with self._lock:
+            return self._pending.get(short_url, (0, None))
+
+    def discard(self, short_url: str) -> None:
+        """
+        Forget buffered clicks for a deleted short code.
+        """
+        with self._lock:
+            self._pending.pop(short_url, None)
+
+    def _merge_back(self, batch: Dict[str, Tuple[int, datetime]]) -> None:
+        with self._lock:
+            for short_url, (count, last_seen) in batch.items():
+                pending_count, pending_last = self._pending.get(short_url, (0, last_seen))
+                self._pending[short_url] = (count + pending_count, max(last_seen, pending_last))
+
+    def flush(self) -> int:
+        """
+        Write all buffered clicks to url_stats and return how many were flushed.
+        """
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+            if not batch:
+                return 0
+
+            rows = [
+                {"short_url": short_url, "clicks": count, "last_accessed_at": last_seen}
+                for short_url, (count, last_seen) in batch.items()
+            ]
+            clicks = 0
+            for engine, group in self._engine_groups(rows):
+                try:
+                    with engine.begin() as conn:
+                        upsert_click_rows(conn, group)
+                except Exception:
+                    # Keep the counts for the next attempt rather than dropping them
+                    self._merge_back({row["short_url"]: batch[row["short_url"]] for row in group})
+                    logger.exception("Failed to flush %d click counters", len(group))
+                    continue
+                clicks += sum(row["clicks"] for row in group)
+            if not clicks:
+                return 0
+
+            self.flushed_clicks += clicks
+            self.flushes += 1
+            return clicks
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "pending_codes": len(self._pending),
+                "pending_clicks": sum(count for count, _ in self._pending.values()),
+                "flushed_clicks": self.flushed_clicks,
+                "flushes": self.flushes,
+            }
+
+
+def upsert_click_rows(conn: Connection, rows: List[dict]) -> None:
+    """
+    Add click deltas to url_stats with one executemany UPSERT for the dialect.
+    """
+    table = DBUrlStats.__table__
+    dialect = conn.dialect.name
+
+    if dialect in ("sqlite", "postgresql"):
+        module = sqlite if dialect == "sqlite" else postgresql
+        stmt = module.insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.short_url],
+            set_={
+                "clicks": table.c.clicks + stmt.excluded.clicks,
+                "last_accessed_at": stmt.excluded.last_accessed_at,
+            },
+        )
+        conn.execute(stmt, rows)
+    elif dialect in ("mysql", "mariadb"):
+        stmt = mysql.insert(table)
+        stmt = stmt.on_duplicate_key_update(
+            clicks=table.c.clicks + stmt.inserted.clicks,
+            last_accessed_at=stmt.inserted.last_accessed_at,
+        )
+        conn.execute(stmt, rows)
+    else:
+        # Portable fallback: UPDATE existing rows, INSERT the rest
+        for row in rows:
+            result = conn.execute(
+                update(table)
+                .where(table.c.short_url == row["short_url"])
+                .values(clicks=table.c.clicks + row["clicks"], last_accessed_at=row["last_accessed_at"])
+            )
+            if result.rowcount == 0:
+                conn.execute(table.insert().values(**row))
+
+
+click_buffer = ClickBuffer(enabled=Config.CLICK_TRACKING)
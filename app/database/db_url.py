@@ -1,38 +1,353 @@
-import hashlib
+import heapq
 import base64
-from typing import List
+import binascii
+from contextlib import ExitStack
+from datetime import datetime, timezone
+from itertools import islice
+from operator import attrgetter, itemgetter
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
 
-from sqlalchemy.orm import Session
+from sqlalchemy import Insert, Row, Select, insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.sql.compiler import InsertmanyvaluesSentinelOpts
+from sqlalchemy.ext.asyncio import AsyncSession
+import orjson
+from pydantic import BaseModel
 from fastapi import HTTPException, status
 
-from app.database.models import DBUrl
+from app.database import ShardSessionLocals, url_read_engine
+from app.database.models import DBUrl, DBUrlStats
+from app.database.account_purge import account_purger
+from app.database.bloom import short_code_filter
+from app.database.cache import CachedUrl, url_cache
+from app.database.clicks import click_buffer
+from app.database.allocator import HashAllocator, allocator, url_id_allocator
+from app.database.normalize import long_url_hash
+from app.database.purge import purge_log
+from app.database.shards import SHARDED, fan_out, group_by_shard
+from app.responses import ORJSON_OPTIONS
 from config import Config
 
 
+# Everything UrlDisplay serializes; list, details and export select only these
+URL_DISPLAY_COLUMNS = (
+    DBUrl.id, DBUrl.short_url, DBUrl.long_url, DBUrl.description, DBUrl.expires_at, DBUrl.max_clicks,
+    DBUrl.redirect_status
+)
+
+
 def generate_short_code(original_url: str) -> str:
     """
     Generate a base64-encoded SHA-256 hash and truncate to the configured length.
     """
-    sha256 = hashlib.sha256(original_url.encode()).digest()
-    encoded = base64.urlsafe_b64encode(sha256).decode().rstrip("=")
-    return encoded[:Config.SHORT_URL_LENGTH]
+    return HashAllocator(Config.SHORT_URL_LENGTH).allocate(original_url)
+
+
+def next_url_id() -> Optional[int]:
+    """
+    Explicit id for a new URL when sharded; None lets the database assign one.
+    """
+    return url_id_allocator.next_id() if url_id_allocator is not None else None
+
+
+def as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """
+    Normalize a datetime to aware UTC; naive values (e.g. from SQLite) are taken as UTC.
+    """
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+# Default of update_url's optional fields: leave the column as it is (None clears it)
+UNCHANGED: Any = object()
+
+# Without click tracking, redirects are only counted in the worker's cached copy,
+# which starts again from zero whenever the entry is reloaded
+MAX_CLICKS_UNTRACKED = "max_clicks needs CLICK_TRACKING to be enabled."
+
+
+def check_max_clicks(max_clicks: Optional[int]) -> None:
+    """
+    Reject a click limit that could not be enforced with click tracking turned off.
+    """
+    if max_clicks is not None and not Config.CLICK_TRACKING:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=MAX_CLICKS_UNTRACKED)
 
 
-def create_url(long_url: str, db: Session, user_id: int, description: str = "") -> DBUrl:
+def existing_urls_statement(user_id: int, hashes: Sequence[str]) -> Select:
     """
-    Create a shortened URL entry in the database.
+    A user's plain links (no expiry, click limit or own redirect status) whose normalized destination is in `hashes`.
     """
-    short_code = generate_short_code(long_url)
-    new_url = DBUrl(
-        long_url=long_url,
-        short_url=short_code,
-        description=description,
-        user_id=user_id
+    return (
+        select(DBUrl)
+        .where(
+            DBUrl.user_id == user_id,
+            DBUrl.long_url_hash.in_(hashes),
+            DBUrl.expires_at.is_(None),
+            DBUrl.max_clicks.is_(None),
+            DBUrl.redirect_status.is_(None),
+        )
+        .order_by(DBUrl.id)
+    )
+
+
+def find_existing_urls(user_id: int, hashes: Sequence[str], db: Session, limit: Optional[int] = None) -> List[DBUrl]:
+    """
+    The user's links matched by existing_urls_statement, oldest first.
+
+    When sharded, every shard is queried concurrently and the results merged
+    by id, so the same link is found whichever shard answers first.
+    """
+    statement = existing_urls_statement(user_id, hashes)
+    if limit is not None:
+        statement = statement.limit(limit)
+    if SHARDED:
+        def load(shard_id: str) -> List[DBUrl]:
+            with ShardSessionLocals[shard_id]() as shard_db:
+                return shard_db.scalars(statement).all()
+
+        return list(islice(heapq.merge(*fan_out(load), key=attrgetter("id")), limit))
+    return db.scalars(statement).all()
+
+
+def create_url(
+    long_url: str,
+    db: Session,
+    user_id: int,
+    description: str = "",
+    expires_at: Optional[datetime] = None,
+    max_clicks: Optional[int] = None,
+    redirect_status: Optional[int] = None
+) -> DBUrl:
+    """
+    Create a shortened URL entry in the database, retrying on short-code collisions.
+
+    If the user already has a plain link to the same normalized destination,
+    and no limits or redirect status are asked for, that link is returned instead.
+    """
+    check_max_clicks(max_clicks)
+    url_hash = long_url_hash(long_url)
+    if expires_at is None and max_clicks is None and redirect_status is None:
+        existing = find_existing_urls(user_id, [url_hash], db, limit=1)
+        if existing:
+            return existing[0]
+
+    for attempt in range(Config.SHORT_CODE_MAX_ATTEMPTS):
+        new_url = DBUrl(
+            id=next_url_id(),
+            long_url=long_url,
+            short_url=allocator.allocate(long_url, attempt),
+            description=description,
+            user_id=user_id,
+            expires_at=as_utc(expires_at),
+            max_clicks=max_clicks,
+            redirect_status=redirect_status,
+            long_url_hash=url_hash
+        )
+        db.add(new_url)
+        if short_code_filter.enabled:
+            db.add_all(purge_log.entries([new_url.short_url], "create"))
+        try:
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            continue
+        db.refresh(new_url)
+        if short_code_filter.enabled:
+            purge_log.notify([new_url.short_url], "create")
+        return new_url
+
+    raise HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail="Could not allocate a unique short code."
     )
-    db.add(new_url)
-    db.commit()
-    db.refresh(new_url)
-    return new_url
+
+
+def prepare_bulk_rows(
+    items: List[Tuple[int, Union[BaseModel, str]]],
+    user_id: int
+) -> Tuple[List[dict], List[Tuple[int, dict]]]:
+    """
+    Split parsed bulk items into error results and insertable rows with fresh short codes.
+    """
+    errors, pending = [], []
+    for index, item in items:
+        if isinstance(item, str):
+            errors.append({"index": index, "status": "error", "detail": item})
+            continue
+        if item.max_clicks is not None and not Config.CLICK_TRACKING:
+            errors.append({"index": index, "status": "error", "detail": MAX_CLICKS_UNTRACKED})
+            continue
+        row = {
+            "long_url": item.long_url,
+            "short_url": allocator.allocate(item.long_url),
+            "description": item.description,
+            "user_id": user_id,
+            "expires_at": as_utc(item.expires_at),
+            "max_clicks": item.max_clicks,
+            "redirect_status": item.redirect_status,
+            "long_url_hash": long_url_hash(item.long_url),
+        }
+        if url_id_allocator is not None:
+            row["id"] = url_id_allocator.next_id()
+        pending.append((index, row))
+    return errors, pending
+
+
+def is_plain(row: dict) -> bool:
+    """
+    Whether a bulk row may reuse an existing link: no limits and no redirect status of its own.
+    """
+    return row["expires_at"] is None and row["max_clicks"] is None and row["redirect_status"] is None
+
+
+def dedupe_hashes(pending: Iterable[Tuple[int, dict]]) -> List[str]:
+    """
+    Destination hashes of the bulk rows that may reuse an existing link.
+    """
+    return list({row["long_url_hash"] for _, row in pending if is_plain(row)})
+
+
+def split_duplicates(
+    pending: List[Tuple[int, dict]],
+    existing: Iterable[DBUrl]
+) -> Tuple[List[dict], List[Tuple[int, dict]], List[Tuple[int, int]]]:
+    """
+    Separate bulk rows the user already has a link for, or that repeat an earlier row of the chunk.
+
+    Returns results for the known destinations, the rows still to insert, and
+    (index, earlier index) pairs for in-chunk repeats to resolve after insert.
+    """
+    known: Dict[str, DBUrl] = {}
+    for url in existing:
+        known.setdefault(url.long_url_hash, url)
+    results, fresh, repeats, first_index = [], [], [], {}
+    for index, row in pending:
+        if is_plain(row):
+            url_hash = row["long_url_hash"]
+            if url_hash in known:
+                url = known[url_hash]
+                results.append(created_result(index, url.id, url.short_url, url.long_url, "existing"))
+                continue
+            if url_hash in first_index:
+                repeats.append((index, first_index[url_hash]))
+                continue
+            first_index[url_hash] = index
+        fresh.append((index, row))
+    return results, fresh, repeats
+
+
+def finish_bulk_results(results: List[dict], repeats: List[Tuple[int, int]]) -> List[dict]:
+    """
+    Give in-chunk repeats the outcome of the row they repeat and order results by index.
+    """
+    by_index = {result["index"]: result for result in results}
+    for index, first in repeats:
+        original = by_index[first]
+        status = "existing" if original["status"] == "created" else original["status"]
+        results.append({**original, "index": index, "status": status})
+    return sorted(results, key=lambda result: result["index"])
+
+
+def insert_many_statement(db: Union[Session, AsyncSession]) -> Tuple[Insert, bool]:
+    """
+    Build the bulk INSERT for DBUrl, using ordered RETURNING where the dialect supports it.
+
+    Ordered RETURNING needs a sentinel to match returned ids to parameter
+    rows; dialects that cannot use the autoincrement key as one (SQLite)
+    would run an INSERT per row, so they get a plain executemany and the
+    caller looks the ids up afterwards.
+    """
+    dialect = db.get_bind(DBUrl.__mapper__).dialect
+    if (
+        dialect.insert_executemany_returning_sort_by_parameter_order
+        and dialect.insertmanyvalues_implicit_sentinel & InsertmanyvaluesSentinelOpts.AUTOINCREMENT
+    ):
+        return insert(DBUrl).returning(DBUrl.id, sort_by_parameter_order=True), True
+    return insert(DBUrl), False
+
+
+def created_result(index: int, url_id: int, short_url: str, long_url: str, status: str = "created") -> dict:
+    return {
+        "index": index,
+        "status": status,
+        "id": url_id,
+        "short_url": short_url,
+        "long_url": long_url,
+    }
+
+
+def create_urls_bulk(
+    items: List[Tuple[int, Union[BaseModel, str]]],
+    user_id: int,
+    db: Session
+) -> List[dict]:
+    """
+    Insert one chunk of bulk items with a single executemany INSERT and commit.
+
+    Items whose destination the user already has a link for (see create_url)
+    are answered with that link and status "existing", found with one query
+    per chunk. If the chunk hits a unique violation it is rolled back and
+    retried row by row through create_url, so conflicts are reported per item.
+    """
+    results, pending = prepare_bulk_rows(items, user_id)
+    hashes = dedupe_hashes(pending)
+    existing = find_existing_urls(user_id, hashes, db) if hashes else []
+    known, pending, repeats = split_duplicates(pending, existing)
+    results.extend(known)
+    if pending:
+        rows = [row for _, row in pending]
+        codes = [row["short_url"] for row in rows]
+        statement, returns_ids = insert_many_statement(db)
+        try:
+            if SHARDED:
+                # Ids were assigned up front; one Core executemany per shard
+                for shard_id, shard_rows in group_by_shard(rows, itemgetter("short_url")).items():
+                    db.execute(insert(DBUrl.__table__), shard_rows, bind_arguments={"shard_id": shard_id})
+                ids = [row["id"] for row in rows]
+            elif returns_ids:
+                ids = db.execute(statement, rows).scalars().all()
+            else:
+                db.execute(statement, rows)
+                by_code = dict(db.execute(
+                    select(DBUrl.short_url, DBUrl.id).where(DBUrl.short_url.in_(codes))
+                ).all())
+                ids = [by_code[code] for code in codes]
+            if short_code_filter.enabled:
+                db.add_all(purge_log.entries(codes, "create"))
+            db.commit()
+            if short_code_filter.enabled:
+                purge_log.notify(codes, "create")
+            results.extend(
+                created_result(index, url_id, row["short_url"], row["long_url"])
+                for (index, row), url_id in zip(pending, ids)
+            )
+        except IntegrityError:
+            db.rollback()
+            for index, row in pending:
+                try:
+                    url = create_url(
+                        long_url=row["long_url"],
+                        description=row["description"],
+                        user_id=user_id,
+                        db=db,
+                        expires_at=row["expires_at"],
+                        max_clicks=row["max_clicks"],
+                        redirect_status=row["redirect_status"]
+                    )
+                    results.append(created_result(index, url.id, url.short_url, url.long_url))
+                except HTTPException as exc:
+                    results.append({
+                        "index": index,
+                        "status": "error",
+                        "long_url": row["long_url"],
+                        "detail": exc.detail,
+                    })
+    return finish_bulk_results(results, repeats)
 
 
 def get_url(short_url: str, db: Session) -> DBUrl:
@@ -45,23 +360,228 @@ def get_url(short_url: str, db: Session) -> DBUrl:
     return url
 
 
-def get_user_urls(user_id: int, skip: int, limit: int, db: Session) -> List[DBUrl]:
+def details_statement(short_url: str) -> Select:
+    """
+    UrlDisplay columns of one URL plus its flushed stats, in a single query.
+    """
+    return (
+        select(*URL_DISPLAY_COLUMNS, DBUrl.user_id, DBUrlStats.clicks, DBUrlStats.last_accessed_at)
+        .outerjoin(DBUrlStats, DBUrlStats.short_url == DBUrl.short_url)
+        .where(DBUrl.short_url == short_url)
+    )
+
+
+def url_details(row: Optional[Row]) -> dict:
+    """
+    Merge a details_statement row with any clicks still buffered in this process.
+    """
+    if row is None or account_purger.is_deleted(row.user_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="URL not found.")
+    details = row._asdict()
+    del details["user_id"]
+    pending_clicks, pending_last = click_buffer.pending(row.short_url)
+    last_accessed = as_utc(row.last_accessed_at)
+    if pending_last and (last_accessed is None or pending_last > last_accessed):
+        last_accessed = pending_last
+    details["expires_at"] = as_utc(row.expires_at)
+    details["clicks"] = (row.clicks or 0) + pending_clicks
+    details["last_accessed_at"] = last_accessed
+    return details
+
+
+def get_url_details(short_url: str, db: Session) -> dict:
+    """
+    Retrieve a URL together with its click count and last access time.
+    """
+    return url_details(db.execute(details_statement(short_url)).first())
+
+
+def redirect_statement(short_url: str) -> Select:
+    """
+    The single query behind an uncached redirect: target, limits, status and flushed click count.
+    """
+    return (
+        select(
+            DBUrl.long_url, DBUrl.expires_at, DBUrl.max_clicks, DBUrlStats.clicks, DBUrl.redirect_status,
+            DBUrl.user_id,
+        )
+        .outerjoin(DBUrlStats, DBUrlStats.short_url == DBUrl.short_url)
+        .where(DBUrl.short_url == short_url)
+    )
+
+
+def cached_url(short_url: str, row: Row) -> CachedUrl:
     """
-    Return a paginated list of URLs created by a specific user.
+    Build the cache entry for a redirect_statement row, counting clicks still buffered here.
     """
-    return db.query(DBUrl).filter(DBUrl.user_id == user_id).offset(skip).limit(limit).all()
+    long_url, expires_at, max_clicks, clicks, redirect_status, user_id = row
+    expires_at = as_utc(expires_at)
+    return CachedUrl(
+        long_url,
+        expires_at.timestamp() if expires_at is not None else None,
+        max_clicks,
+        (clicks or 0) + click_buffer.pending(short_url)[0],
+        redirect_status,
+        user_id,
+    )
+
+
+def claim_redirect(target: CachedUrl) -> CachedUrl:
+    """
+    Count a redirect against the link's limits and return it, or 410 once it has lapsed.
+
+    Links of a deleted account answer 404 while the purger is still removing them.
+    """
+    if account_purger.is_deleted(target.user_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="URL not found.")
+    if not target.claim():
+        raise HTTPException(status_code=status.HTTP_410_GONE, detail="URL has expired.")
+    return target
+
+
+def resolve_url(short_url: str, db: Session) -> CachedUrl:
+    """
+    Resolve a short code to its redirect target, serving hot codes from the in-process cache
+    and rejecting codes the Bloom filter has never seen without querying.
+    """
+    target = url_cache.get(short_url)
+    if target is None:
+        if not short_code_filter.might_contain(short_url):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="URL not found.")
+        if url_cache.recently_purged(short_url):
+            # A replica may still have the row that was just invalidated; do not cache it again
+            with url_read_engine(short_url, primary=True).connect() as conn:
+                row = conn.execute(redirect_statement(short_url)).first()
+        else:
+            row = db.execute(redirect_statement(short_url)).first()
+        if row is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="URL not found.")
+        target = cached_url(short_url, row)
+        url_cache.set(short_url, target)
+    return claim_redirect(target)
+
+
+def encode_cursor(user_id: int, url_id: int) -> str:
+    """
+    Build an opaque pagination cursor pointing just past `url_id`.
+    """
+    return base64.urlsafe_b64encode(f"{user_id}:{url_id}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, user_id: int) -> int:
+    """
+    Decode a cursor issued by encode_cursor for the same user and return the last seen id.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        cursor_user_id, url_id = (int(part) for part in raw.split(":"))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor.")
+    if cursor_user_id != user_id:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor.")
+    return url_id
+
+
+def get_user_urls(
+    user_id: int,
+    skip: int,
+    limit: int,
+    db: Session,
+    after_id: Optional[int] = None
+) -> List[Row]:
+    """
+    Return a page of URLs created by a specific user, ordered by id, as UrlDisplay rows.
+
+    With `after_id` this is a keyset seek on (user_id, id), which costs the same
+    on every page; otherwise it falls back to OFFSET pagination. When sharded,
+    every shard is queried concurrently and the pages are merged by id.
+    """
+    if SHARDED:
+        offset = skip if after_id is None else 0
+        statement = page_statement(user_id, offset + limit, after_id)
+
+        def load(shard_id: str) -> List[Row]:
+            with ShardSessionLocals[shard_id]() as shard_db:
+                return shard_db.execute(statement).all()
+
+        merged = heapq.merge(*fan_out(load), key=attrgetter("id"))
+        return list(islice(merged, offset, offset + limit))
+
+    return db.execute(page_statement(user_id, limit, after_id, skip)).all()
+
+
+def page_statement(user_id: int, limit: int, after_id: Optional[int] = None, skip: int = 0) -> Select:
+    """
+    UrlDisplay columns of a user's URLs past `after_id` (or after `skip` rows), in id order.
+    """
+    query = select(*URL_DISPLAY_COLUMNS).where(DBUrl.user_id == user_id)
+    if after_id is not None:
+        query = query.where(DBUrl.id > after_id)
+    query = query.order_by(DBUrl.id)
+    if after_id is None and skip:
+        query = query.offset(skip)
+    return query.limit(limit)
+
+
+def export_statement(user_id: int) -> Select:
+    """
+    Columns written by the NDJSON export, in id order; re-importable as UrlData.
+    """
+    return select(*URL_DISPLAY_COLUMNS).where(DBUrl.user_id == user_id).order_by(DBUrl.id)
+
+
+def ndjson_lines(rows: Sequence[Row]) -> bytes:
+    return b"".join(orjson.dumps(row._asdict(), option=ORJSON_OPTIONS) + b"\n" for row in rows)
+
+
+def export_user_urls(
+    user_id: int,
+    session_factory: sessionmaker,
+    batch_size: int = Config.EXPORT_BATCH_SIZE
+) -> Iterator[bytes]:
+    """
+    Yield a user's URLs as NDJSON, one chunk per `batch_size` rows.
+
+    Opens its own session from `session_factory` because it outlives the
+    request's dependencies, and uses `yield_per` (a server-side cursor where
+    the driver supports it) so memory stays flat however many URLs there are.
+    """
+    statement = export_statement(user_id).execution_options(yield_per=batch_size)
+    if SHARDED:
+        # One open cursor per shard, merged by id as they stream
+        with ExitStack() as stack:
+            results = [
+                stack.enter_context(factory()).execute(statement)
+                for factory in ShardSessionLocals.values()
+            ]
+            merged = heapq.merge(*results, key=attrgetter("id"))
+            while rows := list(islice(merged, batch_size)):
+                yield ndjson_lines(rows)
+        return
+
+    with session_factory() as db:
+        for rows in db.execute(statement).partitions():
+            yield ndjson_lines(rows)
 
 
 def update_url(
     short_url: str,
-    new_long_url: str,
+    new_long_url: Optional[str],
     new_description: str,
     user_id: int,
-    db: Session
+    db: Session,
+    new_expires_at: Optional[datetime] = UNCHANGED,
+    new_max_clicks: Optional[int] = UNCHANGED,
+    new_redirect_status: Optional[int] = UNCHANGED
 ) -> DBUrl:
     """
-    Update a URL's long_url and description by short_url and user_id.
+    Update a URL's long_url (when given) and description by short_url and user_id.
+
+    Expiry, click limit and redirect status are only changed when passed;
+    passing None removes them.
     """
+    if new_max_clicks is not UNCHANGED:
+        check_max_clicks(new_max_clicks)
     url = db.query(DBUrl).filter(
         DBUrl.short_url == short_url,
         DBUrl.user_id == user_id
@@ -70,9 +590,20 @@ def update_url(
     if not url:
         raise HTTPException(status_code=404, detail="URL not found.")
 
-    url.long_url = new_long_url
+    if new_long_url is not None:
+        url.long_url = new_long_url
+        url.long_url_hash = long_url_hash(new_long_url)
     url.description = new_description
+    if new_expires_at is not UNCHANGED:
+        url.expires_at = as_utc(new_expires_at)
+    if new_max_clicks is not UNCHANGED:
+        url.max_clicks = new_max_clicks
+    if new_redirect_status is not UNCHANGED:
+        url.redirect_status = new_redirect_status
+    db.add_all(purge_log.entries([short_url], "update"))
     db.commit()
+    url_cache.invalidate(short_url)
+    purge_log.notify([short_url], "update")
     db.refresh(url)
     return url
 
@@ -90,5 +621,10 @@ def delete_url(short_url: str, user_id: int, db: Session) -> dict:
         raise HTTPException(status_code=404, detail="URL not found or unauthorized")
 
     db.delete(url)
+    db.query(DBUrlStats).filter(DBUrlStats.short_url == short_url).delete()
+    db.add_all(purge_log.entries([short_url], "delete"))
     db.commit()
+    url_cache.invalidate(short_url)
+    click_buffer.discard(short_url)
+    purge_log.notify([short_url], "delete")
     return {"message": "URL deleted."}
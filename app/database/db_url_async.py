@@ -0,0 +1,375 @@
+import asyncio
+import heapq
+from contextlib import AsyncExitStack
+from datetime import datetime
+from itertools import islice
+from operator import attrgetter, itemgetter
+from typing import AsyncIterator, List, Optional, Sequence, Tuple, Union
+
+from pydantic import BaseModel
+from sqlalchemy import Row, delete, insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from fastapi import HTTPException, status
+from starlette.concurrency import run_in_threadpool
+
+from app.database import AsyncShardSessionLocals, async_url_read_engine
+from app.database.models import DBUrl, DBUrlStats
+from app.database.bloom import short_code_filter
+from app.database.cache import CachedUrl, url_cache
+from app.database.clicks import click_buffer
+from app.database.allocator import allocator, url_id_allocator
+from app.database.db_url import (
+    UNCHANGED,
+    as_utc,
+    cached_url,
+    check_max_clicks,
+    claim_redirect,
+    created_result,
+    dedupe_hashes,
+    details_statement,
+    existing_urls_statement,
+    export_statement,
+    finish_bulk_results,
+    insert_many_statement,
+    ndjson_lines,
+    next_url_id,
+    page_statement,
+    prepare_bulk_rows,
+    redirect_statement,
+    split_duplicates,
+    url_details,
+)
+from app.database.normalize import long_url_hash
+from app.database.purge import purge_log
+from app.database.shards import SHARDED, group_by_shard, merge_async
+from config import Config
+
+
+async def allocate(long_url: str, attempt: int) -> Tuple[Optional[int], str]:
+    """
+    Explicit id (see next_url_id) and short code for a new URL.
+
+    Counter and pool allocators reserve blocks or claim codes with blocking
+    queries, so they run in the threadpool rather than on the event loop.
+    """
+    if allocator.blocking or url_id_allocator is not None:
+        return await run_in_threadpool(lambda: (next_url_id(), allocator.allocate(long_url, attempt)))
+    return None, allocator.allocate(long_url, attempt)
+
+
+async def find_existing_urls(
+    user_id: int,
+    hashes: Sequence[str],
+    db: AsyncSession,
+    limit: Optional[int] = None
+) -> List[DBUrl]:
+    """
+    The user's links matched by existing_urls_statement, oldest first (see db_url.find_existing_urls).
+    """
+    statement = existing_urls_statement(user_id, hashes)
+    if limit is not None:
+        statement = statement.limit(limit)
+    if SHARDED:
+        async def load(factory: async_sessionmaker) -> List[DBUrl]:
+            async with factory() as shard_db:
+                return (await shard_db.scalars(statement)).all()
+
+        found = await asyncio.gather(*(load(factory) for factory in AsyncShardSessionLocals.values()))
+        return list(islice(heapq.merge(*found, key=attrgetter("id")), limit))
+    return (await db.scalars(statement)).all()
+
+
+async def create_url(
+    long_url: str,
+    db: AsyncSession,
+    user_id: int,
+    description: str = "",
+    expires_at: Optional[datetime] = None,
+    max_clicks: Optional[int] = None,
+    redirect_status: Optional[int] = None
+) -> DBUrl:
+    """
+    Create a shortened URL entry in the database, retrying on short-code collisions.
+
+    If the user already has a plain link to the same normalized destination,
+    and no limits or redirect status are asked for, that link is returned instead.
+    """
+    check_max_clicks(max_clicks)
+    url_hash = long_url_hash(long_url)
+    if expires_at is None and max_clicks is None and redirect_status is None:
+        existing = await find_existing_urls(user_id, [url_hash], db, limit=1)
+        if existing:
+            return existing[0]
+
+    for attempt in range(Config.SHORT_CODE_MAX_ATTEMPTS):
+        url_id, short_url = await allocate(long_url, attempt)
+        new_url = DBUrl(
+            id=url_id,
+            long_url=long_url,
+            short_url=short_url,
+            description=description,
+            user_id=user_id,
+            expires_at=as_utc(expires_at),
+            max_clicks=max_clicks,
+            redirect_status=redirect_status,
+            long_url_hash=url_hash
+        )
+        db.add(new_url)
+        if short_code_filter.enabled:
+            db.add_all(purge_log.entries([new_url.short_url], "create"))
+        try:
+            await db.commit()
+        except IntegrityError:
+            await db.rollback()
+            continue
+        await db.refresh(new_url)
+        if short_code_filter.enabled:
+            purge_log.notify([new_url.short_url], "create")
+        return new_url
+
+    raise HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail="Could not allocate a unique short code."
+    )
+
+
+async def create_urls_bulk(
+    items: List[Tuple[int, Union[BaseModel, str]]],
+    user_id: int,
+    db: AsyncSession
+) -> List[dict]:
+    """
+    Insert one chunk of bulk items with a single executemany INSERT and commit.
+
+    Items whose destination the user already has a link for (see create_url)
+    are answered with that link and status "existing", found with one query
+    per chunk. If the chunk hits a unique violation it is rolled back and
+    retried row by row through create_url, so conflicts are reported per item.
+    """
+    # Allocating a chunk's codes may query the database (see allocate)
+    results, pending = await run_in_threadpool(prepare_bulk_rows, items, user_id)
+    hashes = dedupe_hashes(pending)
+    existing = await find_existing_urls(user_id, hashes, db) if hashes else []
+    known, pending, repeats = split_duplicates(pending, existing)
+    results.extend(known)
+    if pending:
+        rows = [row for _, row in pending]
+        codes = [row["short_url"] for row in rows]
+        statement, returns_ids = insert_many_statement(db)
+        try:
+            if SHARDED:
+                # Ids were assigned up front; one Core executemany per shard
+                for shard_id, shard_rows in group_by_shard(rows, itemgetter("short_url")).items():
+                    await db.execute(insert(DBUrl.__table__), shard_rows, bind_arguments={"shard_id": shard_id})
+                ids = [row["id"] for row in rows]
+            elif returns_ids:
+                ids = (await db.execute(statement, rows)).scalars().all()
+            else:
+                await db.execute(statement, rows)
+                by_code = dict((await db.execute(
+                    select(DBUrl.short_url, DBUrl.id).where(DBUrl.short_url.in_(codes))
+                )).all())
+                ids = [by_code[code] for code in codes]
+            if short_code_filter.enabled:
+                db.add_all(purge_log.entries(codes, "create"))
+            await db.commit()
+            if short_code_filter.enabled:
+                purge_log.notify(codes, "create")
+            results.extend(
+                created_result(index, url_id, row["short_url"], row["long_url"])
+                for (index, row), url_id in zip(pending, ids)
+            )
+        except IntegrityError:
+            await db.rollback()
+            for index, row in pending:
+                try:
+                    url = await create_url(
+                        long_url=row["long_url"],
+                        description=row["description"],
+                        user_id=user_id,
+                        db=db,
+                        expires_at=row["expires_at"],
+                        max_clicks=row["max_clicks"],
+                        redirect_status=row["redirect_status"]
+                    )
+                    results.append(created_result(index, url.id, url.short_url, url.long_url))
+                except HTTPException as exc:
+                    results.append({
+                        "index": index,
+                        "status": "error",
+                        "long_url": row["long_url"],
+                        "detail": exc.detail,
+                    })
+    return finish_bulk_results(results, repeats)
+
+
+async def get_url(short_url: str, db: AsyncSession) -> DBUrl:
+    """
+    Retrieve the original URL by its shortened code.
+    """
+    result = await db.execute(select(DBUrl).where(DBUrl.short_url == short_url))
+    url = result.scalars().first()
+    if not url:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="URL not found.")
+    return url
+
+
+async def get_url_details(short_url: str, db: AsyncSession) -> dict:
+    """
+    Retrieve a URL together with its click count and last access time.
+    """
+    return url_details((await db.execute(details_statement(short_url))).first())
+
+
+async def resolve_url(short_url: str, db: AsyncSession) -> CachedUrl:
+    """
+    Resolve a short code to its redirect target, serving hot codes from the in-process cache
+    and rejecting codes the Bloom filter has never seen without querying.
+    """
+    target = await url_cache.get_async(short_url)
+    if target is None:
+        if not short_code_filter.might_contain(short_url):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="URL not found.")
+        if url_cache.recently_purged(short_url):
+            # A replica may still have the row that was just invalidated; do not cache it again
+            async with async_url_read_engine(short_url, primary=True).connect() as conn:
+                row = (await conn.execute(redirect_statement(short_url))).first()
+        else:
+            row = (await db.execute(redirect_statement(short_url))).first()
+        if row is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="URL not found.")
+        target = cached_url(short_url, row)
+        url_cache.set(short_url, target)
+    return claim_redirect(target)
+
+
+async def get_user_urls(
+    user_id: int,
+    skip: int,
+    limit: int,
+    db: AsyncSession,
+    after_id: Optional[int] = None
+) -> List[Row]:
+    """
+    Return a page of URLs created by a specific user, ordered by id, as UrlDisplay rows.
+
+    With `after_id` this is a keyset seek on (user_id, id), which costs the same
+    on every page; otherwise it falls back to OFFSET pagination. When sharded,
+    every shard is queried concurrently and the pages are merged by id.
+    """
+    if SHARDED:
+        offset = skip if after_id is None else 0
+        statement = page_statement(user_id, offset + limit, after_id)
+
+        async def load(factory: async_sessionmaker) -> List[Row]:
+            async with factory() as shard_db:
+                return (await shard_db.execute(statement)).all()
+
+        pages = await asyncio.gather(*(load(factory) for factory in AsyncShardSessionLocals.values()))
+        merged = heapq.merge(*pages, key=attrgetter("id"))
+        return list(islice(merged, offset, offset + limit))
+
+    return (await db.execute(page_statement(user_id, limit, after_id, skip))).all()
+
+
+async def export_user_urls(
+    user_id: int,
+    session_factory: async_sessionmaker,
+    batch_size: int = Config.EXPORT_BATCH_SIZE
+) -> AsyncIterator[bytes]:
+    """
+    Yield a user's URLs as NDJSON, one chunk per `batch_size` rows.
+
+    Streams from its own session (from `session_factory`) with a server-side
+    cursor where the driver supports it, so memory stays flat however many
+    URLs there are.
+    """
+    statement = export_statement(user_id).execution_options(yield_per=batch_size)
+    if SHARDED:
+        # One open cursor per shard, merged by id as they stream
+        async with AsyncExitStack() as stack:
+            results = []
+            for factory in AsyncShardSessionLocals.values():
+                shard_db = await stack.enter_async_context(factory())
+                results.append(aiter(await shard_db.stream(statement)))
+            rows = []
+            async for row in merge_async(results, key=attrgetter("id")):
+                rows.append(row)
+                if len(rows) >= batch_size:
+                    yield ndjson_lines(rows)
+                    rows = []
+            if rows:
+                yield ndjson_lines(rows)
+        return
+
+    async with session_factory() as db:
+        result = await db.stream(statement)
+        async for rows in result.partitions():
+            yield ndjson_lines(rows)
+
+
+async def update_url(
+    short_url: str,
+    new_long_url: Optional[str],
+    new_description: str,
+    user_id: int,
+    db: AsyncSession,
+    new_expires_at: Optional[datetime] = UNCHANGED,
+    new_max_clicks: Optional[int] = UNCHANGED,
+    new_redirect_status: Optional[int] = UNCHANGED
+) -> DBUrl:
+    """
+    Update a URL's long_url (when given) and description by short_url and user_id.
+
+    Expiry, click limit and redirect status are only changed when passed;
+    passing None removes them.
+    """
+    if new_max_clicks is not UNCHANGED:
+        check_max_clicks(new_max_clicks)
+    result = await db.execute(
+        select(DBUrl).where(DBUrl.short_url == short_url, DBUrl.user_id == user_id)
+    )
+    url = result.scalars().first()
+
+    if not url:
+        raise HTTPException(status_code=404, detail="URL not found.")
+
+    if new_long_url is not None:
+        url.long_url = new_long_url
+        url.long_url_hash = long_url_hash(new_long_url)
+    url.description = new_description
+    if new_expires_at is not UNCHANGED:
+        url.expires_at = as_utc(new_expires_at)
+    if new_max_clicks is not UNCHANGED:
+        url.max_clicks = new_max_clicks
+    if new_redirect_status is not UNCHANGED:
+        url.redirect_status = new_redirect_status
+    db.add_all(purge_log.entries([short_url], "update"))
+    await db.commit()
+    url_cache.invalidate(short_url)
+    purge_log.notify([short_url], "update")
+    await db.refresh(url)
+    return url
+
+
+async def delete_url(short_url: str, user_id: int, db: AsyncSession) -> dict:
+    """
+    Delete a URL if it belongs to the given user.
+    """
+    result = await db.execute(
+        select(DBUrl).where(DBUrl.short_url == short_url, DBUrl.user_id == user_id)
+    )
+    url = result.scalars().first()
+
+    if not url:
+        raise HTTPException(status_code=404, detail="URL not found or unauthorized")
+
+    await db.delete(url)
+    await db.execute(delete(DBUrlStats).where(DBUrlStats.short_url == short_url))
+    db.add_all(purge_log.entries([short_url], "delete"))
+    await db.commit()
+    url_cache.invalidate(short_url)
+    click_buffer.discard(short_url)
+    purge_log.notify([short_url], "delete")
+    return {"message": "URL deleted."}
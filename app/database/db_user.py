@@ -1,9 +1,13 @@
+from datetime import datetime, timezone
+
 from sqlalchemy.orm import Session
 from fastapi import HTTPException, status
 
-from app.schemas import UserDetails
+from app.schemas import AuthenticatedUser, UserDetails
 from app.database.models import DBUser
 from app.database.hash import Hash
+from app.database.cache import user_cache
+from app.database.account_purge import account_purger
 
 
 def check_email_address(db: Session, email: str) -> bool:
@@ -44,9 +48,12 @@ def create_user(db: Session, data: UserDetails) -> DBUser:
     return new_user
 
 
-def update_user(user: DBUser, email: str, password: str, db: Session) -> DBUser:
+def update_user(user: AuthenticatedUser, email: str, password: str, db: Session) -> DBUser:
     """
     Update user's email and/or password.
+
+    A password change bumps token_version, so tokens issued before it stop
+    working and the client has to log in again.
     """
     db_user = db.query(DBUser).filter(DBUser.id == user.id).first()
     if not db_user:
@@ -56,30 +63,39 @@ def update_user(user: DBUser, email: str, password: str, db: Session) -> DBUser:
         db_user.email = email
     if password:
         db_user.password = Hash.encrypt(password)
+        db_user.token_version += 1  # revoke tokens issued with the old password
 
     db.commit()
+    user_cache.invalidate(user.id)
     db.refresh(db_user)
     return db_user
 
 
-def delete_user(user: DBUser, db: Session) -> dict:
+def delete_user(user: AuthenticatedUser, db: Session) -> dict:
     """
-    Delete a user from the database.
+    Soft-delete a user: revoke their tokens and stop serving their URLs right away.
+
+    Only users.deleted_at is set here, so the request stays cheap however
+    many URLs the account owns; the account purger removes them in batches
+    and then the user row.
     """
-    db_user = db.query(DBUser).filter(DBUser.id == user.id).first()
+    db_user = db.query(DBUser).filter(DBUser.id == user.id, DBUser.deleted_at.is_(None)).first()
     if not db_user:
         raise HTTPException(status_code=404, detail="User not found.")
 
-    db.delete(db_user)
+    db_user.deleted_at = datetime.now(timezone.utc)
+    db_user.token_version += 1  # revoke every token issued so far
     db.commit()
-    return {"message": "User deleted."}
+    user_cache.invalidate(user.id)
+    account_purger.mark_deleted(user.id, db_user.deleted_at)
+    return {"message": "User deleted. Their URLs are being removed in the background."}
 
 
 def get_user(user_name: str, db: Session) -> DBUser:
     """
     Retrieve a user by username.
     """
-    user = db.query(DBUser).filter(DBUser.user_name == user_name).first()
+    user = db.query(DBUser).filter(DBUser.user_name == user_name, DBUser.deleted_at.is_(None)).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found.")
     return user
@@ -0,0 +1,107 @@
+from datetime import datetime, timezone
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import HTTPException, status
+
+from app.schemas import AuthenticatedUser, UserDetails
+from app.database.models import DBUser
+from app.database.hash import Hash
+from app.database.cache import user_cache
+from app.database.account_purge import account_purger
+
+
+async def check_email_address(db: AsyncSession, email: str) -> bool:
+    """
+    Check if a user with the given email exists.
+    """
+    result = await db.execute(select(DBUser.id).where(DBUser.email == email))
+    return result.first() is not None
+
+
+async def check_username_exist(db: AsyncSession, username: str) -> bool:
+    """
+    Check if a user with the given username exists.
+    """
+    result = await db.execute(select(DBUser.id).where(DBUser.user_name == username))
+    return result.first() is not None
+
+
+async def create_user(db: AsyncSession, data: UserDetails) -> DBUser:
+    """
+    Create a new user if email and username are unique.
+    """
+    if await check_email_address(db, data.email) or await check_username_exist(db, data.user_name):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Email or username already registered."
+        )
+
+    # bcrypt is CPU-bound, keep it off the event loop
+    hashed_password = await Hash.encrypt_async(data.password)
+
+    new_user = DBUser(
+        user_name=data.user_name,
+        email=data.email,
+        password=hashed_password
+    )
+    db.add(new_user)
+    await db.commit()
+    await db.refresh(new_user)
+    return new_user
+
+
+async def update_user(user: AuthenticatedUser, email: str, password: str, db: AsyncSession) -> DBUser:
+    """
+    Update user's email and/or password.
+
+    A password change bumps token_version, so tokens issued before it stop
+    working and the client has to log in again.
+    """
+    db_user = await db.get(DBUser, user.id)
+    if not db_user:
+        raise HTTPException(status_code=404, detail="User not found.")
+
+    if email:
+        db_user.email = email
+    if password:
+        db_user.password = await Hash.encrypt_async(password)
+        db_user.token_version += 1  # revoke tokens issued with the old password
+
+    await db.commit()
+    user_cache.invalidate(user.id)
+    await db.refresh(db_user)
+    return db_user
+
+
+async def delete_user(user: AuthenticatedUser, db: AsyncSession) -> dict:
+    """
+    Soft-delete a user: revoke their tokens and stop serving their URLs right away.
+
+    Only users.deleted_at is set here, so the request stays cheap however
+    many URLs the account owns; the account purger removes them in batches
+    and then the user row.
+    """
+    db_user = await db.get(DBUser, user.id)
+    if not db_user or db_user.deleted_at is not None:
+        raise HTTPException(status_code=404, detail="User not found.")
+
+    db_user.deleted_at = datetime.now(timezone.utc)
+    db_user.token_version += 1  # revoke every token issued so far
+    await db.commit()
+    user_cache.invalidate(user.id)
+    account_purger.mark_deleted(user.id, db_user.deleted_at)
+    return {"message": "User deleted. Their URLs are being removed in the background."}
+
+
+async def get_user(user_name: str, db: AsyncSession) -> DBUser:
+    """
+    Retrieve a user by username.
+    """
+    result = await db.execute(
+        select(DBUser).where(DBUser.user_name == user_name, DBUser.deleted_at.is_(None))
+    )
+    user = result.scalars().first()
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found.")
+    return user
@@ -1,6 +1,125 @@
+import asyncio
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Callable, Optional, Tuple
+
+from fastapi import HTTPException, status
 from passlib.context import CryptContext
 
-pwd_cxt = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from config import Config
+
+# min == max == default, so any hash made with a different cost "needs update"
+pwd_cxt = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=Config.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=Config.BCRYPT_ROUNDS,
+    bcrypt__max_rounds=Config.BCRYPT_ROUNDS,
+)
+
+
+def _hash_password(password: str) -> str:
+    return pwd_cxt.hash(password)
+
+
+def _verify_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    return pwd_cxt.verify_and_update(plain_password, hashed_password)
+
+
+class PasswordPool:
+    """
+    Size-limited process pool for bcrypt work.
+
+    bcrypt holds the GIL and a CPU core for the whole hash, so it runs in
+    separate processes instead of the shared request threadpool. At most
+    `max_pending` jobs may be queued or running; beyond that callers get an
+    immediate 503 instead of piling up behind a login burst. With
+    `workers=0` hashing runs inline in the calling thread.
+    """
+
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._count_lock = threading.Lock()
+        self.pending = 0
+        self.rejected = 0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            return self._executor
+
+    def _release(self, _: Optional[Future]) -> None:
+        with self._count_lock:
+            self.pending -= 1
+        self._slots.release()
+
+    def submit(self, fn: Callable, *args) -> Future:
+        """
+        Queue `fn(*args)` on the pool or raise 503 when the queue is full.
+        """
+        if not self._slots.acquire(blocking=False):
+            with self._count_lock:
+                self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Password service is busy, please retry shortly.",
+                headers={"Retry-After": "1"},
+            )
+        with self._count_lock:
+            self.pending += 1
+        if self.workers <= 0:
+            future: Future = Future()
+            try:
+                future.set_result(fn(*args))
+            except Exception as exc:
+                future.set_exception(exc)
+            self._release(future)
+            return future
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except Exception:
+            self._release(None)
+            raise
+        future.add_done_callback(self._release)
+        return future
+
+    def run(self, fn: Callable, *args):
+        """
+        Run `fn(*args)` on the pool and block the calling (worker) thread for the result.
+        """
+        return self.submit(fn, *args).result()
+
+    async def run_async(self, fn: Callable, *args):
+        """
+        Run `fn(*args)` on the pool without blocking the event loop.
+        """
+        return await asyncio.wrap_future(self.submit(fn, *args))
+
+    def shutdown(self) -> None:
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "pending": self.pending,
+            "rejected": self.rejected,
+        }
+
+
+password_pool = PasswordPool(
+    workers=Config.PASSWORD_POOL_WORKERS,
+    max_pending=Config.PASSWORD_POOL_MAX_PENDING,
+)
+
 
 class Hash:
     @staticmethod
@@ -8,11 +127,28 @@ class Hash:
         """
         Hash the given password using bcrypt.
         """
-        return pwd_cxt.hash(password)
+        return password_pool.run(_hash_password, password)
 
     @staticmethod
     def verify(plain_password: str, hashed_password: str) -> bool:
         """
         Verify a plaintext password against a hashed password.
         """
-        return pwd_cxt.verify(plain_password, hashed_password)
+        return password_pool.run(_verify_password, plain_password, hashed_password)[0]
+
+    @staticmethod
+    def verify_and_update(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """
+        Verify a password and return a replacement hash if its bcrypt cost is outdated.
+        """
+        return password_pool.run(_verify_password, plain_password, hashed_password)
+
+    @staticmethod
+    async def encrypt_async(password: str) -> str:
+        return await password_pool.run_async(_hash_password, password)
+
+    @staticmethod
+    async def verify_and_update_async(
+        plain_password: str, hashed_password: str
+    ) -> Tuple[bool, Optional[str]]:
+        return await password_pool.run_async(_verify_password, plain_password, hashed_password)
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, ForeignKey
+from sqlalchemy import BigInteger, Column, DateTime, Index, Integer, String, ForeignKey, Table, inspect, text
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import relationship, declarative_base
 
 Base = declarative_base()
@@ -11,6 +12,10 @@ class DBUser(Base):
     user_name = Column(String(100), unique=True, index=True, nullable=False)
     email = Column(String(100), unique=True, index=True, nullable=False)
     password = Column(String(200), nullable=False)
+    # Bumped on password change / deletion to revoke previously issued tokens
+    token_version = Column(Integer, nullable=False, default=0, server_default="0")
+    # Set by delete_user; the account purger removes the URLs, then this row
+    deleted_at = Column(DateTime(timezone=True), nullable=True, index=True)
 
     urls = relationship("DBUrl", back_populates="user", cascade="all, delete-orphan")
 
@@ -26,8 +31,97 @@ class DBUrl(Base):
     short_url = Column(String(50), unique=True, index=True, nullable=False)
     description = Column(String(400), nullable=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    # Optional limits; the redirect answers 410 Gone past either and the reaper deletes the row
+    expires_at = Column(DateTime(timezone=True), nullable=True)
+    max_clicks = Column(Integer, nullable=True)
+    # 301/302/307/308; None follows Config.REDIRECT_STATUS
+    redirect_status = Column(Integer, nullable=True)
+    # Digest of the normalized long_url (app.database.normalize), for per-user dedupe
+    long_url_hash = Column(String(32), nullable=True)
 
     user = relationship("DBUser", back_populates="urls")
 
+    __table_args__ = (
+        # Supports keyset pagination of a user's links: WHERE user_id = ? AND id > ? ORDER BY id
+        Index("ix_urls_user_id_id", "user_id", "id"),
+        # Let the reaper find expired / click-limited rows without scanning the table
+        Index("ix_urls_expires_at", "expires_at"),
+        Index("ix_urls_max_clicks", "max_clicks"),
+        # Finds a user's existing link to the same destination in one seek
+        Index("ix_urls_user_id_long_url_hash", "user_id", "long_url_hash"),
+    )
+
     def __repr__(self):
         return f"<DBUrl(short_url='{self.short_url}', long_url='{self.long_url}')>"
+
+
+class DBUrlStats(Base):
+    __tablename__ = "url_stats"
+
+    # Keyed by code so buffered click flushes never need to look up DBUrl.id
+    short_url = Column(String(50), primary_key=True)
+    clicks = Column(BigInteger, nullable=False, default=0)
+    last_accessed_at = Column(DateTime(timezone=True), nullable=True)
+
+    def __repr__(self):
+        return f"<DBUrlStats(short_url='{self.short_url}', clicks={self.clicks})>"
+
+
+class DBUrlPurge(Base):
+    __tablename__ = "url_purges"
+
+    # Polled in id order by caches in front of the redirect (see app.database.purge)
+    id = Column(Integer, primary_key=True)
+    short_url = Column(String(50), nullable=False)
+    reason = Column(String(20), nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<DBUrlPurge(short_url='{self.short_url}', reason='{self.reason}')>"
+
+
+class DBCodeSequence(Base):
+    __tablename__ = "code_sequences"
+
+    name = Column(String(50), primary_key=True)
+    next_value = Column(BigInteger, nullable=False)
+
+    def __repr__(self):
+        return f"<DBCodeSequence(name='{self.name}', next_value={self.next_value})>"
+
+
+class DBShortCode(Base):
+    __tablename__ = "short_code_pool"
+
+    # Pre-generated codes known to be unused when added; claiming one deletes it
+    code = Column(String(50), primary_key=True)
+    # Claim token, only for databases that cannot DELETE ... RETURNING (MySQL)
+    claimed_by = Column(String(32), nullable=True, index=True)
+
+    def __repr__(self):
+        return f"<DBShortCode(code='{self.code}')>"
+
+
+def add_missing_columns(bind: Engine, table: Table) -> None:
+    """
+    Add columns introduced since `table` was created (create_all never alters a table).
+
+    Only nullable columns and NOT NULL ones with a server_default can be
+    added to a table that already has rows; the latter get the DEFAULT too.
+    """
+    with bind.begin() as conn:
+        existing = {column["name"] for column in inspect(conn).get_columns(table.name)}
+        quote = conn.dialect.identifier_preparer.quote
+        ddl = conn.dialect.ddl_compiler(conn.dialect, None)
+        for column in table.columns:
+            if column.name in existing or not (column.nullable or column.server_default is not None):
+                continue
+            definition = f"{column.type.compile(dialect=conn.dialect)}"
+            default = ddl.get_column_default_string(column)
+            if default is not None:
+                definition += f" DEFAULT {default}"
+            if not column.nullable:
+                definition += " NOT NULL"
+            conn.execute(text(
+                f"ALTER TABLE {quote(table.name)} ADD COLUMN {quote(column.name)} {definition}"
+            ))
@@ -0,0 +1,45 @@
+import hashlib
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def normalize_url(long_url: str) -> str:
+    """
+    Canonical form of a URL for duplicate detection (the stored long_url is left as given).
+
+    Lowercases scheme and host, drops default ports, treats an empty path as
+    "/" and ignores a trailing slash elsewhere, and sorts query parameters.
+    Anything that is not a parseable absolute URL is only stripped of
+    surrounding whitespace.
+    """
+    long_url = long_url.strip()
+    try:
+        parts = urlsplit(long_url)
+        port = parts.port
+    except ValueError:
+        return long_url
+    if not parts.scheme or not parts.netloc:
+        return long_url
+
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if ":" in host:
+        host = f"[{host}]"  # IPv6 literal
+    if port is not None and port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{port}"
+    userinfo = parts.netloc.rpartition("@")[0]
+    netloc = f"{userinfo}@{host}" if userinfo else host
+
+    path = parts.path or "/"
+    if len(path) > 1:
+        path = path.rstrip("/") or "/"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, netloc, path, query, parts.fragment))
+
+
+def long_url_hash(long_url: str) -> str:
+    """
+    Fixed-width hex digest of the normalized URL, stored and indexed as DBUrl.long_url_hash.
+    """
+    return hashlib.blake2b(normalize_url(long_url).encode(), digest_size=16).hexdigest()
@@ -0,0 +1,243 @@
+import time
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+from typing import Callable, Dict, Iterable, List, Optional
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.engine import Engine
+
+from app.database.models import DBUrlPurge
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class PurgeLog:
+    """
+    Durable list of short codes whose cached redirects went stale.
+
+    Updates and deletes add their code in the same transaction as the change
+    (the reaper right after each batch), so a CDN or reverse proxy caching
+    redirects can poll `since()` through GET /health/purges and invalidate
+    exactly those codes, whichever worker made the change. With the Bloom
+    filter on, new codes are logged as "create" too, which tells the other
+    workers' filters (and any cached 404s) about them. Listeners added
+    with `subscribe()` are called in-process after the commit, and again for
+    every worker's changes when `follow()` runs periodically.
+    """
+
+    def __init__(
+        self,
+        engine: Optional[Engine] = None,
+        retention: float = Config.PURGE_LOG_RETENTION,
+        gap_timeout: float = Config.PURGE_LOG_GAP_TIMEOUT,
+        max_gaps: int = 10000,
+    ):
+        self.engine = engine
+        self.retention = retention
+        self.gap_timeout = gap_timeout
+        self.max_gaps = max_gaps
+        self._listeners: List[Callable[[List[str], str], None]] = []
+        self._truncated_listeners: List[Callable[[], object]] = []
+        self._lock = threading.Lock()
+        self._followed: Optional[int] = None
+        # Ids follow() skipped over -> monotonic time it stops waiting for them, oldest first
+        self._gaps: Dict[int, float] = {}
+        self.recorded = 0
+        self.followed = 0
+        self.trimmed = 0
+        self.truncations = 0
+
+    def _get_engine(self) -> Engine:
+        if self.engine is not None:
+            return self.engine
+        from app.database import engine
+        return engine
+
+    @staticmethod
+    def entries(short_urls: Iterable[str], reason: str) -> List[DBUrlPurge]:
+        """
+        Rows to add to the session making the change, before it commits.
+        """
+        now = datetime.now(timezone.utc)
+        return [DBUrlPurge(short_url=short_url, reason=reason, created_at=now) for short_url in short_urls]
+
+    def record(self, short_urls: List[str], reason: str) -> None:
+        """
+        Log codes changed outside an ORM session (e.g. by the reaper) in their own transaction.
+        """
+        if not short_urls:
+            return
+        now = datetime.now(timezone.utc)
+        with self._get_engine().begin() as conn:
+            conn.execute(insert(DBUrlPurge), [
+                {"short_url": short_url, "reason": reason, "created_at": now} for short_url in short_urls
+            ])
+        self.notify(short_urls, reason)
+
+    def subscribe(self, listener: Callable[[List[str], str], None]) -> None:
+        """
+        Call `listener(short_urls, reason)` after every committed change in this process.
+        """
+        self._listeners.append(listener)
+
+    def subscribe_truncated(self, listener: Callable[[], object]) -> None:
+        """
+        Call `listener()` when follow() finds entries it never saw already trimmed.
+
+        Those changes cannot be replayed, so the listener has to start over,
+        e.g. by dropping its whole cache or rebuilding from the database.
+        """
+        self._truncated_listeners.append(listener)
+
+    def notify(self, short_urls: List[str], reason: str) -> None:
+        """
+        Tell in-process listeners about committed changes; a failing listener is only logged.
+        """
+        with self._lock:
+            self.recorded += len(short_urls)
+        self._call_listeners(short_urls, reason)
+
+    def _call_listeners(self, short_urls: List[str], reason: str) -> None:
+        for listener in self._listeners:
+            try:
+                listener(short_urls, reason)
+            except Exception:
+                logger.exception("Purge listener %r failed", listener)
+
+    def since(self, after: int = 0, limit: int = 1000) -> dict:
+        """
+        Entries with an id above `after`, oldest first.
+
+        `truncated` means entries right after `after` were already trimmed, so
+        the caller should drop everything it has cached.
+        """
+        with self._get_engine().connect() as conn:
+            rows = conn.execute(
+                select(DBUrlPurge.id, DBUrlPurge.short_url, DBUrlPurge.reason, DBUrlPurge.created_at)
+                .where(DBUrlPurge.id > after)
+                .order_by(DBUrlPurge.id)
+                .limit(limit)
+            ).all()
+            oldest = conn.execute(select(func.min(DBUrlPurge.id))).scalar()
+        return {
+            "purges": [row._asdict() for row in rows],
+            "next_after": rows[-1].id if rows else after,
+            "truncated": oldest is not None and after + 1 < oldest,
+        }
+
+    def follow(self, batch_size: int = 1000) -> int:
+        """
+        Pass entries committed since the previous call (by any worker) to the listeners; returns how many.
+
+        The first call only finds the current end of the log. Ids are taken
+        when a transaction inserts, not when it commits, so an entry can show
+        up after a higher id was already read: ids skipped over are looked up
+        again on every call until they appear or `gap_timeout` seconds pass
+        (a rolled-back insert leaves a gap that never fills).
+        """
+        if self._followed is None:
+            with self._get_engine().connect() as conn:
+                self._followed = conn.execute(select(func.max(DBUrlPurge.id))).scalar() or 0
+            return 0
+        late = self._fill_gaps(batch_size)
+        self._deliver(late)
+        followed = len(late)
+        while True:
+            page = self.since(self._followed, batch_size)
+            if page["truncated"]:
+                self._truncated()
+            self._track_gaps(page["purges"])
+            self._deliver(page["purges"])
+            self._followed = page["next_after"]
+            followed += len(page["purges"])
+            if len(page["purges"]) < batch_size:
+                break
+        with self._lock:
+            self.followed += followed
+        return followed
+
+    def _truncated(self) -> None:
+        logger.warning("Purge log entries after id %s were trimmed before this worker read them", self._followed)
+        self._gaps.clear()
+        with self._lock:
+            self.truncations += 1
+        for listener in self._truncated_listeners:
+            try:
+                listener()
+            except Exception:
+                logger.exception("Purge truncation listener %r failed", listener)
+
+    def _deliver(self, entries: List[dict]) -> None:
+        by_reason: Dict[str, List[str]] = {}
+        for entry in entries:
+            by_reason.setdefault(entry["reason"], []).append(entry["short_url"])
+        for reason, short_urls in by_reason.items():
+            self._call_listeners(short_urls, reason)
+
+    def _track_gaps(self, entries: List[dict]) -> None:
+        deadline = time.monotonic() + self.gap_timeout
+        expected = self._followed + 1
+        for entry in entries:
+            for missing in range(expected, entry["id"]):
+                self._gaps[missing] = deadline
+            expected = entry["id"] + 1
+        # A huge jump (e.g. a sequence cache) is not worth waiting for in full
+        for missing in list(islice(self._gaps, max(len(self._gaps) - self.max_gaps, 0))):
+            del self._gaps[missing]
+
+    def _fill_gaps(self, batch_size: int) -> List[dict]:
+        """
+        Entries that have since been committed under ids follow() skipped over.
+        """
+        if not self._gaps:
+            return []
+        missing = sorted(self._gaps)
+        found = []
+        with self._get_engine().connect() as conn:
+            for start in range(0, len(missing), batch_size):
+                found.extend(conn.execute(
+                    select(DBUrlPurge.id, DBUrlPurge.short_url, DBUrlPurge.reason, DBUrlPurge.created_at)
+                    .where(DBUrlPurge.id.in_(missing[start:start + batch_size]))
+                    .order_by(DBUrlPurge.id)
+                ).all())
+        for row in found:
+            del self._gaps[row.id]
+        now = time.monotonic()
+        for missing_id, deadline in list(self._gaps.items()):
+            if deadline <= now:
+                del self._gaps[missing_id]
+        return [row._asdict() for row in found]
+
+    def trim(self) -> int:
+        """
+        Delete entries older than the retention window (always keeping the newest); returns how many.
+        """
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=self.retention)
+        with self._get_engine().begin() as conn:
+            newest = conn.execute(select(func.max(DBUrlPurge.id))).scalar()
+            if newest is None:
+                return 0
+            # Keeping the newest row lets since() tell a caller that fell behind from an empty log
+            trimmed = conn.execute(
+                delete(DBUrlPurge).where(DBUrlPurge.created_at < cutoff, DBUrlPurge.id < newest)
+            ).rowcount
+        with self._lock:
+            self.trimmed += trimmed
+        return trimmed
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "recorded": self.recorded,
+                "followed": self.followed,
+                "gaps": len(self._gaps),
+                "truncations": self.truncations,
+                "trimmed": self.trimmed,
+                "listeners": len(self._listeners),
+            }
+
+
+purge_log = PurgeLog()
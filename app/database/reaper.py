@@ -0,0 +1,134 @@
+import time
+import logging
+import threading
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from sqlalchemy import Select, delete, func, select
+from sqlalchemy.engine import Connection, Engine
+
+from app.database.models import DBUrl, DBUrlStats
+from app.database.cache import url_cache
+from app.database.clicks import click_buffer
+from app.database.purge import purge_log
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+def expired_codes(now: datetime) -> Select:
+    return select(DBUrl.short_url).where(DBUrl.expires_at <= now)
+
+
+def exhausted_codes() -> Select:
+    """
+    Codes whose flushed click count has reached their max_clicks.
+    """
+    return (
+        select(DBUrl.short_url)
+        .join(DBUrlStats, DBUrlStats.short_url == DBUrl.short_url)
+        .where(DBUrl.max_clicks.is_not(None), DBUrlStats.clicks >= DBUrl.max_clicks)
+    )
+
+
+class UrlReaper:
+    """
+    Deletes expired and used-up URLs (with their click stats) in small batches.
+
+    Every batch is its own short transaction over at most `batch_size` rows,
+    picked through the expires_at / max_clicks indexes, and a run stops after
+    `max_batches` so a large backlog is worked off over several runs instead
+    of holding locks on the primary for long. Used-up links are only seen
+    once their clicks have been flushed to url_stats.
+    """
+
+    def __init__(
+        self,
+        engine: Optional[Engine] = None,
+        batch_size: int = Config.URL_REAPER_BATCH_SIZE,
+        max_batches: int = Config.URL_REAPER_MAX_BATCHES,
+        pause: float = Config.URL_REAPER_BATCH_PAUSE,
+    ):
+        self.engine = engine
+        self.batch_size = batch_size
+        self.max_batches = max_batches
+        self.pause = pause
+        self._lock = threading.Lock()
+        self.runs = 0
+        self.batches = 0
+        self.reaped = 0
+        self.backlog = 0
+        self.last_run_reaped = 0
+        self.last_run_seconds = 0.0
+
+    def _get_engines(self) -> List[Engine]:
+        if self.engine is not None:
+            return [self.engine]
+        from app.database import url_engines
+        return url_engines()
+
+    def _reap_batch(self, conn: Connection, now: datetime) -> List[str]:
+        codes = list(conn.execute(expired_codes(now).limit(self.batch_size)).scalars())
+        if len(codes) < self.batch_size:
+            codes += conn.execute(exhausted_codes().limit(self.batch_size - len(codes))).scalars()
+        codes = list(dict.fromkeys(codes))
+        if codes:
+            conn.execute(delete(DBUrlStats).where(DBUrlStats.short_url.in_(codes)))
+            conn.execute(delete(DBUrl).where(DBUrl.short_url.in_(codes)))
+        return codes
+
+    def _count_backlog(self, engine: Engine, now: datetime) -> int:
+        with engine.connect() as conn:
+            return sum(
+                conn.execute(select(func.count()).select_from(query.subquery())).scalar_one()
+                for query in (expired_codes(now), exhausted_codes())
+            )
+
+    def run(self) -> int:
+        """
+        Reap up to `max_batches` batches per database; returns the number of URLs deleted.
+        """
+        with self._lock:
+            started = time.perf_counter()
+            reaped = 0
+            backlog = 0
+            for engine in self._get_engines():
+                for batch in range(self.max_batches):
+                    if batch:
+                        time.sleep(self.pause)
+                    with engine.begin() as conn:
+                        codes = self._reap_batch(conn, datetime.now(timezone.utc))
+                    self.batches += 1
+                    for short_url in codes:
+                        url_cache.invalidate(short_url)
+                        click_buffer.discard(short_url)
+                    purge_log.record(codes, "expire")
+                    reaped += len(codes)
+                    if len(codes) < self.batch_size:
+                        break
+                backlog += self._count_backlog(engine, datetime.now(timezone.utc))
+
+            self.runs += 1
+            self.reaped += reaped
+            self.backlog = backlog
+            self.last_run_reaped = reaped
+            self.last_run_seconds = time.perf_counter() - started
+            if reaped:
+                logger.info("Reaped %d expired URLs in %.2fs (%d left)", reaped, self.last_run_seconds, backlog)
+            return reaped
+
+    def stats(self) -> dict:
+        return {
+            "runs": self.runs,
+            "batches": self.batches,
+            "reaped": self.reaped,
+            "backlog": self.backlog,
+            "last_run_reaped": self.last_run_reaped,
+            "last_run_seconds": round(self.last_run_seconds, 4),
+            "last_run_rows_per_second": (
+                round(self.last_run_reaped / self.last_run_seconds, 1) if self.last_run_seconds else 0.0
+            ),
+        }
+
+
+url_reaper = UrlReaper()
@@ -0,0 +1,141 @@
+"""
+Move URL rows to the shard that owns their short code.
+
+    python -m app.database.rebalance [--batch-size 1000] [--dry-run]
+
+Run it once after setting DATABASE_SHARD_URLS on a deployment that used a
+single database (rows are moved off the primary), and again after changing
+the shard list (rows are moved between shards). Rows keep their ids, and the
+shared "url_ids" sequence is advanced past the highest id so new URLs never
+reuse one. Each batch is copied to its target before it is deleted from its
+source, so an interrupted run can simply be started again.
+"""
+import sys
+import json
+import argparse
+import logging
+from typing import Dict
+
+from sqlalchemy import Table, delete, func, insert, inspect, select, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+
+from app.database import engine, shard_engines
+from app.database.models import DBCodeSequence, DBUrl
+from app.database.shards import PRIMARY, SHARDED, SHARDED_TABLES, create_shard_tables, group_by_shard
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+URL_ID_SEQUENCE = "url_ids"
+
+
+def rebalance_table(table: Table, source_id: str, source: Engine, batch_size: int, dry_run: bool) -> int:
+    """
+    Move the rows of `table` on `source` that belong to another shard; returns how many.
+    """
+    moved = 0
+    last_code = ""
+    with source.connect() as conn:
+        if not inspect(conn).has_table(table.name):
+            return moved  # A new shard that has not been created yet
+    while True:
+        with source.connect() as conn:
+            rows = conn.execute(
+                select(table)
+                .where(table.c.short_url > last_code)
+                .order_by(table.c.short_url)
+                .limit(batch_size)
+            ).mappings().all()
+        if not rows:
+            return moved
+        last_code = rows[-1]["short_url"]
+
+        for target_id, target_rows in group_by_shard(rows, lambda row: row["short_url"]).items():
+            if target_id == source_id:
+                continue
+            codes = [row["short_url"] for row in target_rows]
+            moved += len(codes)
+            if dry_run:
+                continue
+            with shard_engines[target_id].begin() as conn:
+                # Rows copied by an interrupted earlier run are already there
+                present = set(conn.execute(
+                    select(table.c.short_url).where(table.c.short_url.in_(codes))
+                ).scalars())
+                missing = [dict(row) for row in target_rows if row["short_url"] not in present]
+                if missing:
+                    conn.execute(insert(table), missing)
+            with source.begin() as conn:
+                conn.execute(delete(table).where(table.c.short_url.in_(codes)))
+
+
+def advance_url_ids() -> int:
+    """
+    Move the shared URL id sequence past the highest id on any database; returns its next value.
+    """
+    highest = 0
+    for source in (engine, *shard_engines.values()):
+        with source.connect() as conn:
+            highest = max(highest, conn.execute(select(func.max(DBUrl.id))).scalar() or 0)
+    with engine.begin() as conn:
+        current = conn.execute(
+            select(DBCodeSequence.next_value).where(DBCodeSequence.name == URL_ID_SEQUENCE)
+        ).scalar()
+        if current is None:
+            try:
+                with conn.begin_nested():
+                    conn.execute(insert(DBCodeSequence).values(name=URL_ID_SEQUENCE, next_value=highest + 1))
+                return highest + 1
+            except IntegrityError:
+                pass  # A worker seeded it meanwhile; advance it below
+        conn.execute(
+            update(DBCodeSequence)
+            .where(DBCodeSequence.name == URL_ID_SEQUENCE, DBCodeSequence.next_value <= highest)
+            .values(next_value=highest + 1)
+        )
+        return conn.execute(
+            select(DBCodeSequence.next_value).where(DBCodeSequence.name == URL_ID_SEQUENCE)
+        ).scalar_one()
+
+
+def rebalance(batch_size: int = Config.EXPORT_BATCH_SIZE, dry_run: bool = False) -> Dict[str, Dict[str, int]]:
+    """
+    Move every misplaced URL and click-stats row to its shard.
+
+    Returns the number of rows moved (or, with `dry_run`, that would be
+    moved) per source database and table.
+    """
+    if not SHARDED:
+        raise RuntimeError("DATABASE_SHARD_URLS is not set; there is nothing to rebalance onto.")
+    if not dry_run:
+        for shard in shard_engines.values():
+            create_shard_tables(shard)
+
+    summary: Dict[str, Dict[str, int]] = {}
+    for source_id, source in {PRIMARY: engine, **shard_engines}.items():
+        for table in SHARDED_TABLES:
+            moved = rebalance_table(table, source_id, source, batch_size, dry_run)
+            summary.setdefault(source_id, {})[table.name] = moved
+            logger.info("%s %d %s rows from %s", "Would move" if dry_run else "Moved", moved, table.name, source_id)
+    if not dry_run:
+        summary["url_ids"] = {"next_value": advance_url_ids()}
+    return summary
+
+
+def cli() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=Config.EXPORT_BATCH_SIZE, help="Rows read per query")
+    parser.add_argument("--dry-run", action="store_true", help="Only count the rows that would move")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+    try:
+        summary = rebalance(args.batch_size, args.dry_run)
+    except RuntimeError as exc:
+        sys.exit(str(exc))
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    cli()
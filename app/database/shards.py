@@ -0,0 +1,158 @@
+import heapq
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional, Sequence, TypeVar
+
+from sqlalchemy import inspect
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Mapper
+from sqlalchemy.schema import CreateTable
+from sqlalchemy.sql import operators, visitors
+from sqlalchemy.sql.elements import BinaryExpression, BindParameter
+
+from app.database.models import DBUrl, DBUrlStats, add_missing_columns
+from config import Config
+
+T = TypeVar("T")
+
+PRIMARY = "primary"
+SHARD_IDS = [f"shard_{index}" for index in range(len(Config.SHARD_DATABASE_URLS))]
+SHARDED = bool(SHARD_IDS)
+
+# Tables keyed by short code that live on the shards; everything else stays on the primary
+SHARDED_TABLES = (DBUrl.__table__, DBUrlStats.__table__)
+SHARDED_MAPPED = (DBUrl, DBUrlStats)
+
+
+def shard_for(short_url: str, shard_ids: Sequence[str] = SHARD_IDS) -> str:
+    """
+    Stable shard for a short code: BLAKE2b of the code modulo the shard count.
+    """
+    digest = hashlib.blake2b(short_url.encode(), digest_size=8).digest()
+    return shard_ids[int.from_bytes(digest, "big") % len(shard_ids)]
+
+
+def _is_sharded(mapper: Optional[Mapper]) -> bool:
+    return mapper is not None and mapper.class_ in SHARDED_MAPPED
+
+
+def shard_chooser(mapper: Optional[Mapper], instance: Any, clause=None, **kw) -> str:
+    """
+    Shard for flushing `instance`, or for a bare get_bind() on `mapper`.
+    """
+    if not _is_sharded(mapper):
+        return PRIMARY
+    if instance is not None and instance.short_url is not None:
+        return shard_for(instance.short_url)
+    return SHARD_IDS[0]
+
+
+def identity_chooser(mapper: Mapper, primary_key, **kw) -> List[str]:
+    """
+    Shards to search for a primary key: url_stats is keyed by code, urls by id.
+    """
+    if not _is_sharded(mapper):
+        return [PRIMARY]
+    if mapper.class_ is DBUrlStats:
+        return [shard_for(primary_key[0])]
+    return SHARD_IDS
+
+
+def _short_code_criteria(clause, parameters: Optional[Dict[str, Any]] = None) -> Optional[List[str]]:
+    """
+    Codes pinned by `short_url = :code` or `short_url IN (...)` in a WHERE clause.
+
+    Values come from the bind itself or, for statements such as primary key
+    loads that bind at execution time, from the execute parameters.
+    """
+    codes: List[str] = []
+
+    def visit_binary(binary: BinaryExpression) -> None:
+        column, value = binary.left, binary.right
+        if not isinstance(value, BindParameter) or getattr(column, "name", None) != "short_url":
+            return
+        if getattr(column, "table", None) not in SHARDED_TABLES:
+            return
+        bound = value.effective_value
+        if bound is None and parameters:
+            bound = parameters.get(value.key)
+        if bound is None:
+            return
+        if binary.operator is operators.eq:
+            codes.append(bound)
+        elif binary.operator is operators.in_op:
+            codes.extend(bound)
+
+    if clause is not None:
+        visitors.traverse(clause, {}, {"binary": visit_binary})
+    return codes or None
+
+
+def execute_chooser(orm_context) -> List[str]:
+    """
+    Shards to run an ORM statement on: the primary for non-URL tables, the
+    owning shard(s) when the WHERE clause pins short codes, else every shard.
+    """
+    if not any(_is_sharded(mapper) for mapper in orm_context.all_mappers):
+        return [PRIMARY]
+    parameters = orm_context.parameters if isinstance(orm_context.parameters, dict) else None
+    codes = _short_code_criteria(getattr(orm_context.statement, "whereclause", None), parameters)
+    if codes:
+        return sorted({shard_for(code) for code in codes})
+    return SHARD_IDS
+
+
+def create_shard_tables(bind: Engine) -> None:
+    """
+    Create the URL tables on a shard, without the foreign key to users (which stay on the primary).
+    """
+    with bind.begin() as conn:
+        for table in SHARDED_TABLES:
+            if not inspect(conn).has_table(table.name):
+                conn.execute(CreateTable(table, include_foreign_key_constraints=[]))
+    for table in SHARDED_TABLES:
+        add_missing_columns(bind, table)
+    with bind.begin() as conn:
+        for table in SHARDED_TABLES:
+            for index in table.indexes:
+                index.create(bind=conn, checkfirst=True)
+
+
+def group_by_shard(items: Iterable[T], code: Callable[[T], str]) -> Dict[str, List[T]]:
+    groups: Dict[str, List[T]] = {}
+    for item in items:
+        groups.setdefault(shard_for(code(item)), []).append(item)
+    return groups
+
+
+# Runs per-shard queries of one request side by side (sync code path)
+fan_out_executor = ThreadPoolExecutor(
+    max_workers=max(1, len(SHARD_IDS)) * 4, thread_name_prefix="shard-fan-out"
+)
+
+
+def fan_out(job: Callable[[str], T], shard_ids: Sequence[str] = SHARD_IDS) -> List[T]:
+    """
+    Run `job(shard_id)` for every shard concurrently and return results in shard order.
+    """
+    return list(fan_out_executor.map(job, shard_ids))
+
+
+async def merge_async(iterators: List[AsyncIterator[T]], key: Callable[[T], Any]) -> AsyncIterator[T]:
+    """
+    Async counterpart of heapq.merge for already-sorted async iterators.
+    """
+    heap = []
+    for index, iterator in enumerate(iterators):
+        item = await anext(iterator, None)
+        if item is not None:
+            heap.append((key(item), index, item))
+    heapq.heapify(heap)
+    while heap:
+        _, index, item = heap[0]
+        yield item
+        following = await anext(iterators[index], None)
+        if following is None:
+            heapq.heappop(heap)
+        else:
+            heapq.heapreplace(heap, (key(following), index, following))
@@ -0,0 +1,278 @@
+import os
+import mmap
+import time
+import queue
+import struct
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class RedisBackend:
+    """
+    Redirect entries shared by every worker through Redis (or anything speaking its protocol).
+
+    Reads are blocking round trips; writes, deletes and invalidation messages
+    go through a single background thread in order, so request handlers
+    never wait on them. Connection errors are logged and counted, and the
+    caller simply falls back to the database.
+
+    Writes from different workers are not ordered, so a worker that read the
+    old row just before an update could store it after the invalidation.
+    Deletes therefore leave an empty tombstone for `tombstone_ttl` seconds,
+    and entries are only ever stored with NX, which fails while the
+    tombstone is there; readers treat the tombstone as a miss.
+    """
+
+    name = "redis"
+    blocking = True
+    # Each worker keeps its own tier in front; pub/sub keeps it current
+    fronted = True
+
+    def __init__(
+        self,
+        url: str = Config.URL_CACHE_REDIS_URL,
+        channel: str = Config.URL_CACHE_CHANNEL,
+        ttl: float = Config.URL_CACHE_TTL,
+        prefix: str = "url:",
+        tombstone_ttl: float = Config.READ_YOUR_WRITES_WINDOW,
+    ):
+        try:
+            import redis
+        except ImportError as exc:
+            raise RuntimeError("URL_CACHE_BACKEND=redis needs the redis package (pip install redis)") from exc
+        self._errors_type = redis.RedisError
+        self.client = redis.Redis.from_url(url, socket_timeout=1, socket_connect_timeout=1)
+        self.channel = channel
+        self.ttl_ms = int(ttl * 1000)
+        # At least a second, so even a slow writer thread's stale SET finds it
+        self.tombstone_ms = int(max(tombstone_ttl, 1) * 1000)
+        self.prefix = prefix
+        self._writes: "queue.Queue[Optional[Callable[[], object]]]" = queue.Queue()
+        self._writer = threading.Thread(target=self._drain, name="url-cache-redis", daemon=True)
+        self._writer.start()
+        self._listener = None
+        self.errors = 0
+        self.published = 0
+        self.received = 0
+
+    def _drain(self) -> None:
+        while True:
+            write = self._writes.get()
+            if write is None:
+                return
+            try:
+                write()
+            except self._errors_type as exc:
+                self.errors += 1
+                logger.warning("Shared URL cache write failed: %s", exc)
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            return self.client.get(self.prefix + key) or None
+        except self._errors_type as exc:
+            self.errors += 1
+            logger.warning("Shared URL cache read failed: %s", exc)
+            return None
+
+    def set(self, key: str, value: bytes) -> None:
+        self._writes.put(lambda: self.client.set(self.prefix + key, value, px=self.ttl_ms, nx=True))
+
+    def delete(self, key: str) -> None:
+        self._writes.put(lambda: self.client.set(self.prefix + key, b"", px=self.tombstone_ms))
+
+    def publish(self, key: str) -> None:
+        self.published += 1
+        self._writes.put(lambda: self.client.publish(self.channel, key))
+
+    def clear(self) -> None:
+        def clear_keys() -> None:
+            keys = list(self.client.scan_iter(match=self.prefix + "*", count=1000))
+            if keys:
+                self.client.delete(*keys)
+        self._writes.put(clear_keys)
+
+    def listen(self, callback: Callable[[str], None]) -> bool:
+        """
+        Call `callback(key)` for every key any worker publishes; False if Redis is unreachable.
+        """
+        def handle(message: dict) -> None:
+            self.received += 1
+            callback(message["data"].decode())
+
+        def handle_error(exc: Exception, pubsub, thread) -> None:
+            # The next poll reconnects and subscribes again
+            self.errors += 1
+            logger.warning("Shared URL cache subscription failed: %s", exc)
+            time.sleep(1)
+
+        pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        try:
+            pubsub.subscribe(**{self.channel: handle})
+        except self._errors_type as exc:
+            self.errors += 1
+            logger.warning("Shared URL cache cannot subscribe to %s: %s", self.channel, exc)
+            return False
+        self._listener = pubsub.run_in_thread(sleep_time=1, daemon=True, exception_handler=handle_error)
+        return True
+
+    def close(self) -> None:
+        if self._listener is not None:
+            self._listener.stop()
+        self._writes.put(None)
+        self._writer.join(timeout=5)
+
+    def stats(self) -> dict:
+        return {
+            "pending_writes": self._writes.qsize(),
+            "published": self.published,
+            "received": self.received,
+            "errors": self.errors,
+        }
+
+
+class MmapBackend:
+    """
+    Fixed-size hash table in a shared memory file, for workers on one host.
+
+    Each key maps to one slot (a newer key simply overwrites it), holding the
+    key, an absolute expiry and the value; oversized values are not stored.
+    Every worker maps the same file, so a delete is seen by all of them at
+    once without any messages. Access is serialized by a thread lock plus
+    flock() on the file.
+
+    As with RedisBackend, a worker that read the old row just before an
+    update could store it after the delete, so a delete leaves the key with
+    an empty value for `tombstone_ttl` seconds and set() leaves such a slot
+    alone; readers treat it as a miss.
+    """
+
+    name = "mmap"
+    blocking = False
+    # A lookup costs about as much as the local tier, so only click-limited entries use that
+    fronted = False
+
+    SLOT_HEADER = struct.Struct("<dH")  # expires_at (time.time()), payload length
+
+    def __init__(
+        self,
+        path: str = Config.URL_CACHE_MMAP_PATH,
+        slots: int = Config.URL_CACHE_MMAP_SLOTS,
+        slot_size: int = Config.URL_CACHE_MMAP_SLOT_SIZE,
+        ttl: float = Config.URL_CACHE_TTL,
+        tombstone_ttl: float = Config.READ_YOUR_WRITES_WINDOW,
+    ):
+        import fcntl
+        self._fcntl = fcntl
+        self.path = path
+        self.slots = slots
+        self.slot_size = slot_size
+        self.ttl = ttl
+        # At least a second, as for RedisBackend
+        self.tombstone_ttl = max(tombstone_ttl, 1)
+        self._lock = threading.Lock()
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        size = slots * slot_size
+        with self._locked(fcntl.LOCK_EX):
+            if os.fstat(self._fd).st_size < size:
+                os.ftruncate(self._fd, size)
+        self._map = mmap.mmap(self._fd, size)
+        self.oversized = 0
+        self.tombstoned = 0
+
+    @contextmanager
+    def _locked(self, operation: int) -> Iterator[None]:
+        # flock() only excludes other processes; the thread lock covers this one
+        with self._lock:
+            self._fcntl.flock(self._fd, operation)
+            try:
+                yield
+            finally:
+                self._fcntl.flock(self._fd, self._fcntl.LOCK_UN)
+
+    def _offset(self, key: str) -> int:
+        digest = hashlib.blake2b(key.encode(), digest_size=8).digest()
+        return int.from_bytes(digest, "little") % self.slots * self.slot_size
+
+    def get(self, key: str) -> Optional[bytes]:
+        offset = self._offset(key)
+        prefix = key.encode() + b"\0"
+        with self._locked(self._fcntl.LOCK_SH):
+            expires_at, length = self.SLOT_HEADER.unpack_from(self._map, offset)
+            if not length or expires_at <= time.time():
+                return None
+            start = offset + self.SLOT_HEADER.size
+            payload = self._map[start:start + length]
+        if not payload.startswith(prefix):
+            return None  # Slot taken by another key
+        return payload[len(prefix):] or None
+
+    def set(self, key: str, value: bytes) -> None:
+        payload = key.encode() + b"\0" + value
+        if len(payload) > self.slot_size - self.SLOT_HEADER.size:
+            self.oversized += 1
+            return
+        offset = self._offset(key)
+        tombstone = key.encode() + b"\0"
+        start = offset + self.SLOT_HEADER.size
+        with self._locked(self._fcntl.LOCK_EX):
+            now = time.time()
+            expires_at, length = self.SLOT_HEADER.unpack_from(self._map, offset)
+            if length == len(tombstone) and expires_at > now and self._map[start:start + length] == tombstone:
+                self.tombstoned += 1
+                return
+            self.SLOT_HEADER.pack_into(self._map, offset, now + self.ttl, len(payload))
+            self._map[start:start + len(payload)] = payload
+
+    def delete(self, key: str) -> None:
+        # Written even over another key's entry, so a stale set() cannot take the empty slot
+        tombstone = key.encode() + b"\0"
+        if len(tombstone) > self.slot_size - self.SLOT_HEADER.size:
+            return  # set() never stores such a key either
+        offset = self._offset(key)
+        with self._locked(self._fcntl.LOCK_EX):
+            self.SLOT_HEADER.pack_into(self._map, offset, time.time() + self.tombstone_ttl, len(tombstone))
+            start = offset + self.SLOT_HEADER.size
+            self._map[start:start + len(tombstone)] = tombstone
+
+    def publish(self, key: str) -> None:
+        pass  # delete() is already visible to every worker
+
+    def clear(self) -> None:
+        with self._locked(self._fcntl.LOCK_EX):
+            for offset in range(0, self.slots * self.slot_size, self.slot_size):
+                self.SLOT_HEADER.pack_into(self._map, offset, 0.0, 0)
+
+    def listen(self, callback: Callable[[str], None]) -> bool:
+        return False  # No messages; see publish()
+
+    def close(self) -> None:
+        self._map.close()
+        os.close(self._fd)
+
+    def stats(self) -> dict:
+        return {
+            "slots": self.slots,
+            "slot_size": self.slot_size,
+            "oversized": self.oversized,
+            "tombstoned": self.tombstoned,
+        }
+
+
+def create_backend(name: str = Config.URL_CACHE_BACKEND):
+    """
+    Shared backend for URL_CACHE_BACKEND; None for "memory" (process-local only).
+    """
+    if name == "memory":
+        return None
+    if name == "redis":
+        return RedisBackend()
+    if name == "mmap":
+        return MmapBackend()
+    raise ValueError(f"Unknown URL_CACHE_BACKEND {name!r}; expected memory, redis or mmap")
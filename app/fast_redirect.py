@@ -0,0 +1,115 @@
+from types import SimpleNamespace
+from typing import Optional
+from urllib.parse import quote
+
+from sqlalchemy.engine import Engine, Row
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import cookie_parser
+
+from app.consistency import prefers_primary
+from app.database import async_engine, async_url_read_engine, url_read_engine
+from app.database.account_purge import account_purger
+from app.database.bloom import short_code_filter
+from app.database.cache import CachedUrl, url_cache
+from app.database.clicks import click_buffer
+from app.database.db_url import cached_url, redirect_statement
+from app.responses import redirect_cache_headers, redirect_status_code
+from config import Config
+
+# Same characters RedirectResponse leaves unescaped in Location
+LOCATION_SAFE = ":/%#?=@[]!$&'()*+,;"
+
+
+class RedirectFastPath:
+    """
+    Pure ASGI layer that answers GET {URL_PREFIX}/urls/{code} with the redirect
+    status and cache headers the routed endpoint would send.
+
+    Hits are resolved from the URL cache or a single-column query on a raw
+    connection, skipping CORS, routing, dependency injection and response
+    classes. Anything it cannot answer (other paths, cross-origin requests,
+    unknown, expired or used-up codes, codes of deleted accounts) falls
+    through to the wrapped app unchanged, so error responses and static
+    routes under /urls/ behave exactly as before.
+    """
+
+    def __init__(self, app, prefix: str = Config.URL_PREFIX):
+        self.app = app
+        self.prefix = f"{prefix}/urls/"
+        # Lets MetricsMiddleware label fast-path hits like the routed endpoint
+        self.route = SimpleNamespace(path=f"{self.prefix}{{short_url}}")
+
+    async def __call__(self, scope, receive, send):
+        short_url = self.match(scope)
+        if short_url is not None:
+            target = await self.resolve(short_url, self.reads_primary(scope))
+            if target is not None:
+                click_buffer.record(short_url)
+                scope["route"] = self.route
+                status_code = redirect_status_code(target)
+                await send({
+                    "type": "http.response.start",
+                    "status": status_code,
+                    "headers": [
+                        (b"location", quote(target.long_url, safe=LOCATION_SAFE).encode("latin-1")),
+                        (b"content-length", b"0"),
+                        *(
+                            (name.encode("latin-1"), value.encode("latin-1"))
+                            for name, value in redirect_cache_headers(target, status_code)
+                        ),
+                    ],
+                })
+                await send({"type": "http.response.body", "body": b""})
+                return
+        await self.app(scope, receive, send)
+
+    def match(self, scope) -> Optional[str]:
+        """
+        Return the short code if the request is a plain same-origin redirect lookup.
+        """
+        if scope["type"] != "http" or scope["method"] != "GET":
+            return None
+        path = scope["path"]
+        if not path.startswith(self.prefix):
+            return None
+        short_url = path[len(self.prefix):]
+        if not short_url or "/" in short_url:
+            return None
+        # CORS headers are the CORS middleware's job; let it handle these
+        if any(name == b"origin" for name, _ in scope["headers"]):
+            return None
+        return short_url
+
+    @staticmethod
+    def reads_primary(scope) -> bool:
+        for name, value in scope["headers"]:
+            if name == b"cookie" and prefers_primary(cookie_parser(value.decode("latin-1"))):
+                return True
+        return False
+
+    async def resolve(self, short_url: str, primary: bool = False) -> Optional[CachedUrl]:
+        target = await url_cache.get_async(short_url)
+        if target is None:
+            target = await self.load(short_url, primary or url_cache.recently_purged(short_url))
+            if target is None:
+                return None
+            url_cache.set(short_url, target)
+        if account_purger.is_deleted(target.user_id):
+            return None
+        return target if target.claim() else None
+
+    async def load(self, short_url: str, primary: bool) -> Optional[CachedUrl]:
+        if not short_code_filter.might_contain(short_url):
+            return None
+        statement = redirect_statement(short_url)
+        if async_engine is not None:
+            async with async_url_read_engine(short_url, primary).connect() as conn:
+                row = (await conn.execute(statement)).first()
+        else:
+            row = await run_in_threadpool(self._fetch, statement, url_read_engine(short_url, primary))
+        return cached_url(short_url, row) if row is not None else None
+
+    @staticmethod
+    def _fetch(statement, bind: Engine) -> Optional[Row]:
+        with bind.connect() as conn:
+            return conn.execute(statement).first()
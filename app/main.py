@@ -1,21 +1,122 @@
-from fastapi import FastAPI
+import asyncio
+import secrets
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from fastapi import FastAPI, Header, HTTPException, Query, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.datastructures import Default
+from fastapi.responses import PlainTextResponse
 from datetime import datetime, timezone
+from starlette.concurrency import run_in_threadpool
 
-from app.authentication import auth_router
-from app.routers import urls, users
+from app.authentication import auth_router, auth_router_async
+from app.routers import urls, users, urls_async, users_async
 from app.database import models
-from app.database import engine
+from app.database import engine, pool_stats, shard_engines
+from app.database.bloom import short_code_filter
+from app.database.cache import url_cache, user_cache
+from app.database.clicks import click_buffer
+from app.database.reaper import url_reaper
+from app.database.allocator import PooledAllocator, allocator
+from app.database.purge import purge_log
+from app.database.account_purge import account_purger
+from app.database.shards import create_shard_tables
+from app.database.hash import password_pool
+from app.background import run_periodically
+from app.admission import AdmissionMiddleware, admission
+from app.consistency import ReadYourWritesMiddleware
+from app.fast_redirect import RedirectFastPath
+from app.metrics import MetricsMiddleware, component_collector, registry
+from app.profiling import SQLProfileMiddleware, sql_profiler
+from app.responses import ORJSONResponse
 from config import Config
 
 # Create all database tables
 models.Base.metadata.create_all(bind=engine)
+models.add_missing_columns(engine, models.DBUrl.__table__)
+models.add_missing_columns(engine, models.DBUser.__table__)
+# create_all skips indexes on tables that already exist; add any missing ones
+for index in (*models.DBUrl.__table__.indexes, *models.DBUser.__table__.indexes):
+    index.create(bind=engine, checkfirst=True)
+# URL tables on each shard (no-op when DATABASE_SHARD_URLS is unset)
+for shard_engine in shard_engines.values():
+    create_shard_tables(shard_engine)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Start background jobs and flush buffered state on graceful shutdown.
+    """
+    tasks = []
+    # Other workers' updates reach this one's local cache over pub/sub or, failing that, the purge log;
+    # their new codes reach the Bloom filter through the purge log. Following starts before the
+    # filter's first rebuild so codes created while it scans are not missed. A worker that fell
+    # further behind than the log's retention drops its local cache and rebuilds the filter.
+    follow = False
+    if not url_cache.start():
+        purge_log.subscribe(url_cache.drop_local)
+        purge_log.subscribe_truncated(url_cache.local.clear)
+        follow = True
+    if short_code_filter.enabled:
+        purge_log.subscribe(short_code_filter.on_purge)
+        purge_log.subscribe_truncated(short_code_filter.rebuild)
+        follow = True
+    if follow and Config.URL_CACHE_PURGE_POLL_INTERVAL > 0:
+        await run_in_threadpool(purge_log.follow)
+        tasks.append(asyncio.create_task(
+            run_periodically(Config.URL_CACHE_PURGE_POLL_INTERVAL, purge_log.follow, "purge-log-follow")
+        ))
+    if short_code_filter.enabled:
+        await run_in_threadpool(short_code_filter.rebuild)
+        tasks.append(asyncio.create_task(
+            run_periodically(Config.BLOOM_FILTER_REBUILD_INTERVAL, short_code_filter.rebuild, "bloom-rebuild")
+        ))
+    if Config.CLICK_TRACKING:
+        tasks.append(asyncio.create_task(
+            run_periodically(Config.CLICK_FLUSH_INTERVAL, click_buffer.flush, "click-flush")
+        ))
+    if isinstance(allocator, PooledAllocator):
+        await run_in_threadpool(allocator.refill)
+        tasks.append(asyncio.create_task(
+            run_periodically(Config.SHORT_CODE_POOL_REFILL_INTERVAL, allocator.refill, "short-code-pool-refill")
+        ))
+    if Config.URL_REAPER_ENABLED:
+        tasks.append(asyncio.create_task(
+            run_periodically(Config.URL_REAPER_INTERVAL, url_reaper.run, "url-reaper")
+        ))
+    # Every worker needs the deleted accounts before serving; purging itself can be left to some of them
+    await run_in_threadpool(account_purger.refresh)
+    tasks.append(asyncio.create_task(run_periodically(
+        Config.ACCOUNT_PURGE_INTERVAL,
+        account_purger.run if Config.ACCOUNT_PURGE_ENABLED else account_purger.refresh,
+        "account-purge",
+    )))
+    # Hourly at the default one-day retention
+    tasks.append(asyncio.create_task(
+        run_periodically(Config.PURGE_LOG_RETENTION / 24, purge_log.trim, "purge-log-trim")
+    ))
+    try:
+        yield
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await run_in_threadpool(click_buffer.flush)
+        url_cache.close()
+        password_pool.shutdown()
+
 
 # Initialize FastAPI app
+# Default(...) keeps FastAPI's own Pydantic-to-bytes path for response_model
+# endpoints; orjson renders everything else that is returned as plain data
 app = FastAPI(
     title="URL Shortener App",
     description="A URL shortener API built with Python and FastAPI",
-    version=Config.VERSION
+    version=Config.VERSION,
+    lifespan=lifespan,
+    default_response_class=Default(ORJSONResponse)
 )
 
 # CORS settings (adjust allow_origins in production)
@@ -25,11 +126,55 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
-app.include_router(auth_router.router, prefix=Config.URL_PREFIX)
-app.include_router(users.router, prefix=Config.URL_PREFIX)
-app.include_router(urls.router, prefix=Config.URL_PREFIX)
+# Pins clients to the primary for a moment after they write
+if Config.REPLICA_DATABASE_URLS and Config.READ_YOUR_WRITES_WINDOW > 0:
+    app.add_middleware(ReadYourWritesMiddleware)
+
+# Answers cacheable redirects before CORS, routing and dependency injection
+if Config.REDIRECT_FAST_PATH:
+    app.add_middleware(RedirectFastPath)
+
+# Rate limits and sheds load ahead of the fast path, so rejected requests never touch the database
+if Config.ADMISSION_CONTROL:
+    app.add_middleware(AdmissionMiddleware)
+
+# Opt-in per-request SQL profiles; the slow-query log needs only the cursor events
+sql_profiler.install()
+if sql_profiler.enabled:
+    app.add_middleware(SQLProfileMiddleware)
+
+# Outermost, so latency covers CORS and routing too
+if Config.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+    registry.add_collector(component_collector("url_cache", url_cache.stats))
+    registry.add_collector(component_collector("user_cache", user_cache.stats))
+    registry.add_collector(component_collector("click_buffer", click_buffer.stats))
+    registry.add_collector(component_collector("short_code_filter", short_code_filter.stats))
+    registry.add_collector(component_collector("url_reaper", url_reaper.stats))
+    registry.add_collector(component_collector("purge_log", purge_log.stats))
+    registry.add_collector(component_collector("account_purger", account_purger.stats))
+    registry.add_collector(component_collector("password_pool", password_pool.stats))
+    registry.add_collector(component_collector("sql_profiler", sql_profiler.stats))
+    registry.add_collector(component_collector("admission", admission.stats))
+    if isinstance(allocator, PooledAllocator):
+        registry.add_collector(component_collector("short_code_pool", allocator.stats))
+    for pool_name in pool_stats():
+        registry.add_collector(component_collector(
+            f"db_pool_{pool_name}", lambda pool_name=pool_name: pool_stats()[pool_name]
+        ))
+
+# DATABASE_ASYNC swaps in routers that run on the async engine / event loop
+if Config.DATABASE_ASYNC:
+    app.include_router(auth_router_async.router, prefix=Config.URL_PREFIX)
+    app.include_router(users_async.router, prefix=Config.URL_PREFIX)
+    app.include_router(urls_async.router, prefix=Config.URL_PREFIX)
+else:
+    app.include_router(auth_router.router, prefix=Config.URL_PREFIX)
+    app.include_router(users.router, prefix=Config.URL_PREFIX)
+    app.include_router(urls.router, prefix=Config.URL_PREFIX)
 
 @app.get(f"{Config.URL_PREFIX}/health", tags=["Health"])
 async def health_check():
@@ -38,3 +183,74 @@ async def health_check():
         "timestamp": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
         "version": Config.VERSION
     }
+
+
+@app.get(f"{Config.URL_PREFIX}/health/cache", tags=["Health"])
+async def cache_stats():
+    """
+    Expose redirect cache counters for sizing URL_CACHE_SIZE / URL_CACHE_TTL.
+    """
+    return url_cache.stats()
+
+
+@app.get(f"{Config.URL_PREFIX}/health/pool", tags=["Health"])
+async def database_pool_stats():
+    """
+    Expose connection pool occupancy and checkout wait times.
+    """
+    return pool_stats()
+
+
+@app.get(Config.METRICS_PATH, tags=["Health"], response_class=PlainTextResponse)
+async def metrics():
+    """
+    Prometheus text exposition of request, database, cache and pool metrics.
+    """
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+
+if sql_profiler.enabled:
+    @app.get(f"{Config.URL_PREFIX}/debug/sql-profiles", tags=["Health"])
+    async def sql_profiles(
+        limit: int = Query(20, ge=1, le=1000, description="Max profiles returned, newest first"),
+        route: Optional[str] = Query(None, description="Only this route template, e.g. /api/urls/{short_url}")
+    ):
+        """
+        Recent per-request SQL profiles: query count, DB time and each statement with its bind shapes.
+        """
+        return {**sql_profiler.stats(), "profiles": sql_profiler.recent(limit, route)}
+
+
+@app.get(f"{Config.URL_PREFIX}/health/bloom", tags=["Health"])
+async def bloom_filter_stats():
+    """
+    Expose short-code Bloom filter size and how many lookups it answered alone.
+    """
+    return short_code_filter.stats()
+
+
+if Config.PURGE_LOG_TOKEN:
+    @app.get(f"{Config.URL_PREFIX}/health/purges", tags=["Health"])
+    async def purged_codes(
+        after: int = Query(0, ge=0, description="Last id already processed (next_after of the previous call)"),
+        limit: int = Query(1000, ge=1, le=10000, description="Max entries returned"),
+        x_purge_token: str = Header("", description="The configured PURGE_LOG_TOKEN")
+    ):
+        """
+        Short codes updated or deleted since `after`, for CDNs and reverse proxies to invalidate.
+
+        Poll with the returned `next_after`; when `truncated` is true the log was
+        trimmed past `after` and every cached redirect should be dropped.
+        """
+        if not secrets.compare_digest(x_purge_token.encode(), Config.PURGE_LOG_TOKEN.encode()):
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid purge token.")
+        return ORJSONResponse(await run_in_threadpool(purge_log.since, after, limit))
+
+
+@app.get(f"{Config.URL_PREFIX}/health/account-purges", tags=["Health"])
+async def account_purges():
+    """
+    Progress of deleted accounts whose URLs are still being removed, plus purger totals.
+    """
+    pending = await run_in_threadpool(account_purger.progress)
+    return ORJSONResponse({**account_purger.stats(), "pending": pending})
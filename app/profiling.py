@@ -0,0 +1,210 @@
+import time
+import logging
+import itertools
+import threading
+from collections import deque
+from contextvars import ContextVar
+from typing import Any, Deque, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.metrics import route_label
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+# Binds described per statement; multi-row VALUES inserts can carry thousands
+MAX_SHAPE_BINDS = 20
+
+
+def bind_shape(parameters: Any, executemany: bool = False) -> str:
+    """
+    Describe bind parameters by type (and length for strings) without their values.
+
+    e.g. `{short_url_1: str[8], param_1: int}`, or `500 x (str[19], int)` for executemany.
+    """
+    rows = list(parameters or ()) if executemany else None
+    # Batched "insertmanyvalues" inserts pass one flat row despite executemany
+    if rows and isinstance(rows[0], (dict, list, tuple)):
+        return f"{len(rows)} x {bind_shape(rows[0])}"
+    if isinstance(parameters, dict):
+        shapes = [f"{name}: {_value_shape(value)}" for name, value in parameters.items()]
+        return "{" + _join_shapes(shapes) + "}"
+    if isinstance(parameters, (list, tuple)):
+        return "(" + _join_shapes([_value_shape(value) for value in parameters]) + ")"
+    return _value_shape(parameters)
+
+
+def _join_shapes(shapes: List[str]) -> str:
+    if len(shapes) > MAX_SHAPE_BINDS:
+        return ", ".join(shapes[:MAX_SHAPE_BINDS]) + f", ... {len(shapes) - MAX_SHAPE_BINDS} more"
+    return ", ".join(shapes)
+
+
+def _value_shape(value: Any) -> str:
+    if value is None:
+        return "null"
+    if isinstance(value, (str, bytes)):
+        return f"{type(value).__name__}[{len(value)}]"
+    return type(value).__name__
+
+
+class RequestProfile:
+    __slots__ = ("queries", "db_time", "statements", "dropped")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.statements: List[dict] = []
+        self.dropped = 0
+
+
+# Set by SQLProfileMiddleware; shared by reference with threadpool workers
+current_profile: ContextVar[Optional[RequestProfile]] = ContextVar("current_profile", default=None)
+
+
+class SQLProfiler:
+    """
+    Per-request SQL profiles and a slow-query log, fed by cursor events on every engine.
+
+    With `enabled`, each request gets a profile of its statements, their
+    durations and bind shapes; the totals go out in a Server-Timing header
+    and the last `history` profiles are kept for GET /debug/sql-profiles.
+    Independently, statements slower than `slow_threshold` seconds (0 turns
+    this off) are logged with their bind shapes, never their values.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = Config.SQL_PROFILING,
+        history: int = Config.SQL_PROFILE_HISTORY,
+        max_statements: int = Config.SQL_PROFILE_MAX_STATEMENTS,
+        slow_threshold: float = Config.SLOW_QUERY_THRESHOLD_MS / 1000,
+    ):
+        self.enabled = enabled
+        self.max_statements = max_statements
+        self.slow_threshold = slow_threshold
+        self._profiles: Deque[dict] = deque(maxlen=history)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._installed = False
+        self.profiled_requests = 0
+        self.slow_queries = 0
+
+    def install(self) -> None:
+        """
+        Listen to cursor events on every engine; a no-op when both profiling and the slow log are off.
+        """
+        if self._installed or not (self.enabled or self.slow_threshold > 0):
+            return
+        event.listen(Engine, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", self._after_cursor_execute)
+        self._installed = True
+
+    @staticmethod
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("profile_start_time", []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["profile_start_time"].pop()
+        slow = 0 < self.slow_threshold <= elapsed
+        profile = current_profile.get()
+        if not slow and profile is None:
+            return
+        shape = bind_shape(parameters, executemany)
+        if slow:
+            with self._lock:
+                self.slow_queries += 1
+            logger.warning(
+                "Slow query (%.1f ms, binds %s): %s", elapsed * 1000, shape, " ".join(statement.split())
+            )
+        if profile is not None:
+            profile.queries += 1
+            profile.db_time += elapsed
+            if len(profile.statements) < self.max_statements:
+                profile.statements.append({
+                    "statement": " ".join(statement.split()),
+                    "duration_ms": round(elapsed * 1000, 3),
+                    "binds": shape,
+                })
+            else:
+                profile.dropped += 1
+
+    def save(self, scope: dict, status_code: int, profile: RequestProfile) -> None:
+        with self._lock:
+            self.profiled_requests += 1
+            self._profiles.append({
+                "id": next(self._ids),
+                "method": scope["method"],
+                "path": scope["path"],
+                "route": route_label(scope),
+                "status": status_code,
+                "queries": profile.queries,
+                "db_time_ms": round(profile.db_time * 1000, 3),
+                "statements": profile.statements,
+                "statements_dropped": profile.dropped,
+            })
+
+    def recent(self, limit: int = 20, route: Optional[str] = None) -> List[dict]:
+        """
+        The newest saved profiles first, optionally only those of one route template.
+        """
+        with self._lock:
+            profiles = list(self._profiles)
+        return [
+            profile for profile in reversed(profiles) if route is None or profile["route"] == route
+        ][:limit]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "profiled_requests": self.profiled_requests,
+                "kept_profiles": len(self._profiles),
+                "slow_queries": self.slow_queries,
+            }
+
+
+sql_profiler = SQLProfiler()
+
+
+class SQLProfileMiddleware:
+    """
+    Pure ASGI middleware profiling each request's SQL and reporting it in response headers.
+
+    Headers are added when the response starts, so statements a streaming
+    response runs afterwards only show up in the saved profile.
+    """
+
+    def __init__(self, app, profiler: SQLProfiler = sql_profiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        profile = RequestProfile()
+        token = current_profile.set(profile)
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                timing = f'db;dur={profile.db_time * 1000:.3f};desc="{profile.queries} queries"'
+                message["headers"] = [
+                    *message.get("headers", ()),
+                    (b"server-timing", timing.encode()),
+                    (b"x-sql-queries", str(profile.queries).encode()),
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_profile.reset(token)
+            self.profiler.save(scope, status_code, profile)
@@ -0,0 +1,55 @@
+import time
+from email.utils import formatdate
+from typing import Any, List, Tuple
+
+import orjson
+from fastapi.responses import JSONResponse
+
+from app.database.cache import CachedUrl
+from config import Config
+
+# Naive datetimes (SQLite hands them back) are stored as UTC; write both kinds with a "Z" suffix
+ORJSON_OPTIONS = orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z
+
+REDIRECT_STATUSES = (301, 302, 307, 308)
+PERMANENT_REDIRECTS = (301, 308)
+
+if Config.REDIRECT_STATUS not in REDIRECT_STATUSES:
+    raise ValueError(f"REDIRECT_STATUS must be one of {REDIRECT_STATUSES}, not {Config.REDIRECT_STATUS}")
+
+
+class ORJSONResponse(JSONResponse):
+    """
+    JSONResponse rendered with orjson.
+
+    Endpoints with a response_model are already serialized to bytes by
+    Pydantic; this covers plain dict responses and handlers that build their
+    payload from row tuples and return the response themselves.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=ORJSON_OPTIONS)
+
+
+def redirect_status_code(target: CachedUrl) -> int:
+    return target.status or Config.REDIRECT_STATUS
+
+
+def redirect_cache_headers(target: CachedUrl, status_code: int) -> List[Tuple[str, str]]:
+    """
+    Cache-Control and Expires for a redirect, by how much the link can still change.
+
+    Click-limited links have to reach us on every click, so they are never
+    stored. Other links stay fresh for REDIRECT_PERMANENT_MAX_AGE (301/308) or
+    REDIRECT_MAX_AGE, but never past their own expiry; updates and deletes
+    are announced through the purge log for shared caches.
+    """
+    now = time.time()
+    max_age = 0
+    if target.max_clicks is None:
+        max_age = Config.REDIRECT_PERMANENT_MAX_AGE if status_code in PERMANENT_REDIRECTS else Config.REDIRECT_MAX_AGE
+        if target.expires_at is not None:
+            max_age = min(max_age, int(target.expires_at - now))
+    if max_age <= 0:
+        return [("cache-control", "no-store"), ("expires", formatdate(now, usegmt=True))]
+    return [("cache-control", f"public, max-age={max_age}"), ("expires", formatdate(now + max_age, usegmt=True))]
@@ -0,0 +1,159 @@
+import json
+from typing import AsyncIterator, Iterable, List, Optional, Tuple, Type, Union
+
+from fastapi import HTTPException, Request, status
+from pydantic import BaseModel, ValidationError
+
+from config import Config
+
+NDJSON_MEDIA_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
+# (position in the payload, parsed model or an error message)
+ParsedItem = Tuple[int, Union[BaseModel, str]]
+
+
+def _parse_item(raw: Union[str, bytes, dict], model: Type[BaseModel]) -> Union[BaseModel, str]:
+    try:
+        data = json.loads(raw) if isinstance(raw, (str, bytes)) else raw
+        return model.model_validate(data)
+    except json.JSONDecodeError as exc:
+        return f"Invalid JSON: {exc.msg}"
+    except ValidationError as exc:
+        return "; ".join(
+            f"{'.'.join(str(loc) for loc in err['loc']) or 'item'}: {err['msg']}"
+            for err in exc.errors()
+        )
+
+
+async def _iter_lines(stream: AsyncIterator[bytes], max_line_bytes: int) -> AsyncIterator[Optional[bytes]]:
+    """
+    Split a byte stream into lines, yielding None in place of any line longer than `max_line_bytes`.
+
+    Each received piece is scanned once and at most one partial line is
+    buffered, so the work is linear in the body size.
+    """
+    partial = bytearray()
+    too_long = False
+    async for data in stream:
+        start = 0
+        while True:
+            end = data.find(b"\n", start)
+            if end < 0:
+                break
+            if too_long or len(partial) + end - start > max_line_bytes:
+                yield None
+            else:
+                partial += data[start:end]
+                yield bytes(partial)
+            partial.clear()
+            too_long = False
+            start = end + 1
+        if not too_long:
+            partial += data[start:]
+            if len(partial) > max_line_bytes:
+                # Drop the rest of this line as it arrives instead of buffering it
+                partial.clear()
+                too_long = True
+    if too_long:
+        yield None
+    elif partial:
+        yield bytes(partial)
+
+
+async def iter_item_chunks(
+    request: Request,
+    model: Type[BaseModel],
+    chunk_size: int,
+    max_items: int = 0,
+    max_line_bytes: int = Config.NDJSON_MAX_LINE_BYTES,
+    json_array: bool = True,
+) -> AsyncIterator[List[ParsedItem]]:
+    """
+    Parse a JSON array or NDJSON request body into chunks of validated items.
+
+    Without `max_items`, NDJSON bodies are consumed incrementally from the
+    request stream, so only one chunk is held in memory at a time. With it,
+    the whole body is read first, so a request over the limit gets 413
+    before any chunk reaches the caller. Items that fail to parse or
+    validate (or NDJSON lines over `max_line_bytes`) are yielded as error
+    strings so callers can report them per item. A JSON array has to be read
+    whole, so endpoints without `max_items` should pass `json_array=False`
+    to answer anything but NDJSON with 415.
+    """
+    def check_limit(count: int) -> None:
+        if max_items and count > max_items:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"At most {max_items} items are accepted per request."
+            )
+
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    chunk: List[ParsedItem] = []
+
+    if content_type in NDJSON_MEDIA_TYPES:
+        index = 0
+        pending: List[ParsedItem] = []
+        async for line in _iter_lines(request.stream(), max_line_bytes):
+            if line is None:
+                item: Union[BaseModel, str] = f"Line is longer than {max_line_bytes} bytes."
+            elif not line.strip():
+                continue
+            else:
+                item = _parse_item(line, model)
+            if max_items:
+                check_limit(index + 1)
+                pending.append((index, item))
+            else:
+                chunk.append((index, item))
+                if len(chunk) >= chunk_size:
+                    yield chunk
+                    chunk = []
+            index += 1
+        for start in range(0, len(pending), chunk_size):
+            yield pending[start:start + chunk_size]
+    elif not json_array:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail=f"Body must be NDJSON ({', '.join(NDJSON_MEDIA_TYPES)})."
+        )
+    else:
+        try:
+            payload = await request.json()
+        except ValueError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Body must be valid JSON.")
+        if not isinstance(payload, list):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Body must be a JSON array.")
+        check_limit(len(payload))
+        for index, raw in enumerate(payload):
+            chunk.append((index, _parse_item(raw, model)))
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+
+    if chunk:
+        yield chunk
+
+
+def tally_results(summary: dict, results: Iterable[dict], max_errors: int) -> dict:
+    """
+    Fold per-item bulk results into an import summary, keeping at most `max_errors` errors.
+    """
+    for result in results:
+        if result["status"] in ("created", "existing"):
+            summary[result["status"]] += 1
+            continue
+        summary["failed"] += 1
+        if len(summary["errors"]) < max_errors:
+            summary["errors"].append(result)
+    return summary
+
+
+def bulk_openapi_body(model: Type[BaseModel], json_array: bool = True) -> dict:
+    """
+    OpenAPI requestBody for endpoints that read an NDJSON stream and, with `json_array`, a JSON array.
+    """
+    schema = model.model_json_schema()
+    content = {"application/x-ndjson": {"schema": schema}}
+    if json_array:
+        content = {"application/json": {"schema": {"type": "array", "items": schema}}, **content}
+    return {"requestBody": {"required": True, "content": content}}
@@ -0,0 +1,258 @@
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Request, status, Query
+from fastapi.responses import RedirectResponse, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.authentication.authentication import get_current_user_async
+from app.schemas import (
+    AuthenticatedUser, BulkUrlResult, ImportSummary, RedirectStatus, UrlData, UrlDetails, UrlDisplay, UrlDataUpdate
+)
+from app.database import get_async_db, get_async_read_db, async_read_sessionmaker, db_url, db_url_async
+from app.database.clicks import click_buffer
+from app.consistency import prefers_primary
+from app.responses import ORJSONResponse, redirect_cache_headers, redirect_status_code
+from app.routers.ndjson import bulk_openapi_body, iter_item_chunks, tally_results
+from config import Config
+
+router = APIRouter(
+    prefix="/urls",
+    tags=["URLs"],
+)
+
+
+@router.post(
+    "/create_short_url",
+    response_model=UrlDisplay,
+    status_code=status.HTTP_201_CREATED,
+    name="create_short_url",
+    summary="Create a short URL",
+    response_description="The created short URL details"
+)
+async def create_short_url(
+    long_url: str,
+    description: str,
+    expires_at: Optional[datetime] = Query(None, description="When the link stops redirecting (naive = UTC)"),
+    max_clicks: Optional[int] = Query(None, ge=1, description="Redirects allowed before the link stops working"),
+    redirect_status: Optional[RedirectStatus] = Query(
+        None, description="301, 302, 307 or 308 (default: REDIRECT_STATUS)"
+    ),
+    db: AsyncSession = Depends(get_async_db),
+    user: AuthenticatedUser = Depends(get_current_user_async)
+) -> UrlDisplay:
+    """
+    Create a shortened URL from a long URL.
+    
+    - **long_url**: The original long URL to shorten
+    - **description**: Description for the URL
+    - **expires_at** / **max_clicks**: Optional limits; past either the link answers 410 Gone
+    - **redirect_status**: Optional status of the redirect; permanent ones are cached longer
+
+    Without limits or status, a destination the user already shortened (after
+    URL normalization) returns the existing short URL.
+    """
+    return await db_url_async.create_url(
+        long_url=long_url,
+        description=description,
+        user_id=user.id,
+        db=db,
+        expires_at=expires_at,
+        max_clicks=max_clicks,
+        redirect_status=redirect_status
+    )
+
+
+@router.post(
+    "/bulk",
+    response_model=list[BulkUrlResult],
+    name="create_short_urls_bulk",
+    summary="Create short URLs in bulk",
+    response_description="Per-item results in request order",
+    openapi_extra=bulk_openapi_body(UrlData)
+)
+async def create_short_urls_bulk(
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    user: AuthenticatedUser = Depends(get_current_user_async)
+) -> list[BulkUrlResult]:
+    """
+    Shorten many URLs in one call.
+
+    Accepts a JSON array of `UrlData` or an NDJSON stream (`application/x-ndjson`).
+    Items are inserted in chunked transactions; invalid items and short-code
+    conflicts are reported per item instead of failing the whole request.
+    """
+    results = []
+    async for chunk in iter_item_chunks(request, UrlData, Config.BULK_CHUNK_SIZE, Config.BULK_MAX_ITEMS):
+        results.extend(await db_url_async.create_urls_bulk(chunk, user.id, db))
+    return results
+
+
+@router.post(
+    "/import",
+    response_model=ImportSummary,
+    name="import_short_urls",
+    summary="Import short URLs from an NDJSON stream",
+    response_description="Counts of created, existing and failed items",
+    openapi_extra=bulk_openapi_body(UrlData, json_array=False)
+)
+async def import_short_urls(
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    user: AuthenticatedUser = Depends(get_current_user_async)
+) -> ImportSummary:
+    """
+    Import any number of URLs, e.g. the output of `GET /urls/export`.
+
+    The NDJSON body is parsed as it arrives and inserted in chunked
+    transactions; only counts and the first errors are kept, so memory does
+    not grow with the size of the import. Other content types get 415.
+    """
+    summary = {"created": 0, "existing": 0, "failed": 0, "errors": []}
+    async for chunk in iter_item_chunks(request, UrlData, Config.BULK_CHUNK_SIZE, json_array=False):
+        results = await db_url_async.create_urls_bulk(chunk, user.id, db)
+        tally_results(summary, results, Config.IMPORT_MAX_ERRORS)
+    return summary
+
+
+@router.get(
+    "/export",
+    name="export_short_urls",
+    summary="Export all URLs as NDJSON",
+    response_class=StreamingResponse,
+    responses={200: {"content": {"application/x-ndjson": {}}}}
+)
+async def export_short_urls(
+    request: Request,
+    user: AuthenticatedUser = Depends(get_current_user_async)
+) -> StreamingResponse:
+    """
+    Stream every URL of the current user as NDJSON (one `UrlDisplay` per line).
+    """
+    return StreamingResponse(
+        db_url_async.export_user_urls(user.id, async_read_sessionmaker(prefers_primary(request.cookies))),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="urls.ndjson"'}
+    )
+
+
+@router.get(
+    "/{short_url}",
+    name="redirect_short_url",
+    summary="Redirect to original URL",
+    response_description="Redirect response to original URL"
+)
+async def redirect_short_url(
+    short_url: str,
+    db: AsyncSession = Depends(get_async_read_db)
+) -> RedirectResponse:
+    """
+    Redirects to the original long URL associated with the short URL.
+
+    Uses the link's redirect status (or REDIRECT_STATUS) and sets
+    Cache-Control / Expires so shared caches can answer repeat clicks.
+    """
+    target = await db_url_async.resolve_url(short_url=short_url, db=db)
+    click_buffer.record(short_url)
+    status_code = redirect_status_code(target)
+    return RedirectResponse(
+        url=target.long_url,
+        status_code=status_code,
+        headers=dict(redirect_cache_headers(target, status_code))
+    )
+
+
+@router.get(
+    "/{short_url}/details",
+    response_model=UrlDetails,
+    name="get_short_url_details",
+    summary="Get short URL details",
+    response_description="Detailed information about the short URL"
+)
+async def get_short_url_details(
+    short_url: str,
+    db: AsyncSession = Depends(get_async_read_db)
+) -> UrlDetails:
+    """
+    Retrieve metadata and click statistics about a shortened URL.
+    """
+    return await db_url_async.get_url_details(short_url=short_url, db=db)
+
+
+@router.get(
+    "/",
+    response_model=list[UrlDisplay],
+    name="list_user_urls",
+    summary="List user's URLs",
+    response_description="Paginated list of user's short URLs"
+)
+async def list_urls(
+    skip: int = Query(0, ge=0, description="Pagination offset"),
+    limit: int = Query(10, ge=1, le=100, description="Items per page (1-100)"),
+    cursor: Optional[str] = Query(
+        None, description="Opaque cursor from the X-Next-Cursor header (takes precedence over skip)"
+    ),
+    db: AsyncSession = Depends(get_async_read_db),
+    user: AuthenticatedUser = Depends(get_current_user_async)
+) -> ORJSONResponse:
+    """
+    Get a paginated list of the authenticated user's short URLs.
+
+    When a full page is returned, the `X-Next-Cursor` response header carries
+    the cursor for the next page.
+    """
+    after_id = db_url.decode_cursor(cursor, user.id) if cursor else None
+    rows = await db_url_async.get_user_urls(
+        user_id=user.id, skip=skip, limit=limit, db=db, after_id=after_id
+    )
+    # Serialized straight from the selected columns; response_model only documents the shape
+    response = ORJSONResponse([row._asdict() for row in rows])
+    if len(rows) == limit:
+        response.headers["X-Next-Cursor"] = db_url.encode_cursor(user.id, rows[-1].id)
+    return response
+
+
+@router.put(
+    "/{short_url}",
+    response_model=UrlDisplay,
+    name="update_short_url",
+    summary="Update short URL details",
+    response_description="Updated URL details"
+)
+async def update_url(
+    url_data: UrlDataUpdate,
+    db: AsyncSession = Depends(get_async_db),
+    user: AuthenticatedUser = Depends(get_current_user_async)
+) -> UrlDisplay:
+    """
+    Update the destination or metadata of a short URL.
+    """
+    return await db_url_async.update_url(
+        short_url=url_data.short_url,
+        new_long_url=url_data.long_url,
+        new_description=url_data.description,
+        user_id=user.id,
+        db=db,
+        new_expires_at=url_data.given("expires_at", db_url.UNCHANGED),
+        new_max_clicks=url_data.given("max_clicks", db_url.UNCHANGED),
+        new_redirect_status=url_data.given("redirect_status", db_url.UNCHANGED)
+    )
+
+
+@router.delete(
+    "/{short_url}",
+    status_code=status.HTTP_200_OK,
+    name="delete_short_url",
+    summary="Delete a short URL",
+    response_description="Confirmation of deletion"
+)
+async def delete_url(
+    short_url: str,
+    db: AsyncSession = Depends(get_async_db),
+    user: AuthenticatedUser = Depends(get_current_user_async)
+) -> dict:
+    """
+    Permanently delete a short URL.
+    """
+    return await db_url_async.delete_url(short_url=short_url, user_id=user.id, db=db)
@@ -3,9 +3,8 @@ from typing import Optional
 from fastapi import APIRouter, Depends, status
 from sqlalchemy.orm import Session
 
-from app.schemas import UserDetails, UserDisplay
+from app.schemas import AuthenticatedUser, UserDetails, UserDisplay
 from app.database import get_db, db_user
-from app.database.models import DBUser
 from app.authentication.authentication import get_current_user
 
 router = APIRouter(
@@ -41,7 +40,7 @@ def create_new_user(
     response_description="The authenticated user's details"
 )
 def get_current_user_details(
-    user: DBUser = Depends(get_current_user)
+    user: AuthenticatedUser = Depends(get_current_user)
 ) -> UserDisplay:
     """
     Return the details of the currently authenticated user.
@@ -60,7 +59,7 @@ def update_user_details(
     email: Optional[str] = None,
     password: Optional[str] = None,
     db: Session = Depends(get_db),
-    user: DBUser = Depends(get_current_user)
+    user: AuthenticatedUser = Depends(get_current_user)
 ) -> UserDisplay:
     """
     Update the current user's email and/or password.
@@ -76,10 +75,12 @@ def update_user_details(
     response_description="Confirmation of deletion"
 )
 def delete_user_account(
-    user: DBUser = Depends(get_current_user),
+    user: AuthenticatedUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ) -> dict:
     """
     Permanently delete the current user's account.
+
+    Their short links stop resolving at once and are removed in the background.
     """
     return db_user.delete_user(user=user, db=db)
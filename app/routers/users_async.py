@@ -0,0 +1,86 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.schemas import AuthenticatedUser, UserDetails, UserDisplay
+from app.database import get_async_db, db_user_async
+from app.authentication.authentication import get_current_user_async
+
+router = APIRouter(
+    prefix="/users",
+    tags=["Users"]
+)
+
+
+@router.post(
+    "",
+    response_model=UserDisplay,
+    status_code=status.HTTP_201_CREATED,
+    name="create_user",
+    summary="Create a new user account",
+    response_description="The created user details"
+)
+async def create_new_user(
+    data: UserDetails,
+    db: AsyncSession = Depends(get_async_db)
+) -> UserDisplay:
+    """
+    Creates a new user with the provided username, email, and password.
+    """
+    return await db_user_async.create_user(db, data)
+
+
+@router.get(
+    "/me",
+    response_model=UserDisplay,
+    status_code=status.HTTP_200_OK,
+    name="get_current_user_details",
+    summary="Get current authenticated user details",
+    response_description="The authenticated user's details"
+)
+async def get_current_user_details(
+    user: AuthenticatedUser = Depends(get_current_user_async)
+) -> UserDisplay:
+    """
+    Return the details of the currently authenticated user.
+    """
+    return user
+
+
+@router.put(
+    "/me",
+    response_model=UserDisplay,
+    name="update_current_user",
+    summary="Update current user's details",
+    response_description="Updated user details"
+)
+async def update_user_details(
+    email: Optional[str] = None,
+    password: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+    user: AuthenticatedUser = Depends(get_current_user_async)
+) -> UserDisplay:
+    """
+    Update the current user's email and/or password.
+    """
+    return await db_user_async.update_user(user=user, email=email, password=password, db=db)
+
+
+@router.delete(
+    "/me",
+    status_code=status.HTTP_200_OK,
+    name="delete_current_user",
+    summary="Delete current user account",
+    response_description="Confirmation of deletion"
+)
+async def delete_user_account(
+    user: AuthenticatedUser = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
+) -> dict:
+    """
+    Permanently delete the current user's account.
+
+    Their short links stop resolving at once and are removed in the background.
+    """
+    return await db_user_async.delete_user(user=user, db=db)
@@ -1,5 +1,7 @@
-from pydantic import BaseModel, Field, EmailStr
-from typing import Optional
+from pydantic import BaseModel, Field, EmailStr, field_validator
+from enum import IntEnum
+from typing import Any, List, Optional
+from datetime import datetime, timezone
 
 
 # ------------------- User Schemas -------------------
@@ -20,22 +22,83 @@ class UserDisplay(BaseModel):
         from_attributes = True
 
 
+class AuthenticatedUser(BaseModel):
+    """
+    Snapshot of the token's user, cached between requests.
+    """
+    id: int
+    user_name: str
+    email: Optional[EmailStr] = None
+    token_version: int = 0
+
+    class Config:
+        from_attributes = True
+        frozen = True
+
+
 # ------------------- URL Schemas -------------------
 
+class RedirectStatus(IntEnum):
+    MOVED_PERMANENTLY = 301
+    FOUND = 302
+    TEMPORARY_REDIRECT = 307
+    PERMANENT_REDIRECT = 308
+
 class UrlData(BaseModel):
     long_url: str  # You can add extra validation with Pydantic's HttpUrl
     description: Optional[str] = Field(default=None, max_length=200)
+    expires_at: Optional[datetime] = None  # naive values are taken as UTC
+    max_clicks: Optional[int] = Field(default=None, ge=1)
+    redirect_status: Optional[RedirectStatus] = None  # None follows REDIRECT_STATUS
 
 class UrlDisplay(BaseModel):
     id: int
     short_url: str
     long_url: str
     description: Optional[str] = None
+    expires_at: Optional[datetime] = None
+    max_clicks: Optional[int] = None
+    redirect_status: Optional[int] = None
 
     class Config:
         from_attributes = True
 
+    @field_validator("expires_at")
+    @classmethod
+    def assume_utc(cls, value: Optional[datetime]) -> Optional[datetime]:
+        # SQLite hands back naive datetimes; they are stored as UTC
+        if value is not None and value.tzinfo is None:
+            return value.replace(tzinfo=timezone.utc)
+        return value
+
+class UrlDetails(UrlDisplay):
+    clicks: int = 0
+    last_accessed_at: Optional[datetime] = None
+
 class UrlDataUpdate(BaseModel):
     short_url: str
     long_url: Optional[str] = None
     description: Optional[str] = Field(default=None, max_length=200)
+    expires_at: Optional[datetime] = None  # left unchanged when omitted, removed when null
+    max_clicks: Optional[int] = Field(default=None, ge=1)
+    redirect_status: Optional[RedirectStatus] = None
+
+    def given(self, field: str, default: Any) -> Any:
+        """
+        The field's value if the request included it (an explicit null too), else `default`.
+        """
+        return getattr(self, field) if field in self.model_fields_set else default
+
+class BulkUrlResult(BaseModel):
+    index: int
+    status: str  # "created", "existing" (the user's link to the same destination) or "error"
+    id: Optional[int] = None
+    short_url: Optional[str] = None
+    long_url: Optional[str] = None
+    detail: Optional[str] = None
+
+class ImportSummary(BaseModel):
+    created: int = 0
+    existing: int = 0
+    failed: int = 0
+    errors: List[BulkUrlResult] = []  # first IMPORT_MAX_ERRORS failures only
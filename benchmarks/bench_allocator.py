@@ -0,0 +1,86 @@
+"""
+Short-code allocation throughput benchmark.
+
+    python -m benchmarks.bench_allocator --count 200000 --threads 1 4
+
+Prints one JSON document with codes/second per allocator and thread count.
+The counter allocator reserves its ID blocks from a throwaway SQLite file;
+the pool allocator claims from a pool filled there before timing starts.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine  # noqa: E402
+
+from app.database.models import Base  # noqa: E402
+from app.database.allocator import (  # noqa: E402
+    BlockCounterAllocator,
+    HashAllocator,
+    PooledAllocator,
+    SnowflakeAllocator,
+)
+
+
+def run(allocator, count: int, threads: int) -> dict:
+    per_thread = count // threads
+    codes = [[] for _ in range(threads)]
+
+    def work(bucket: list) -> None:
+        for i in range(per_thread):
+            bucket.append(allocator.allocate(f"https://example.com/{i}"))
+
+    workers = [threading.Thread(target=work, args=(codes[i],)) for i in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+
+    issued = [code for bucket in codes for code in bucket]
+    return {
+        "threads": threads,
+        "codes": len(issued),
+        "seconds": round(elapsed, 4),
+        "codes_per_second": round(len(issued) / elapsed, 1),
+        "duplicates": len(issued) - len(set(issued)),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--count", type=int, default=100_000)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--block-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    engine = create_engine(f"sqlite:///{os.path.join(workdir, 'allocator_bench.db')}")
+    Base.metadata.create_all(bind=engine)
+
+    results = []
+    for threads in args.threads:
+        allocators = {
+            "hash": HashAllocator(),
+            "counter": BlockCounterAllocator(engine=engine, block_size=args.block_size),
+            "snowflake": SnowflakeAllocator(worker_id=1),
+            "pool": PooledAllocator(
+                engine=engine, claim_batch=args.block_size, low_water=args.count, target=args.count
+            ),
+        }
+        allocators["pool"].refill()
+        for name, allocator in allocators.items():
+            results.append({"allocator": name, **run(allocator, args.count, threads)})
+
+    print(json.dumps({"benchmark": "allocator", "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+End-to-end HTTP benchmark for the ASGI app on a local SQLite database.
+
+    python -m benchmarks.bench_http --requests 2000 --concurrency 32 \
+        --output bench.json [--baseline previous.json --tolerance 0.15]
+
+Scenarios: redirect of hot and cold codes, create_short_url, list_urls and
+/auth/token. Results (p50/p95/p99 latency and throughput per scenario) are
+printed as JSON; with --baseline the run exits non-zero on a regression.
+"""
+import sys
+import json
+import asyncio
+import argparse
+import platform
+
+from benchmarks.common import compare, emit, prepare_environment, run_load
+
+SCENARIOS = ("redirect_hot", "redirect_cold", "create_short_url", "list_urls", "auth_token")
+
+
+async def main(args: argparse.Namespace) -> dict:
+    database = prepare_environment(args.database)
+
+    import httpx
+    from app.main import app
+    from app.database.cache import url_cache
+    from config import Config
+
+    prefix = Config.URL_PREFIX
+    transport = httpx.ASGITransport(app=app)
+    results = {
+        "benchmark": "http",
+        "meta": {
+            "python": platform.python_version(),
+            "database": database,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "async_engine": Config.DATABASE_ASYNC,
+        },
+        "scenarios": {},
+    }
+
+    async with app.router.lifespan_context(app), httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        credentials = {"username": "bench", "password": "bench-password"}
+        await client.post(f"{prefix}/users", json={
+            "user_name": credentials["username"],
+            "email": "bench@example.com",
+            "password": credentials["password"],
+        })
+        token = (await client.post(f"{prefix}/auth/token", data=credentials)).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+
+        # Seed one hot code and one cold code per redirect request
+        seeded = await client.post(
+            f"{prefix}/urls/bulk",
+            json=[{"long_url": f"https://example.com/{i}"} for i in range(args.requests + 1)],
+            headers=headers,
+        )
+        codes = [item["short_url"] for item in seeded.json()]
+        hot_code, cold_codes = codes[0], codes[1:]
+
+        async def redirect_hot(i: int) -> bool:
+            response = await client.get(f"{prefix}/urls/{hot_code}")
+            return response.status_code in (301, 302, 307, 308)
+
+        async def redirect_cold(i: int) -> bool:
+            response = await client.get(f"{prefix}/urls/{cold_codes[i]}")
+            return response.status_code in (301, 302, 307, 308)
+
+        async def create_short_url(i: int) -> bool:
+            response = await client.post(
+                f"{prefix}/urls/create_short_url",
+                params={"long_url": f"https://example.org/{i}", "description": "bench"},
+                headers=headers,
+            )
+            return response.status_code == 201
+
+        async def list_urls(i: int) -> bool:
+            response = await client.get(f"{prefix}/urls/", params={"limit": 100}, headers=headers)
+            return response.status_code == 200
+
+        async def auth_token(i: int) -> bool:
+            response = await client.post(f"{prefix}/auth/token", data=credentials)
+            return response.status_code == 200
+
+        handlers = {
+            "redirect_hot": redirect_hot,
+            "redirect_cold": redirect_cold,
+            "create_short_url": create_short_url,
+            "list_urls": list_urls,
+            "auth_token": auth_token,
+        }
+        for name in args.scenarios:
+            if name == "redirect_cold":
+                url_cache.clear()
+            total = args.auth_requests if name == "auth_token" else args.requests
+            results["scenarios"][name] = await run_load(handlers[name], total, args.concurrency)
+
+    return results
+
+
+def cli() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000, help="Requests per scenario")
+    parser.add_argument("--auth-requests", type=int, default=200, help="Requests for auth_token (bcrypt-bound)")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--database", help="SQLite file to use (default: fresh temp file)")
+    parser.add_argument("--output", help="Also write the JSON results to this file")
+    parser.add_argument("--baseline", help="JSON results of a previous run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Allowed regression fraction")
+    args = parser.parse_args()
+
+    results = asyncio.run(main(args))
+    if args.baseline:
+        with open(args.baseline) as fh:
+            regressions = compare(results, json.load(fh), args.tolerance)
+        results["regressions"] = regressions
+    emit(results, args.output)
+    if args.baseline and results["regressions"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    cli()
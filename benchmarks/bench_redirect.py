@@ -0,0 +1,120 @@
+"""
+Redirect benchmark: FastAPI route versus the raw ASGI fast path.
+
+    python -m benchmarks.bench_redirect --requests 5000 --concurrency 32 \
+        --output redirect.json [--baseline previous.json --tolerance 0.15]
+
+Runs hot (cached) and cold (cache cleared, one DB lookup each) redirects
+through the routed app and through RedirectFastPath wrapped around the same
+app, and prints p50/p95/p99 latency, throughput and the fast-path speedup.
+"""
+import os
+import sys
+import json
+import asyncio
+import argparse
+import platform
+
+from benchmarks.common import compare, emit, prepare_environment, run_load
+
+MODES = ("routed", "fast_path")
+
+
+async def main(args: argparse.Namespace) -> dict:
+    database = prepare_environment(args.database)
+    # The routed baseline must not already be wrapped by app.main
+    os.environ["REDIRECT_FAST_PATH"] = "false"
+
+    import httpx
+    from app.main import app
+    from app.fast_redirect import RedirectFastPath
+    from app.database.cache import url_cache
+    from config import Config
+
+    prefix = Config.URL_PREFIX
+    apps = {"routed": app, "fast_path": RedirectFastPath(app)}
+    results = {
+        "benchmark": "redirect",
+        "meta": {
+            "python": platform.python_version(),
+            "database": database,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "async_engine": Config.DATABASE_ASYNC,
+        },
+        "scenarios": {},
+    }
+
+    async with app.router.lifespan_context(app), httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://bench"
+    ) as client:
+        credentials = {"username": "bench", "password": "bench-password"}
+        await client.post(f"{prefix}/users", json={
+            "user_name": credentials["username"],
+            "email": "bench@example.com",
+            "password": credentials["password"],
+        })
+        token = (await client.post(f"{prefix}/auth/token", data=credentials)).json()["access_token"]
+        seeded = await client.post(
+            f"{prefix}/urls/bulk",
+            json=[{"long_url": f"https://example.com/{i}"} for i in range(len(MODES) * args.requests + 1)],
+            headers={"Authorization": f"Bearer {token}"},
+        )
+        codes = [item["short_url"] for item in seeded.json()]
+        hot_code = codes[0]
+
+        for offset, mode in enumerate(MODES):
+            # Each mode gets its own never-cached codes for the cold run
+            cold_codes = codes[1 + offset * args.requests:1 + (offset + 1) * args.requests]
+            async with httpx.AsyncClient(
+                transport=httpx.ASGITransport(app=apps[mode]), base_url="http://bench"
+            ) as mode_client:
+                async def redirect_hot(i: int) -> bool:
+                    response = await mode_client.get(f"{prefix}/urls/{hot_code}")
+                    return response.status_code in (301, 302, 307, 308)
+
+                async def redirect_cold(i: int) -> bool:
+                    response = await mode_client.get(f"{prefix}/urls/{cold_codes[i]}")
+                    return response.status_code in (301, 302, 307, 308)
+
+                await redirect_hot(0)
+                results["scenarios"][f"{mode}_hot"] = await run_load(
+                    redirect_hot, args.requests, args.concurrency
+                )
+                url_cache.clear()
+                results["scenarios"][f"{mode}_cold"] = await run_load(
+                    redirect_cold, args.requests, args.concurrency
+                )
+
+    scenarios = results["scenarios"]
+    throughput = {name: scenario["throughput_rps"] for name, scenario in scenarios.items()}
+    results["speedup"] = {
+        kind: round(throughput[f"fast_path_{kind}"] / throughput[f"routed_{kind}"], 2)
+        for kind in ("hot", "cold")
+        if throughput[f"routed_{kind}"]
+    }
+    return results
+
+
+def cli() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=5000, help="Requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--database", help="SQLite file to use (default: fresh temp file)")
+    parser.add_argument("--output", help="Also write the JSON results to this file")
+    parser.add_argument("--baseline", help="JSON results of a previous run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Allowed regression fraction")
+    args = parser.parse_args()
+
+    results = asyncio.run(main(args))
+    if args.baseline:
+        with open(args.baseline) as fh:
+            regressions = compare(results, json.load(fh), args.tolerance)
+        results["regressions"] = regressions
+    emit(results, args.output)
+    if args.baseline and results["regressions"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,106 @@
+"""
+Shared helpers for the HTTP benchmarks: app bootstrapping, load generation
+and latency statistics.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import tempfile
+from typing import Awaitable, Callable, Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def prepare_environment(database: Optional[str] = None) -> str:
+    """
+    Point the app at a throwaway SQLite file; must run before `app.main` is imported.
+    """
+    if database is None:
+        database = os.path.join(tempfile.mkdtemp(prefix="url-shortener-bench-"), "bench.db")
+    os.environ["DATABASE_PROTOCOL"] = "sqlite"
+    os.environ["DATABASE_NAME"] = database
+    # One in-process client would trip the per-client rate limits; measure the app itself
+    os.environ.setdefault("ADMISSION_CONTROL", "false")
+    return database
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> Dict[str, float]:
+    values = sorted(latencies)
+    count = len(values)
+    return {
+        "requests": count,
+        "errors": errors,
+        "seconds": round(elapsed, 4),
+        "throughput_rps": round(count / elapsed, 1) if elapsed else 0.0,
+        "mean_ms": round(sum(values) / count * 1000, 3) if count else 0.0,
+        "p50_ms": round(percentile(values, 50) * 1000, 3),
+        "p95_ms": round(percentile(values, 95) * 1000, 3),
+        "p99_ms": round(percentile(values, 99) * 1000, 3),
+    }
+
+
+async def run_load(
+    request: Callable[[int], Awaitable[bool]],
+    total: int,
+    concurrency: int,
+) -> Dict[str, float]:
+    """
+    Issue `total` calls of `request(i)` from `concurrency` concurrent workers.
+
+    `request` returns True when the response was the expected one.
+    """
+    latencies: List[float] = []
+    errors = 0
+    counter = iter(range(total))
+
+    async def worker() -> None:
+        nonlocal errors
+        for i in counter:
+            start = time.perf_counter()
+            ok = await request(i)
+            latencies.append(time.perf_counter() - start)
+            if not ok:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - start)
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> List[str]:
+    """
+    Return human-readable regressions of `results` against `baseline`.
+
+    A scenario regresses when its p95 grows or its throughput drops by more
+    than `tolerance` (a fraction, e.g. 0.10).
+    """
+    regressions = []
+    for name, current in results.get("scenarios", {}).items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if not previous:
+            continue
+        if previous["p95_ms"] and current["p95_ms"] > previous["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {previous['p95_ms']}ms -> {current['p95_ms']}ms")
+        if current["throughput_rps"] < previous["throughput_rps"] * (1 - tolerance):
+            regressions.append(
+                f"{name}: throughput {previous['throughput_rps']} -> {current['throughput_rps']} req/s"
+            )
+    return regressions
+
+
+def emit(results: dict, output: Optional[str]) -> None:
+    text = json.dumps(results, indent=2)
+    if output:
+        with open(output, "w") as fh:
+            fh.write(text + "\n")
+    print(text)
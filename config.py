@@ -28,6 +28,49 @@ class Config:
             f"{DB_PROTOCOL}://{DB_USER}:{encoded_password}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
         )
 
+    # Run the request path on an async engine (aiosqlite / asyncpg / aiomysql)
+    DATABASE_ASYNC = os.getenv("DATABASE_ASYNC", "false").lower() in ("1", "true", "yes")
+    ASYNC_DRIVERS = {
+        "sqlite": "sqlite+aiosqlite",
+        "postgresql": "postgresql+asyncpg",
+        "mysql": "mysql+aiomysql",
+    }
+    ASYNC_DB_PROTOCOL = os.getenv(
+        "DATABASE_ASYNC_PROTOCOL",
+        ASYNC_DRIVERS.get(DB_PROTOCOL.lower().split("+")[0], DB_PROTOCOL),
+    )
+    ASYNC_DATABASE_URL = ASYNC_DB_PROTOCOL + DATABASE_URL[DATABASE_URL.index("://"):]
+
+    # Optional read replicas (comma-separated DSNs, same dialect as the primary).
+    # Redirects, details, listings and exports read from them round-robin.
+    REPLICA_DATABASE_URLS = [
+        url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()
+    ]
+    # Optional URL shards (comma-separated DSNs): urls/url_stats rows live on
+    # the shard picked by a stable hash of the short code; users stay on the
+    # primary. Changing the list requires running app.database.rebalance.
+    SHARD_DATABASE_URLS = [
+        url.strip() for url in os.getenv("DATABASE_SHARD_URLS", "").split(",") if url.strip()
+    ]
+    # Seconds a client reads from the primary after its own write (0 = never).
+    # Tracked with a cookie, so clients that drop cookies (most Bearer API
+    # clients) are not covered; redirects of a code updated or deleted within
+    # this window are read from the primary for everyone.
+    READ_YOUR_WRITES_WINDOW = float(os.getenv("READ_YOUR_WRITES_WINDOW", 5))
+
+    # Connection pool (ignored for in-memory SQLite)
+    DB_POOL_SIZE = int(os.getenv("DATABASE_POOL_SIZE", 5))
+    DB_MAX_OVERFLOW = int(os.getenv("DATABASE_MAX_OVERFLOW", 10))
+    DB_POOL_TIMEOUT = float(os.getenv("DATABASE_POOL_TIMEOUT", 30))
+    DB_POOL_RECYCLE = int(os.getenv("DATABASE_POOL_RECYCLE", 1800))
+    DB_POOL_PRE_PING = os.getenv("DATABASE_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+
+    # SQLite performance mode: WAL journal, synchronous=NORMAL, mmap and page cache
+    SQLITE_PERFORMANCE_MODE = os.getenv("SQLITE_PERFORMANCE_MODE", "true").lower() in ("1", "true", "yes")
+    SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", 268435456))
+    SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", 65536))
+    SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", 5000))
+
     # ──────────────────────────────
     # 🔐 JWT CONFIGURATION
     # ──────────────────────────────
@@ -36,13 +79,149 @@ class Config:
     ALGORITHM = os.getenv("ALGORITHM", "HS256")
     ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
 
+    # bcrypt cost; hashes with a different cost are re-hashed on next login
+    BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
+    # Dedicated processes for bcrypt (0 = hash inline) and max queued jobs before 503
+    PASSWORD_POOL_WORKERS = int(os.getenv("PASSWORD_POOL_WORKERS", 2))
+    PASSWORD_POOL_MAX_PENDING = int(os.getenv("PASSWORD_POOL_MAX_PENDING", 32))
+
     # ──────────────────────────────
     # 🔗 URL SHORTENER SETTINGS
     # ──────────────────────────────
 
     SHORT_URL_LENGTH = 8
+    # "counter" (base62 over preallocated ID blocks), "pool", "snowflake" or "hash" (legacy)
+    SHORT_CODE_ALLOCATOR = os.getenv("SHORT_CODE_ALLOCATOR", "counter")
+    SHORT_CODE_BLOCK_SIZE = int(os.getenv("SHORT_CODE_BLOCK_SIZE", 1000))
+    SHORT_CODE_MAX_ATTEMPTS = int(os.getenv("SHORT_CODE_MAX_ATTEMPTS", 5))
+    # "pool" allocator: pre-verified random codes, refilled in the background below the low-water mark
+    SHORT_CODE_POOL_LOW_WATER = int(os.getenv("SHORT_CODE_POOL_LOW_WATER", 10000))
+    SHORT_CODE_POOL_TARGET = int(os.getenv("SHORT_CODE_POOL_TARGET", 50000))
+    SHORT_CODE_POOL_REFILL_INTERVAL = float(os.getenv("SHORT_CODE_POOL_REFILL_INTERVAL", 5))
+    SHORT_CODE_POOL_REFILL_BATCH = int(os.getenv("SHORT_CODE_POOL_REFILL_BATCH", 1000))
+    # Codes each worker claims at once into its local queue
+    SHORT_CODE_POOL_CLAIM_BATCH = int(os.getenv("SHORT_CODE_POOL_CLAIM_BATCH", 100))
+    # POST /urls/bulk: rows per INSERT transaction and max items per request
+    BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", 500))
+    BULK_MAX_ITEMS = int(os.getenv("BULK_MAX_ITEMS", 10000))
+    # Longest NDJSON line accepted by bulk/import; longer lines are reported as item errors
+    NDJSON_MAX_LINE_BYTES = int(os.getenv("NDJSON_MAX_LINE_BYTES", 65536))
+    # Streaming NDJSON export/import: rows per fetch and max errors reported by an import
+    EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", 1000))
+    IMPORT_MAX_ERRORS = int(os.getenv("IMPORT_MAX_ERRORS", 100))
+    # Must be unique per worker process when using the snowflake allocator
+    WORKER_ID = int(os.getenv("WORKER_ID", os.getpid() % 1024))
     VERSION = "1.0.0"
     URL_PREFIX = os.getenv("URL_PREFIX", "/api")
+    # Serve GET /urls/{code} from a raw ASGI layer in front of FastAPI
+    REDIRECT_FAST_PATH = os.getenv("REDIRECT_FAST_PATH", "true").lower() in ("1", "true", "yes")
+    # Status for links without their own: 301, 302, 307 or 308
+    REDIRECT_STATUS = int(os.getenv("REDIRECT_STATUS", 302))
+    # Cache-Control max-age of temporary (302/307) and permanent (301/308)
+    # redirects. Click-limited links are never cached and expiring ones only
+    # until they expire; redirects answered by a cache are not counted as clicks.
+    REDIRECT_MAX_AGE = int(os.getenv("REDIRECT_MAX_AGE", 60))
+    REDIRECT_PERMANENT_MAX_AGE = int(os.getenv("REDIRECT_PERMANENT_MAX_AGE", 86400))
+    # Seconds updated / deleted codes stay in the purge log polled by CDNs and proxies
+    PURGE_LOG_RETENTION = float(os.getenv("PURGE_LOG_RETENTION", 86400))
+    # Seconds a worker following the log keeps looking for an id skipped over
+    # because its transaction committed after a higher one (or rolled back)
+    PURGE_LOG_GAP_TIMEOUT = float(os.getenv("PURGE_LOG_GAP_TIMEOUT", 60))
+    # Shared secret pollers send as X-Purge-Token; GET /health/purges only exists when set
+    PURGE_LOG_TOKEN = os.getenv("PURGE_LOG_TOKEN", "")
+
+    # ──────────────────────────────
+    # ⚡ CACHE SETTINGS
+    # ──────────────────────────────
+
+    # Max short codes kept in the in-process redirect cache (0 disables it)
+    URL_CACHE_SIZE = int(os.getenv("URL_CACHE_SIZE", 10000))
+    URL_CACHE_TTL = float(os.getenv("URL_CACHE_TTL", 300))
+    # Shared tier behind the per-process redirect cache so workers warm and
+    # invalidate it together: "memory" (none), "redis" (needs the redis
+    # package) or "mmap" (a shared-memory table for workers on one host)
+    URL_CACHE_BACKEND = os.getenv("URL_CACHE_BACKEND", "memory").lower()
+    URL_CACHE_REDIS_URL = os.getenv("URL_CACHE_REDIS_URL", "redis://localhost:6379/0")
+    URL_CACHE_CHANNEL = os.getenv("URL_CACHE_CHANNEL", "url-cache-invalidate")
+    URL_CACHE_MMAP_PATH = os.getenv("URL_CACHE_MMAP_PATH", "/dev/shm/url_shortener_cache")
+    URL_CACHE_MMAP_SLOTS = int(os.getenv("URL_CACHE_MMAP_SLOTS", 65536))
+    URL_CACHE_MMAP_SLOT_SIZE = int(os.getenv("URL_CACHE_MMAP_SLOT_SIZE", 512))
+    # Without pub/sub (memory, mmap), seconds between reads of the purge log
+    # that drop other workers' updated codes from the local tier (0 = off)
+    URL_CACHE_PURGE_POLL_INTERVAL = float(os.getenv("URL_CACHE_PURGE_POLL_INTERVAL", 2))
+    # Authenticated-user cache; the TTL bounds how long another worker can
+    # keep accepting a token revoked by a password change or deletion
+    USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", 10000))
+    USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", 60))
+
+    # Bloom filter of existing short codes so unknown codes 404 without a query.
+    # New codes are logged to the purge log and picked up by the other workers
+    # every URL_CACHE_PURGE_POLL_INTERVAL seconds; until then (or until the next
+    # rebuild, with polling off) they may 404 there.
+    # Rebuilds only drop deleted codes, so they can be infrequent.
+    BLOOM_FILTER_ENABLED = os.getenv("BLOOM_FILTER_ENABLED", "true").lower() in ("1", "true", "yes")
+    BLOOM_FILTER_CAPACITY = int(os.getenv("BLOOM_FILTER_CAPACITY", 1000000))
+    BLOOM_FILTER_ERROR_RATE = float(os.getenv("BLOOM_FILTER_ERROR_RATE", 0.01))
+    BLOOM_FILTER_REBUILD_INTERVAL = float(os.getenv("BLOOM_FILTER_REBUILD_INTERVAL", 600))
+
+    # ──────────────────────────────
+    # 📈 CLICK ANALYTICS
+    # ──────────────────────────────
+
+    CLICK_TRACKING = os.getenv("CLICK_TRACKING", "true").lower() in ("1", "true", "yes")
+    # Seconds between batched flushes of buffered click counters
+    CLICK_FLUSH_INTERVAL = float(os.getenv("CLICK_FLUSH_INTERVAL", 5))
+
+    # Background deletion of expired / used-up links, in short batched transactions
+    URL_REAPER_ENABLED = os.getenv("URL_REAPER_ENABLED", "true").lower() in ("1", "true", "yes")
+    URL_REAPER_INTERVAL = float(os.getenv("URL_REAPER_INTERVAL", 60))
+    URL_REAPER_BATCH_SIZE = int(os.getenv("URL_REAPER_BATCH_SIZE", 500))
+    URL_REAPER_MAX_BATCHES = int(os.getenv("URL_REAPER_MAX_BATCHES", 20))
+    URL_REAPER_BATCH_PAUSE = float(os.getenv("URL_REAPER_BATCH_PAUSE", 0.05))
+
+    # Deleted accounts are soft-deleted at once; their URLs go in batches from a background job
+    ACCOUNT_PURGE_ENABLED = os.getenv("ACCOUNT_PURGE_ENABLED", "true").lower() in ("1", "true", "yes")
+    ACCOUNT_PURGE_INTERVAL = float(os.getenv("ACCOUNT_PURGE_INTERVAL", 10))
+    ACCOUNT_PURGE_BATCH_SIZE = int(os.getenv("ACCOUNT_PURGE_BATCH_SIZE", 1000))
+    ACCOUNT_PURGE_MAX_BATCHES = int(os.getenv("ACCOUNT_PURGE_MAX_BATCHES", 50))
+    ACCOUNT_PURGE_BATCH_PAUSE = float(os.getenv("ACCOUNT_PURGE_BATCH_PAUSE", 0.05))
+
+    # ──────────────────────────────
+    # 🚦 ADMISSION CONTROL
+    # ──────────────────────────────
+
+    ADMISSION_CONTROL = os.getenv("ADMISSION_CONTROL", "true").lower() in ("1", "true", "yes")
+    # Per-client token buckets by route class: refill per second and burst size (rate 0 disables)
+    RATE_LIMIT_AUTH_RATE = float(os.getenv("RATE_LIMIT_AUTH_RATE", 1))
+    RATE_LIMIT_AUTH_BURST = int(os.getenv("RATE_LIMIT_AUTH_BURST", 10))
+    RATE_LIMIT_WRITE_RATE = float(os.getenv("RATE_LIMIT_WRITE_RATE", 20))
+    RATE_LIMIT_WRITE_BURST = int(os.getenv("RATE_LIMIT_WRITE_BURST", 100))
+    RATE_LIMIT_READ_RATE = float(os.getenv("RATE_LIMIT_READ_RATE", 0))
+    RATE_LIMIT_READ_BURST = int(os.getenv("RATE_LIMIT_READ_BURST", 200))
+    # Requests in flight per route class in one worker before shedding with 503 (0 = unlimited)
+    CONCURRENCY_LIMIT_AUTH = int(os.getenv("CONCURRENCY_LIMIT_AUTH", 32))
+    CONCURRENCY_LIMIT_WRITE = int(os.getenv("CONCURRENCY_LIMIT_WRITE", 128))
+    CONCURRENCY_LIMIT_READ = int(os.getenv("CONCURRENCY_LIMIT_READ", 1024))
+    # Buckets kept per worker; the least recently seen clients are forgotten first
+    RATE_LIMIT_MAX_CLIENTS = int(os.getenv("RATE_LIMIT_MAX_CLIENTS", 100000))
+    # Key anonymous clients by the first X-Forwarded-For address; only behind a trusted proxy
+    RATE_LIMIT_TRUST_FORWARDED_FOR = (
+        os.getenv("RATE_LIMIT_TRUST_FORWARDED_FOR", "false").lower() in ("1", "true", "yes")
+    )
+
+    # ──────────────────────────────
+    # 📊 METRICS
+    # ──────────────────────────────
+
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+    METRICS_PATH = os.getenv("METRICS_PATH", "/metrics")
+
+    # Per-request SQL profiles (Server-Timing header + GET /debug/sql-profiles); for debugging only
+    SQL_PROFILING = os.getenv("SQL_PROFILING", "false").lower() in ("1", "true", "yes")
+    SQL_PROFILE_HISTORY = int(os.getenv("SQL_PROFILE_HISTORY", 200))
+    SQL_PROFILE_MAX_STATEMENTS = int(os.getenv("SQL_PROFILE_MAX_STATEMENTS", 100))
+    # Statements slower than this are logged with their bind shapes (0 disables)
+    SLOW_QUERY_THRESHOLD_MS = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", 250))
 
     # ──────────────────────────────
     # 🧪 TEST DATA (Optional)
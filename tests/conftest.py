@@ -0,0 +1,72 @@
+import os
+import shutil
+import tempfile
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine
+
+# Config is read when the app is imported, so the databases are chosen first:
+# a SQLite primary and two SQLite URL shards in a fresh directory
+DATA_DIR = tempfile.mkdtemp(prefix="url-shortener-tests-")
+os.environ.update({
+    "DATABASE_PROTOCOL": "sqlite",
+    "DATABASE_NAME": os.path.join(DATA_DIR, "primary.db"),
+    "DATABASE_SHARD_URLS": ",".join(f"sqlite:///{DATA_DIR}/shard{index}.db" for index in range(2)),
+    "DATABASE_ASYNC": "false",
+    "ADMISSION_CONTROL": "false",
+    "PURGE_LOG_TOKEN": "test-purge-token",
+})
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.main import app  # noqa: E402
+from app.database.bloom import ShortCodeFilter  # noqa: E402
+from app.database.cache import LRUCache, UrlCache  # noqa: E402
+from app.database.models import Base  # noqa: E402
+from app.database.purge import PurgeLog  # noqa: E402
+from helpers import sign_up  # noqa: E402
+
+
+def pytest_unconfigure(config):
+    shutil.rmtree(DATA_DIR, ignore_errors=True)
+
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture
+def auth_headers(client) -> dict:
+    """
+    Authorization header of a newly signed-up user, so each test sees only its own URLs.
+    """
+    return sign_up(client)
+
+
+@pytest.fixture
+def other_worker(client):
+    """
+    The per-process state of a second worker on the same databases, wired up as the app lifespan does.
+    """
+    purge_log = PurgeLog()
+    bloom = ShortCodeFilter(enabled=True)
+    cache = UrlCache(LRUCache(maxsize=100, ttl=60))
+    purge_log.subscribe(cache.drop_local)
+    purge_log.subscribe(bloom.on_purge)
+    purge_log.follow()
+    bloom.rebuild()
+    return SimpleNamespace(purge_log=purge_log, bloom=bloom, cache=cache)
+
+
+@pytest.fixture
+def scratch_engine(tmp_path):
+    """
+    An empty database with every table, for components tested apart from the app's databases.
+    """
+    engine = create_engine(f"sqlite:///{tmp_path}/purges.db")
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
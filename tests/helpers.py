@@ -0,0 +1,55 @@
+import itertools
+from datetime import datetime, timezone
+
+from sqlalchemy import insert, select
+
+from app.database import shard_engines
+from app.database.models import DBUrl, DBUrlPurge
+
+_user_numbers = itertools.count(1)
+
+
+def sign_up(client) -> dict:
+    """
+    Create a user with password "pw" and return the Authorization header of a fresh token.
+    """
+    user_name = f"user{next(_user_numbers)}"
+    client.post("/api/users", json={"user_name": user_name, "email": f"{user_name}@example.com", "password": "pw"})
+    token = client.post("/api/auth/token", data={"username": user_name, "password": "pw"}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+def create_urls(client, headers: dict, count: int, prefix: str = "https://example.com/") -> list:
+    """
+    Create `count` distinct URLs through POST /urls/bulk and return their results.
+    """
+    response = client.post(
+        "/api/urls/bulk", json=[{"long_url": f"{prefix}{index}"} for index in range(count)], headers=headers
+    )
+    assert response.status_code == 200
+    results = response.json()
+    assert [result["status"] for result in results] == ["created"] * count
+    return results
+
+
+def placement(codes: set) -> dict:
+    """
+    Shard id each of `codes` is actually stored on.
+    """
+    found = {}
+    for shard_id, engine in shard_engines.items():
+        with engine.connect() as conn:
+            for code in conn.execute(select(DBUrl.short_url).where(DBUrl.short_url.in_(codes))).scalars():
+                assert code not in found, f"{code} is stored on more than one shard"
+                found[code] = shard_id
+    return found
+
+
+def commit_purge(engine, entry_id: int, short_url: str, reason: str = "create") -> None:
+    """
+    Commit one purge log entry under a chosen id, as if some worker had just logged it.
+    """
+    with engine.begin() as conn:
+        conn.execute(insert(DBUrlPurge), [{
+            "id": entry_id, "short_url": short_url, "reason": reason, "created_at": datetime.now(timezone.utc),
+        }])
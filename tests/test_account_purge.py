@@ -0,0 +1,38 @@
+from app.database.account_purge import AccountPurger
+from helpers import create_urls, placement
+
+
+def test_deleted_accounts_stop_working_at_once(client, auth_headers):
+    code = create_urls(client, auth_headers, 1)[0]["short_url"]
+    assert client.delete("/api/users/me", headers=auth_headers).status_code == 200
+
+    assert client.get("/api/users/me", headers=auth_headers).status_code == 401
+    assert client.get(f"/api/urls/{code}", follow_redirects=False).status_code == 404
+    assert client.get(f"/api/urls/{code}/details").status_code == 404
+    # The rows themselves are left to the purger
+    assert code in placement({code})
+
+
+def test_purger_removes_urls_in_batches_then_the_user(client, auth_headers):
+    me = client.get("/api/users/me", headers=auth_headers).json()
+    codes = {result["short_url"] for result in create_urls(client, auth_headers, 7)}
+    client.delete("/api/users/me", headers=auth_headers)
+    pending = client.get("/api/health/account-purges").json()["pending"]
+    assert next(entry for entry in pending if entry["user_id"] == me["id"])["urls_remaining"] == 7
+
+    # At most four URLs go per run, so the account takes several
+    purger = AccountPurger(batch_size=2, max_batches=2, pause=0)
+    runs = 0
+    while runs == 0 or any(entry["user_id"] == me["id"] for entry in purger.progress()):
+        deleted_before = purger.urls_deleted
+        purger.run()
+        assert purger.urls_deleted - deleted_before <= 4
+        runs += 1
+    assert runs >= 2
+    assert placement(codes) == {}
+
+    # Name and email are free again
+    response = client.post(
+        "/api/users", json={"user_name": me["user_name"], "email": me["email"], "password": "pw"}
+    )
+    assert response.status_code == 201
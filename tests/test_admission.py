@@ -0,0 +1,141 @@
+import asyncio
+
+import pytest
+from jose import jwt
+
+from app.admission import AdmissionController, AdmissionMiddleware, RouteClass, TokenBuckets
+from app.authentication.authentication import create_access_token
+from config import Config
+
+
+def controller_with(**write_limits) -> AdmissionController:
+    """
+    A controller whose "write" class has the given rate, burst and concurrency.
+    """
+    controller = AdmissionController(prefix="/api", trust_forwarded_for=False)
+    controller.classes["write"] = RouteClass("write", **write_limits)
+    return controller
+
+
+async def ok_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def call(app, method: str = "POST", path: str = "/api/urls/bulk", client: str = "10.0.0.1") -> tuple:
+    """
+    Run one request through an ASGI app; returns (status, headers).
+    """
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {"type": "http", "method": method, "path": path, "headers": [], "client": (client, 40000)}
+    await app(scope, receive, send)
+    start = messages[0]
+    return start["status"], dict(start["headers"])
+
+
+def test_token_bucket_refills_at_its_rate():
+    buckets = TokenBuckets(rate=2, burst=2)
+    assert buckets.take("a", now=0.0) == 0
+    assert buckets.take("a", now=0.0) == 0
+    assert buckets.take("a", now=0.0) == pytest.approx(0.5)
+    assert buckets.take("b", now=0.0) == 0
+    assert buckets.take("a", now=0.5) == 0
+
+
+def test_token_bucket_forgets_least_recent_client():
+    buckets = TokenBuckets(rate=1, burst=1, max_clients=2)
+    for client in ("a", "b", "c"):
+        buckets.take(client, now=0.0)
+    assert len(buckets) == 2
+    assert buckets.take("a", now=0.0) == 0
+
+
+def test_client_over_its_rate_gets_429():
+    controller = controller_with(rate=1, burst=2, concurrency=0)
+    app = AdmissionMiddleware(ok_app, controller)
+
+    async def scenario():
+        return [await call(app) for _ in range(3)], await call(app, client="10.0.0.2")
+
+    (first, second, third), other_client = asyncio.run(scenario())
+    assert first[0] == second[0] == 200
+    assert third[0] == 429
+    assert third[1][b"retry-after"] == b"1"
+    assert other_client[0] == 200
+    assert controller.stats()["write_rate_limited"] == 1
+
+
+def test_unclassified_paths_are_never_limited():
+    controller = controller_with(rate=1, burst=1, concurrency=0)
+    app = AdmissionMiddleware(ok_app, controller)
+
+    async def scenario():
+        return [(await call(app, "GET", "/api/health/bloom"))[0] for _ in range(5)]
+
+    assert asyncio.run(scenario()) == [200] * 5
+
+
+def test_requests_over_the_concurrency_cap_are_shed_with_503():
+    controller = controller_with(rate=0, burst=1, concurrency=1)
+
+    async def scenario():
+        release = asyncio.Event()
+
+        async def slow_app(scope, receive, send):
+            await release.wait()
+            await ok_app(scope, receive, send)
+
+        app = AdmissionMiddleware(slow_app, controller)
+        in_flight = asyncio.create_task(call(app))
+        await asyncio.sleep(0)
+        shed = await call(app, client="10.0.0.2")
+        release.set()
+        return await in_flight, shed, await call(app)
+
+    in_flight, shed, after = asyncio.run(scenario())
+    assert shed[0] == 503
+    assert shed[1][b"retry-after"] == b"1"
+    assert in_flight[0] == after[0] == 200
+    stats = controller.stats()
+    assert stats["write_shed"] == 1
+    assert stats["write_in_flight"] == 0
+
+
+def test_routes_are_classified_by_method_and_path():
+    controller = AdmissionController(prefix="/api", trust_forwarded_for=False)
+    classes = {
+        ("POST", "/api/auth/token"): "auth",
+        ("POST", "/api/users"): "auth",
+        ("POST", "/api/urls/bulk"): "write",
+        ("DELETE", "/api/users/me"): "write",
+        ("GET", "/api/urls/abc"): "read",
+        ("OPTIONS", "/api/urls/abc"): None,
+        ("GET", "/api/health"): None,
+        ("GET", "/docs"): None,
+    }
+    for (method, path), name in classes.items():
+        route_class = controller.classify(method, path)
+        assert (route_class.name if route_class else None) == name, (method, path)
+
+
+def test_clients_are_keyed_by_verified_token_then_address():
+    token = create_access_token({"sub": "someone", "uid": 42})
+    forged = jwt.encode({"sub": "someone", "uid": 7}, "not-the-secret", algorithm=Config.ALGORITHM)
+
+    def scope(*headers) -> dict:
+        return {"headers": list(headers), "client": ("10.0.0.1", 40000)}
+
+    trusting = AdmissionController(prefix="/api", trust_forwarded_for=True)
+    direct = AdmissionController(prefix="/api", trust_forwarded_for=False)
+    assert direct.client_key(scope((b"authorization", f"Bearer {token}".encode()))) == "user:42"
+    assert direct.client_key(scope((b"authorization", f"Bearer {forged}".encode()))) == "ip:10.0.0.1"
+    forwarded = (b"x-forwarded-for", b"203.0.113.9, 10.0.0.1")
+    assert trusting.client_key(scope(forwarded)) == "ip:203.0.113.9"
+    assert direct.client_key(scope(forwarded)) == "ip:10.0.0.1"
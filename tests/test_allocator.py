@@ -0,0 +1,59 @@
+import pytest
+from sqlalchemy import select
+
+from app.database.allocator import (
+    BASE62_ALPHABET, BlockCounterAllocator, HashAllocator, SnowflakeAllocator, base62_encode, build_allocator,
+)
+from app.database.models import DBCodeSequence
+
+
+def test_base62_encode():
+    assert base62_encode(0) == "0"
+    assert base62_encode(61) == "z"
+    assert base62_encode(62) == "10"
+    assert base62_encode(62, width=4) == "0010"
+    with pytest.raises(ValueError):
+        base62_encode(-1)
+
+
+def test_block_counter_codes_are_unique_across_workers(scratch_engine):
+    workers = [BlockCounterAllocator(engine=scratch_engine, block_size=5, length=4) for _ in range(2)]
+    codes = [workers[index % 2].allocate("https://example.com/") for index in range(30)]
+
+    assert len(set(codes)) == 30
+    assert all(len(code) == 4 and set(code) <= set(BASE62_ALPHABET) for code in codes)
+    with scratch_engine.connect() as conn:
+        assert conn.execute(select(DBCodeSequence.next_value)).scalar_one() == 31
+
+
+def test_block_counter_reports_an_exhausted_space(scratch_engine):
+    counter = BlockCounterAllocator(engine=scratch_engine, block_size=100, length=1)
+    codes = {counter.allocate("https://example.com/") for _ in range(61)}
+    assert len(codes) == 61
+    with pytest.raises(RuntimeError):
+        counter.allocate("https://example.com/")
+
+
+def test_snowflake_ids_increase_and_carry_the_worker_id():
+    snowflake = SnowflakeAllocator(worker_id=7)
+    ids = [snowflake.next_id() for _ in range(5000)]
+    assert ids == sorted(set(ids))
+    assert all(value >> SnowflakeAllocator.SEQUENCE_BITS & 1023 == 7 for value in ids)
+    with pytest.raises(ValueError):
+        SnowflakeAllocator(worker_id=1024)
+
+
+def test_hash_codes_repeat_for_a_url_until_a_retry():
+    hashed = HashAllocator(length=7)
+    first = hashed.allocate("https://example.com/")
+    assert hashed.allocate("https://example.com/") == first
+    assert len(first) == 7
+    assert hashed.allocate("https://example.com/", attempt=1) != first
+
+
+def test_build_allocator_by_name():
+    assert isinstance(build_allocator("hash"), HashAllocator)
+    assert build_allocator("counter").blocking
+    assert not build_allocator("snowflake").blocking
+    with pytest.raises(ValueError):
+        build_allocator("uuid")
@@ -0,0 +1,41 @@
+from app.authentication.authentication import create_access_token
+from app.database.cache import user_cache
+
+
+def login(client, user_name: str, password: str) -> dict:
+    response = client.post("/api/auth/token", data={"username": user_name, "password": password})
+    assert response.status_code == 200
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def test_authenticated_users_are_cached_by_id(client, auth_headers):
+    me = client.get("/api/users/me", headers=auth_headers).json()
+    assert user_cache.get(me["id"]).user_name == me["user_name"]
+
+
+def test_password_change_revokes_earlier_tokens(client, auth_headers):
+    me = client.get("/api/users/me", headers=auth_headers).json()
+    assert client.put("/api/users/me", params={"password": "new-pw"}, headers=auth_headers).status_code == 200
+
+    assert client.get("/api/users/me", headers=auth_headers).status_code == 401
+    fresh = login(client, me["user_name"], "new-pw")
+    assert client.get("/api/users/me", headers=fresh).json()["id"] == me["id"]
+
+
+def test_email_change_keeps_tokens_valid(client, auth_headers):
+    response = client.put("/api/users/me", params={"email": "changed@example.com"}, headers=auth_headers)
+    assert response.status_code == 200
+    assert client.get("/api/users/me", headers=auth_headers).json()["email"] == "changed@example.com"
+
+
+def test_tokens_without_id_claims_still_work(client, auth_headers):
+    me = client.get("/api/users/me", headers=auth_headers).json()
+    legacy = {"Authorization": f"Bearer {create_access_token({'sub': me['user_name']})}"}
+    assert client.get("/api/users/me", headers=legacy).json()["id"] == me["id"]
+
+
+def test_invalid_tokens_are_rejected(client, auth_headers):
+    unsigned = auth_headers["Authorization"].rsplit(".", 1)[0]
+    tampered = {"Authorization": f"{unsigned}.c2lnbmF0dXJl"}
+    assert client.get("/api/users/me", headers=tampered).status_code == 401
+    assert client.get("/api/users/me").status_code == 401
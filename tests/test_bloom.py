@@ -0,0 +1,58 @@
+from app.database.bloom import BloomFilter, ShortCodeFilter, short_code_filter
+from app.database.purge import PurgeLog
+from helpers import commit_purge, create_urls
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    keys = [f"key{index}" for index in range(1000)]
+    for key in keys:
+        bloom.add(key)
+    count = bloom.count
+    bloom.add(keys[0])
+    assert bloom.count == count
+    assert all(key in bloom for key in keys)
+    assert sum(f"other{index}" in bloom for index in range(1000)) < 50
+
+
+def test_new_codes_reach_other_workers_bloom_filters(client, auth_headers, other_worker):
+    created = create_urls(client, auth_headers, 3)
+    single = client.post(
+        "/api/urls/create_short_url", params={"long_url": "https://example.com/bloom", "description": ""},
+        headers=auth_headers
+    ).json()
+    codes = [result["short_url"] for result in created] + [single["short_url"]]
+
+    # The creating worker knows at once; the other one only after following the log
+    assert all(short_code_filter.might_contain(code) for code in codes)
+    assert not any(other_worker.bloom.might_contain(code) for code in codes)
+    assert other_worker.purge_log.follow() >= len(codes)
+    assert all(other_worker.bloom.might_contain(code) for code in codes)
+
+
+def test_codes_committed_out_of_id_order_still_arrive(scratch_engine):
+    purge_log = PurgeLog(engine=scratch_engine)
+    bloom = ShortCodeFilter(engine=scratch_engine, enabled=True)
+    bloom.rebuild()
+    purge_log.subscribe(bloom.on_purge)
+    commit_purge(scratch_engine, 1, "first")
+    purge_log.follow()
+
+    # Id 2 was taken by a transaction that commits only after id 3 has been read
+    commit_purge(scratch_engine, 3, "third")
+    assert purge_log.follow() == 1
+    assert purge_log.stats()["gaps"] == 1
+    commit_purge(scratch_engine, 2, "second")
+    assert purge_log.follow() == 1
+    assert bloom.might_contain("second") and bloom.might_contain("third")
+    assert purge_log.stats()["gaps"] == 0
+
+
+def test_skipped_ids_are_given_up_after_the_gap_timeout(scratch_engine):
+    purge_log = PurgeLog(engine=scratch_engine, gap_timeout=0)
+    purge_log.follow()
+    commit_purge(scratch_engine, 5, "fifth")
+    assert purge_log.follow() == 1
+    assert purge_log.stats()["gaps"] == 4
+    assert purge_log.follow() == 0
+    assert purge_log.stats()["gaps"] == 0
@@ -0,0 +1,86 @@
+import asyncio
+
+from app.database.allocator import allocator
+from app.routers.ndjson import _iter_lines
+from config import Config
+from helpers import create_urls
+
+
+def list_urls(client, headers: dict) -> list:
+    return client.get("/api/urls/", params={"limit": 100}, headers=headers).json()
+
+
+def test_bulk_reports_invalid_items_in_place(client, auth_headers, monkeypatch):
+    monkeypatch.setattr(Config, "BULK_CHUNK_SIZE", 2)
+    response = client.post("/api/urls/bulk", json=[
+        {"long_url": "https://example.com/a"},
+        {"description": "no long_url"},
+        {"long_url": "https://example.com/b", "max_clicks": 0},
+        {"long_url": "https://example.com/c"},
+        {"long_url": "https://example.com/d"},
+    ], headers=auth_headers)
+
+    results = response.json()
+    assert [result["index"] for result in results] == [0, 1, 2, 3, 4]
+    assert [result["status"] for result in results] == ["created", "error", "error", "created", "created"]
+    assert results[1]["detail"].startswith("long_url:")
+    assert len(list_urls(client, auth_headers)) == 3
+    for result in (results[0], results[3], results[4]):
+        redirect = client.get(f"/api/urls/{result['short_url']}", follow_redirects=False)
+        assert redirect.headers["location"] == result["long_url"]
+
+
+def test_bulk_accepts_ndjson(client, auth_headers):
+    long_line = '{"long_url": "https://example.com/' + "x" * Config.NDJSON_MAX_LINE_BYTES + '"}'
+    body = "\n".join([
+        '{"long_url": "https://example.com/nd1"}', "", "not json", long_line, '{"long_url": "https://example.com/nd2"}'
+    ])
+    response = client.post(
+        "/api/urls/bulk", content=body, headers={**auth_headers, "Content-Type": "application/x-ndjson"}
+    )
+
+    results = response.json()
+    assert [result["status"] for result in results] == ["created", "error", "error", "created"]
+    assert results[1]["detail"].startswith("Invalid JSON")
+    assert results[2]["detail"] == f"Line is longer than {Config.NDJSON_MAX_LINE_BYTES} bytes."
+
+
+def test_bulk_over_the_item_limit_inserts_nothing(client, auth_headers, monkeypatch):
+    monkeypatch.setattr(Config, "BULK_MAX_ITEMS", 3)
+    monkeypatch.setattr(Config, "BULK_CHUNK_SIZE", 2)
+    items = [{"long_url": f"https://example.com/{index}"} for index in range(4)]
+    ndjson = "\n".join(f'{{"long_url": "{item["long_url"]}"}}' for item in items)
+
+    assert client.post("/api/urls/bulk", json=items, headers=auth_headers).status_code == 413
+    response = client.post(
+        "/api/urls/bulk", content=ndjson, headers={**auth_headers, "Content-Type": "application/x-ndjson"}
+    )
+    assert response.status_code == 413
+    assert list_urls(client, auth_headers) == []
+
+
+def test_bulk_rejects_a_body_that_is_not_an_array(client, auth_headers):
+    response = client.post("/api/urls/bulk", json={"long_url": "https://example.com/"}, headers=auth_headers)
+    assert response.status_code == 400
+
+
+def test_bulk_retries_a_chunk_that_hit_a_taken_code(client, auth_headers, monkeypatch):
+    taken = create_urls(client, auth_headers, 1)[0]["short_url"]
+    codes = iter([taken])
+    allocate = allocator.allocate
+    monkeypatch.setattr(allocator, "allocate", lambda long_url, attempt=0: next(codes, None) or allocate(long_url))
+
+    results = create_urls(client, auth_headers, 3, "https://example.com/retried/")
+    assert taken not in {result["short_url"] for result in results}
+    assert len(list_urls(client, auth_headers)) == 4
+
+
+def test_iter_lines_joins_pieces_and_drops_overlong_lines():
+    async def pieces():
+        for piece in (b'{"a"', b': 1}\n{"b": 2}\nxxxx', b"xxxxxx", b"xx\n", b"last"):
+            yield piece
+
+    async def collect():
+        return [line async for line in _iter_lines(pieces(), max_line_bytes=10)]
+
+    assert asyncio.run(collect()) == [b'{"a": 1}', b'{"b": 2}', None, b"last"]
@@ -0,0 +1,41 @@
+from app.database.cache import CachedUrl, LRUCache, url_cache
+from helpers import create_urls
+
+
+def test_lru_cache_evicts_the_least_recently_used_entry():
+    cache = LRUCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    assert cache.stats()["evictions"] == 1
+
+
+def test_lru_cache_entries_expire_after_the_ttl():
+    cache = LRUCache(maxsize=10, ttl=0)
+    cache.set("a", 1)
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
+    disabled = LRUCache(maxsize=0, ttl=60)
+    disabled.set("a", 1)
+    assert len(disabled) == 0
+
+
+def test_cached_url_claims_respect_limits():
+    limited = CachedUrl("https://example.com/", max_clicks=2)
+    assert [limited.claim() for _ in range(3)] == [True, True, False]
+    assert not CachedUrl("https://example.com/", expires_at=0).claim()
+    shared = CachedUrl.decode(CachedUrl("https://example.com/", status=308, user_id=5).encode())
+    assert (shared.long_url, shared.status, shared.user_id) == ("https://example.com/", 308, 5)
+
+
+def test_redirects_are_served_from_the_cache_until_changed(client, auth_headers):
+    code = create_urls(client, auth_headers, 1, "https://old.example/")[0]["short_url"]
+    assert client.get(f"/api/urls/{code}", follow_redirects=False).status_code == 302
+    assert url_cache.get(code).long_url == "https://old.example/0"
+
+    client.put(f"/api/urls/{code}", json={"short_url": code, "long_url": "https://new.example/"}, headers=auth_headers)
+    assert url_cache.get(code) is None
+    assert client.get(f"/api/urls/{code}", follow_redirects=False).headers["location"] == "https://new.example/"
@@ -0,0 +1,55 @@
+from sqlalchemy import create_engine, select
+
+from app.database.clicks import ClickBuffer, click_buffer
+from app.database.models import DBUrlStats
+from helpers import create_urls
+
+
+def stored_clicks(engine) -> dict:
+    with engine.connect() as conn:
+        return dict(conn.execute(select(DBUrlStats.short_url, DBUrlStats.clicks)).all())
+
+
+def test_clicks_are_buffered_then_added_to_stored_counts(scratch_engine):
+    buffer = ClickBuffer(engine=scratch_engine)
+    for short_url in ("a", "a", "a", "b"):
+        buffer.record(short_url)
+    assert buffer.pending("a")[0] == 3
+    assert stored_clicks(scratch_engine) == {}
+
+    assert buffer.flush() == 4
+    assert buffer.pending("a") == (0, None)
+    buffer.record("a")
+    assert buffer.flush() == 1
+    assert stored_clicks(scratch_engine) == {"a": 4, "b": 1}
+    assert buffer.flush() == 0
+
+
+def test_failed_flush_keeps_the_clicks(tmp_path):
+    # No url_stats table, so every flush fails
+    engine = create_engine(f"sqlite:///{tmp_path}/empty.db")
+    buffer = ClickBuffer(engine=engine)
+    buffer.record("a")
+    assert buffer.flush() == 0
+    buffer.record("a")
+    assert buffer.pending("a")[0] == 2
+    engine.dispose()
+
+
+def test_disabled_buffer_ignores_clicks(scratch_engine):
+    buffer = ClickBuffer(engine=scratch_engine, enabled=False)
+    buffer.record("a")
+    assert buffer.stats()["pending_clicks"] == 0
+
+
+def test_details_count_buffered_and_flushed_clicks(client, auth_headers):
+    code = create_urls(client, auth_headers, 1)[0]["short_url"]
+    for _ in range(2):
+        client.get(f"/api/urls/{code}", follow_redirects=False)
+    assert client.get(f"/api/urls/{code}/details").json()["clicks"] == 2
+
+    click_buffer.flush()
+    client.get(f"/api/urls/{code}", follow_redirects=False)
+    details = client.get(f"/api/urls/{code}/details").json()
+    assert details["clicks"] == 3
+    assert details["last_accessed_at"] is not None
@@ -0,0 +1,53 @@
+from sqlalchemy import func, insert, select
+
+from app.database.allocator import PooledAllocator
+from app.database.models import DBShortCode, DBUrl
+
+
+def pool_size(engine) -> int:
+    with engine.connect() as conn:
+        return conn.execute(select(func.count()).select_from(DBShortCode)).scalar_one()
+
+
+def test_refill_tops_the_pool_up_only_below_low_water(scratch_engine):
+    pool = PooledAllocator(engine=scratch_engine, low_water=5, target=20, refill_batch=8, claim_batch=4)
+    assert pool.refill() == 20
+    assert pool_size(scratch_engine) == 20
+    assert pool.refill() == 0
+
+    codes = [pool.allocate("https://example.com/") for _ in range(16)]
+    assert len(set(codes)) == 16
+    assert pool.stats()["claims"] == 4
+    assert pool_size(scratch_engine) == 4
+    assert pool.refill() == 16
+
+
+def test_workers_never_claim_the_same_code(scratch_engine):
+    workers = [PooledAllocator(engine=scratch_engine, low_water=1, target=30, claim_batch=5) for _ in range(3)]
+    workers[0].refill()
+    codes = [workers[index % 3].allocate("https://example.com/") for index in range(30)]
+    assert len(set(codes)) == 30
+
+
+def test_refill_skips_codes_already_in_use(scratch_engine, monkeypatch):
+    with scratch_engine.begin() as conn:
+        conn.execute(insert(DBUrl), [
+            {"id": 1, "long_url": "https://example.com/", "short_url": "taken", "user_id": 1}
+        ])
+    pool = PooledAllocator(engine=scratch_engine, low_water=1, target=3, refill_batch=3)
+    candidates = iter(["taken", "free1", "free2", "free3", "free4"])
+    monkeypatch.setattr(pool, "random_code", lambda: next(candidates))
+
+    assert pool.refill() == 3
+    assert pool.stats()["rejected"] == 1
+    with scratch_engine.connect() as conn:
+        assert set(conn.execute(select(DBShortCode.code)).scalars()) == {"free1", "free2", "free3"}
+
+
+def test_an_empty_pool_falls_back_to_random_codes(scratch_engine):
+    pool = PooledAllocator(engine=scratch_engine, length=6)
+    first, second = pool.allocate("https://example.com/"), pool.allocate("https://example.com/")
+    assert len(first) == len(second) == 6
+    # One claim found the pool dry; the second allocation did not ask again
+    assert pool.stats()["claims"] == 1
+    assert pool.stats()["fallbacks"] == 2
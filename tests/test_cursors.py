@@ -0,0 +1,44 @@
+import base64
+
+import pytest
+from fastapi import HTTPException
+
+from app.database.db_url import decode_cursor, encode_cursor
+from helpers import create_urls
+
+
+def test_cursor_round_trip_and_rejections():
+    cursor = encode_cursor(7, 1234)
+    assert decode_cursor(cursor, 7) == 1234
+    garbled = base64.urlsafe_b64encode(b"7:last").decode()
+    for bad_cursor, user_id in ((cursor, 8), ("not-a-cursor", 7), (garbled, 7)):
+        with pytest.raises(HTTPException) as exc_info:
+            decode_cursor(bad_cursor, user_id)
+        assert exc_info.value.status_code == 400
+
+
+def test_cursor_pages_stay_stable_when_earlier_rows_go(client, auth_headers):
+    created = create_urls(client, auth_headers, 6)
+    expected = sorted(result["id"] for result in created)
+
+    first = client.get("/api/urls/", params={"limit": 3}, headers=auth_headers)
+    assert [row["id"] for row in first.json()] == expected[:3]
+    cursor = first.headers["X-Next-Cursor"]
+    # Deleting a row already seen shifts OFFSET pages but not the keyset page
+    deleted = next(result["short_url"] for result in created if result["id"] == expected[0])
+    assert client.delete(f"/api/urls/{deleted}", headers=auth_headers).status_code == 200
+
+    second = client.get("/api/urls/", params={"limit": 3, "cursor": cursor, "skip": 50}, headers=auth_headers)
+    assert [row["id"] for row in second.json()] == expected[3:]
+    third = client.get(
+        "/api/urls/", params={"limit": 3, "cursor": second.headers["X-Next-Cursor"]}, headers=auth_headers
+    )
+    assert third.json() == []
+    assert "X-Next-Cursor" not in third.headers
+
+
+def test_cursor_of_another_user_is_rejected(client, auth_headers):
+    create_urls(client, auth_headers, 1)
+    cursor = encode_cursor(0, 0)
+    response = client.get("/api/urls/", params={"cursor": cursor}, headers=auth_headers)
+    assert response.status_code == 400
@@ -0,0 +1,65 @@
+from sqlalchemy import insert
+
+from app.database import shard_engines
+from app.database.models import DBUrl
+from app.database.normalize import long_url_hash, normalize_url
+from app.database.shards import SHARD_IDS, shard_for
+
+
+def create(client, headers: dict, long_url: str, **params) -> dict:
+    response = client.post(
+        "/api/urls/create_short_url", params={"long_url": long_url, "description": "", **params}, headers=headers
+    )
+    assert response.status_code == 201
+    return response.json()
+
+
+def test_normalize_url_ignores_cosmetic_differences():
+    assert normalize_url(" HTTPS://Example.COM:443/a/?b=2&a=1 ") == "https://example.com/a?a=1&b=2"
+    assert normalize_url("http://example.com") == "http://example.com/"
+    assert normalize_url("http://example.com:8080/") == "http://example.com:8080/"
+    assert normalize_url("not a url") == "not a url"
+
+
+def test_same_destination_returns_the_existing_link(client, auth_headers):
+    first = create(client, auth_headers, "https://Example.com:443/dedupe/?b=2&a=1")
+    again = create(client, auth_headers, "https://example.com/dedupe?a=1&b=2")
+    assert again["short_url"] == first["short_url"]
+    assert again["long_url"] == first["long_url"]
+
+    # Links with their own limits or status are always new
+    limited = create(client, auth_headers, "https://example.com/dedupe?a=1&b=2", redirect_status=301)
+    assert limited["short_url"] != first["short_url"]
+
+
+def test_bulk_reports_known_and_repeated_destinations(client, auth_headers):
+    first = create(client, auth_headers, "https://example.com/bulk-dedupe")
+    response = client.post("/api/urls/bulk", json=[
+        {"long_url": "https://EXAMPLE.com/bulk-dedupe/"},
+        {"long_url": "https://example.com/fresh"},
+        {"long_url": "https://example.com/fresh/"},
+    ], headers=auth_headers)
+    results = response.json()
+    assert [result["status"] for result in results] == ["existing", "created", "existing"]
+    assert results[0]["short_url"] == first["short_url"]
+    assert results[2]["short_url"] == results[1]["short_url"]
+
+
+def test_oldest_duplicate_wins_across_shards(client, auth_headers):
+    user_id = client.get("/api/users/me", headers=auth_headers).json()["id"]
+    long_url = "https://example.com/on-two-shards"
+    # The older row lives on the last shard, so a serial walk over the shards meets the newer one first
+    codes = {}
+    for index in range(1000):
+        codes.setdefault(shard_for(f"dup{index}"), f"dup{index}")
+    rows = [(SHARD_IDS[0], 10 ** 9 + 1), (SHARD_IDS[-1], 10 ** 9)]
+    for shard_id, url_id in rows:
+        with shard_engines[shard_id].begin() as conn:
+            conn.execute(insert(DBUrl), [{
+                "id": url_id, "long_url": long_url, "short_url": codes[shard_id], "description": "",
+                "user_id": user_id, "long_url_hash": long_url_hash(long_url),
+            }])
+
+    assert create(client, auth_headers, long_url)["id"] == 10 ** 9
+    bulk = client.post("/api/urls/bulk", json=[{"long_url": long_url}], headers=auth_headers).json()
+    assert bulk[0]["id"] == 10 ** 9
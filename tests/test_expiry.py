@@ -0,0 +1,82 @@
+from datetime import datetime, timedelta, timezone
+
+from app.database.clicks import click_buffer
+from app.database.reaper import UrlReaper
+from config import Config
+
+
+def create(client, headers: dict, long_url: str, **params) -> dict:
+    response = client.post(
+        "/api/urls/create_short_url", params={"long_url": long_url, "description": "", **params}, headers=headers
+    )
+    assert response.status_code == 201, response.text
+    return response.json()
+
+
+def redirect_status(client, code: str) -> int:
+    return client.get(f"/api/urls/{code}", follow_redirects=False).status_code
+
+
+def past() -> str:
+    return (datetime.now(timezone.utc) - timedelta(minutes=1)).isoformat()
+
+
+def test_expired_links_answer_410(client, auth_headers):
+    expired = create(client, auth_headers, "https://example.com/expired", expires_at=past())
+    future = (datetime.now(timezone.utc) + timedelta(days=1)).isoformat()
+    live = create(client, auth_headers, "https://example.com/live", expires_at=future)
+    assert redirect_status(client, expired["short_url"]) == 410
+    assert redirect_status(client, live["short_url"]) == 302
+
+
+def test_click_limited_links_stop_after_max_clicks(client, auth_headers):
+    code = create(client, auth_headers, "https://example.com/limited", max_clicks=2)["short_url"]
+    assert [redirect_status(client, code) for _ in range(3)] == [302, 302, 410]
+    assert client.get(f"/api/urls/{code}/details").json()["clicks"] == 2
+
+
+def test_updates_leave_omitted_limits_and_clear_null_ones(client, auth_headers):
+    code = create(client, auth_headers, "https://example.com/renewed", expires_at=past(), max_clicks=5)["short_url"]
+    assert redirect_status(client, code) == 410
+
+    response = client.put(
+        f"/api/urls/{code}", json={"short_url": code, "description": "still expired"}, headers=auth_headers
+    )
+    assert response.json()["max_clicks"] == 5
+    assert redirect_status(client, code) == 410
+
+    response = client.put(f"/api/urls/{code}", json={"short_url": code, "expires_at": None}, headers=auth_headers)
+    assert response.json()["expires_at"] is None
+    assert response.json()["max_clicks"] == 5
+    assert redirect_status(client, code) == 302
+
+
+def test_max_clicks_needs_click_tracking(client, auth_headers, monkeypatch):
+    monkeypatch.setattr(Config, "CLICK_TRACKING", False)
+    response = client.post(
+        "/api/urls/create_short_url",
+        params={"long_url": "https://example.com/untracked", "description": "", "max_clicks": 3},
+        headers=auth_headers,
+    )
+    assert response.status_code == 422
+    bulk = client.post(
+        "/api/urls/bulk", json=[{"long_url": "https://example.com/untracked", "max_clicks": 3}], headers=auth_headers
+    ).json()
+    assert bulk[0]["status"] == "error"
+
+
+def test_reaper_deletes_expired_and_used_up_links(client, auth_headers):
+    expired = create(client, auth_headers, "https://example.com/reaped", expires_at=past())["short_url"]
+    used_up = create(client, auth_headers, "https://example.com/used-up", max_clicks=1)["short_url"]
+    kept = create(client, auth_headers, "https://example.com/kept", max_clicks=5)["short_url"]
+    for code in (used_up, kept):
+        redirect_status(client, code)
+    click_buffer.flush()
+
+    reaper = UrlReaper(batch_size=1, pause=0)
+    assert reaper.run() >= 2
+    assert reaper.stats()["backlog"] == 0
+    for code in (expired, used_up):
+        assert client.get(f"/api/urls/{code}/details").status_code == 404
+        assert redirect_status(client, code) == 404
+    assert redirect_status(client, kept) == 302
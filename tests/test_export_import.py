@@ -0,0 +1,44 @@
+import json
+
+from config import Config
+from helpers import create_urls, sign_up
+
+NDJSON = {"Content-Type": "application/x-ndjson"}
+
+
+def test_export_streams_every_url_in_id_order(client, auth_headers):
+    created = create_urls(client, auth_headers, 7)
+    response = client.get("/api/urls/export", headers=auth_headers)
+
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["id"] for line in lines] == sorted(result["id"] for result in created)
+    assert {line["short_url"] for line in lines} == {result["short_url"] for result in created}
+
+
+def test_export_can_be_imported_by_another_user(client, auth_headers):
+    create_urls(client, auth_headers, 5)
+    exported = client.get("/api/urls/export", headers=auth_headers).text
+    other = sign_up(client)
+
+    summary = client.post("/api/urls/import", content=exported, headers={**other, **NDJSON}).json()
+    assert summary == {"created": 5, "existing": 0, "failed": 0, "errors": []}
+    again = client.post("/api/urls/import", content=exported, headers={**other, **NDJSON}).json()
+    assert again["existing"] == 5 and again["created"] == 0
+    long_urls = [json.loads(line)["long_url"] for line in exported.splitlines()]
+    listed = client.get("/api/urls/", params={"limit": 100}, headers=other).json()
+    assert [row["long_url"] for row in listed] == long_urls
+
+
+def test_import_counts_failures_and_keeps_the_first_errors(client, auth_headers, monkeypatch):
+    monkeypatch.setattr(Config, "IMPORT_MAX_ERRORS", 2)
+    body = "\n".join(['{"long_url": "https://example.com/ok"}', "{", "{", "{"])
+
+    summary = client.post("/api/urls/import", content=body, headers={**auth_headers, **NDJSON}).json()
+    assert (summary["created"], summary["failed"]) == (1, 3)
+    assert [error["index"] for error in summary["errors"]] == [1, 2]
+
+
+def test_import_accepts_only_ndjson(client, auth_headers):
+    response = client.post("/api/urls/import", json=[{"long_url": "https://example.com/"}], headers=auth_headers)
+    assert response.status_code == 415
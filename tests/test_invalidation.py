@@ -0,0 +1,57 @@
+from sqlalchemy import insert
+
+from app.database.bloom import ShortCodeFilter
+from app.database.cache import CachedUrl, LRUCache, UrlCache
+from app.database.models import DBUrl
+from app.database.purge import PurgeLog
+from helpers import commit_purge, create_urls
+
+
+def test_updates_and_deletes_drop_other_workers_cached_redirects(client, auth_headers, other_worker):
+    updated, deleted = (result["short_url"] for result in create_urls(client, auth_headers, 2, "https://old.example/"))
+    other_worker.purge_log.follow()
+    for code in (updated, deleted):
+        other_worker.cache.set(code, CachedUrl("https://old.example/"))
+
+    response = client.put(
+        f"/api/urls/{updated}", json={"short_url": updated, "long_url": "https://new.example/"}, headers=auth_headers
+    )
+    assert response.status_code == 200
+    assert client.delete(f"/api/urls/{deleted}", headers=auth_headers).status_code == 200
+    assert other_worker.cache.get(updated) is not None
+
+    other_worker.purge_log.follow()
+    assert other_worker.cache.get(updated) is None
+    assert other_worker.cache.get(deleted) is None
+    # A refill within the window must read the primary, not a lagging replica
+    assert other_worker.cache.recently_purged(updated)
+    assert client.get(f"/api/urls/{updated}", follow_redirects=False).headers["location"] == "https://new.example/"
+    assert client.get(f"/api/urls/{deleted}", follow_redirects=False).status_code == 404
+
+
+def test_a_follower_that_fell_behind_starts_over(scratch_engine):
+    purge_log = PurgeLog(engine=scratch_engine, retention=0)
+    cache = UrlCache(LRUCache(maxsize=100, ttl=60))
+    bloom = ShortCodeFilter(engine=scratch_engine, enabled=True)
+    purge_log.subscribe(cache.drop_local)
+    purge_log.subscribe(bloom.on_purge)
+    purge_log.subscribe_truncated(cache.local.clear)
+    purge_log.subscribe_truncated(bloom.rebuild)
+    purge_log.follow()
+    bloom.rebuild()
+    cache.set("unrelated", CachedUrl("https://old.example/"))
+
+    # A code created and another updated while this worker was not following, trimmed before it looks
+    with scratch_engine.begin() as conn:
+        conn.execute(insert(DBUrl), [
+            {"id": 1, "long_url": "https://example.com/", "short_url": "missed", "user_id": 1}
+        ])
+    commit_purge(scratch_engine, 1, "missed")
+    commit_purge(scratch_engine, 2, "changed", "update")
+    commit_purge(scratch_engine, 3, "newest", "update")
+    assert purge_log.trim() == 2
+
+    purge_log.follow()
+    assert purge_log.stats()["truncations"] == 1
+    assert cache.get("unrelated") is None
+    assert bloom.might_contain("missed")
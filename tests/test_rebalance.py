@@ -0,0 +1,56 @@
+from sqlalchemy import delete, insert, select
+
+from app.database import shard_engines
+from app.database.clicks import click_buffer
+from app.database.rebalance import rebalance
+from app.database.shards import SHARD_IDS, SHARDED_TABLES, shard_for
+from helpers import create_urls, placement
+
+
+def misplace(codes: list) -> None:
+    """
+    Move the rows of `codes` in every sharded table to a shard that does not own them.
+    """
+    for code in codes:
+        source_id = shard_for(code)
+        target_id = next(shard_id for shard_id in SHARD_IDS if shard_id != source_id)
+        for table in SHARDED_TABLES:
+            with shard_engines[source_id].begin() as conn:
+                rows = conn.execute(select(table).where(table.c.short_url == code)).mappings().all()
+                conn.execute(delete(table).where(table.c.short_url == code))
+            if rows:
+                with shard_engines[target_id].begin() as conn:
+                    conn.execute(insert(table), [dict(row) for row in rows])
+
+
+def moved_rows(summary: dict, table: str) -> int:
+    return sum(counts.get(table, 0) for source, counts in summary.items() if source != "url_ids")
+
+
+def test_rebalance_moves_misplaced_rows_once(client, auth_headers):
+    created = create_urls(client, auth_headers, 20)
+    codes = [result["short_url"] for result in created]
+    for code in codes[:5]:
+        client.get(f"/api/urls/{code}", follow_redirects=False)
+    click_buffer.flush()
+    misplace(codes)
+    assert all(shard_id != shard_for(code) for code, shard_id in placement(set(codes)).items())
+
+    dry_run = rebalance(batch_size=7, dry_run=True)
+    assert moved_rows(dry_run, "urls") == len(codes)
+    assert all(shard_id != shard_for(code) for code, shard_id in placement(set(codes)).items())
+
+    first = rebalance(batch_size=7)
+    assert moved_rows(first, "urls") == len(codes)
+    assert moved_rows(first, "url_stats") == 5
+    assert placement(set(codes)) == {code: shard_for(code) for code in codes}
+
+    second = rebalance(batch_size=7)
+    assert moved_rows(second, "urls") == 0
+    assert moved_rows(second, "url_stats") == 0
+    assert second["url_ids"]["next_value"] > max(result["id"] for result in created)
+
+    listed = client.get("/api/urls/", params={"limit": 100}, headers=auth_headers).json()
+    assert [row["id"] for row in listed] == sorted(result["id"] for result in created)
+    details = client.get(f"/api/urls/{codes[0]}/details").json()
+    assert details["clicks"] == 1
@@ -0,0 +1,74 @@
+from datetime import datetime, timedelta, timezone
+
+from app.database.purge import purge_log
+from config import Config
+
+PURGE_TOKEN = {"X-Purge-Token": "test-purge-token"}
+
+
+def create(client, headers: dict, long_url: str, **params) -> str:
+    response = client.post(
+        "/api/urls/create_short_url", params={"long_url": long_url, "description": "", **params}, headers=headers
+    )
+    assert response.status_code == 201, response.text
+    return response.json()["short_url"]
+
+
+def redirect(client, code: str):
+    return client.get(f"/api/urls/{code}", follow_redirects=False)
+
+
+def test_default_and_per_link_redirect_status(client, auth_headers, monkeypatch):
+    default = create(client, auth_headers, "https://example.com/default")
+    permanent = create(client, auth_headers, "https://example.com/permanent", redirect_status=308)
+
+    response = redirect(client, default)
+    assert response.status_code == Config.REDIRECT_STATUS == 302
+    assert response.headers["cache-control"] == f"public, max-age={Config.REDIRECT_MAX_AGE}"
+    response = redirect(client, permanent)
+    assert response.status_code == 308
+    assert response.headers["cache-control"] == f"public, max-age={Config.REDIRECT_PERMANENT_MAX_AGE}"
+
+    monkeypatch.setattr(Config, "REDIRECT_STATUS", 307)
+    assert redirect(client, default).status_code == 307
+    assert redirect(client, permanent).status_code == 308
+
+
+def test_limited_links_are_cached_no_longer_than_they_live(client, auth_headers):
+    expires_at = (datetime.now(timezone.utc) + timedelta(seconds=30)).isoformat()
+    expiring = create(client, auth_headers, "https://example.com/expiring", expires_at=expires_at)
+    limited = create(client, auth_headers, "https://example.com/click-limited", max_clicks=10)
+
+    max_age = int(redirect(client, expiring).headers["cache-control"].rpartition("=")[2])
+    assert 0 < max_age <= 30
+    assert redirect(client, limited).headers["cache-control"] == "no-store"
+
+
+def test_invalid_redirect_status_is_rejected(client, auth_headers):
+    response = client.post(
+        "/api/urls/create_short_url",
+        params={"long_url": "https://example.com/", "description": "", "redirect_status": 303},
+        headers=auth_headers,
+    )
+    assert response.status_code == 422
+
+
+def test_updates_and_deletes_are_listed_for_shared_caches(client, auth_headers):
+    updated = create(client, auth_headers, "https://example.com/purge-update")
+    deleted = create(client, auth_headers, "https://example.com/purge-delete")
+    start = purge_log.since(0, limit=10000)["next_after"]
+
+    client.put(f"/api/urls/{updated}", json={"short_url": updated, "description": "new"}, headers=auth_headers)
+    client.delete(f"/api/urls/{deleted}", headers=auth_headers)
+
+    page = client.get("/api/health/purges", params={"after": start}, headers=PURGE_TOKEN).json()
+    assert [(entry["short_url"], entry["reason"]) for entry in page["purges"]] == [
+        (updated, "update"), (deleted, "delete")
+    ]
+    assert page["next_after"] > start
+    assert not page["truncated"]
+
+
+def test_purge_log_needs_the_token(client):
+    assert client.get("/api/health/purges").status_code == 401
+    assert client.get("/api/health/purges", headers={"X-Purge-Token": "wrong"}).status_code == 401
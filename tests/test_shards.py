@@ -0,0 +1,61 @@
+from app.database.shards import SHARD_IDS, shard_for
+from helpers import create_urls, placement
+
+
+def test_shard_for_is_stable_and_uses_every_shard():
+    codes = [f"code{index}" for index in range(200)]
+    assert [shard_for(code) for code in codes] == [shard_for(code) for code in codes]
+    assert {shard_for(code) for code in codes} == set(SHARD_IDS)
+
+
+def test_urls_are_stored_on_the_shard_of_their_code(client, auth_headers):
+    created = create_urls(client, auth_headers, 40)
+    single = client.post(
+        "/api/urls/create_short_url", params={"long_url": "https://example.com/single", "description": ""},
+        headers=auth_headers
+    ).json()
+    codes = {result["short_url"] for result in created} | {single["short_url"]}
+
+    assert placement(codes) == {code: shard_for(code) for code in codes}
+    assert len(set(placement(codes).values())) == len(SHARD_IDS)
+    for code in codes:
+        assert client.get(f"/api/urls/{code}", follow_redirects=False).status_code == 302
+
+
+def test_listing_merges_shards_in_id_order(client, auth_headers):
+    created = create_urls(client, auth_headers, 23)
+    expected = sorted(result["id"] for result in created)
+
+    listed = client.get("/api/urls/", params={"limit": 100}, headers=auth_headers).json()
+    assert [row["id"] for row in listed] == expected
+    assert {shard_for(row["short_url"]) for row in listed} == set(SHARD_IDS)
+
+
+def test_cursor_paging_across_shards(client, auth_headers):
+    created = create_urls(client, auth_headers, 23)
+    expected = sorted(result["id"] for result in created)
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 5, **({"cursor": cursor} if cursor else {})}
+        response = client.get("/api/urls/", params=params, headers=auth_headers)
+        page = [row["id"] for row in response.json()]
+        seen.extend(page)
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+        assert len(page) == 5
+    assert seen == expected
+
+
+def test_offset_paging_across_shards(client, auth_headers):
+    created = create_urls(client, auth_headers, 12)
+    expected = sorted(result["id"] for result in created)
+
+    pages = [
+        [row["id"] for row in client.get(
+            "/api/urls/", params={"skip": skip, "limit": 5}, headers=auth_headers
+        ).json()]
+        for skip in (0, 5, 10)
+    ]
+    assert pages == [expected[0:5], expected[5:10], expected[10:12]]
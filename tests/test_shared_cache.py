@@ -0,0 +1,58 @@
+import time
+
+import pytest
+
+from app.database.cache import CachedUrl, LRUCache, UrlCache
+from app.database.shared_cache import MmapBackend
+
+
+def open_backend(tmp_path) -> MmapBackend:
+    """
+    Another worker's mapping of the same cache file.
+    """
+    return MmapBackend(path=str(tmp_path / "urls.cache"), slots=64, slot_size=256, ttl=60, tombstone_ttl=1)
+
+
+@pytest.fixture
+def mmap_backend(tmp_path):
+    backend = open_backend(tmp_path)
+    yield backend
+    backend.close()
+
+
+def test_mmap_entries_are_seen_through_every_mapping(mmap_backend, tmp_path):
+    other = open_backend(tmp_path)
+    try:
+        mmap_backend.set("abc", b"value")
+        assert other.get("abc") == b"value"
+        other.delete("abc")
+        assert mmap_backend.get("abc") is None
+    finally:
+        other.close()
+
+
+def test_mmap_set_after_delete_is_ignored_until_the_tombstone_expires(mmap_backend):
+    mmap_backend.set("abc", b"old")
+    mmap_backend.delete("abc")
+    # A refill that read the row before the change arrives after the invalidation
+    mmap_backend.set("abc", b"old")
+    assert mmap_backend.get("abc") is None
+    assert mmap_backend.stats()["tombstoned"] == 1
+
+    time.sleep(1.1)
+    mmap_backend.set("abc", b"new")
+    assert mmap_backend.get("abc") == b"new"
+
+
+def test_stale_refill_after_invalidation_does_not_reach_other_workers(mmap_backend, tmp_path):
+    writer = UrlCache(LRUCache(maxsize=10, ttl=60), mmap_backend)
+    other = UrlCache(LRUCache(maxsize=10, ttl=60), open_backend(tmp_path))
+    try:
+        stale = CachedUrl("https://old.example/")
+        writer.set("abc", stale)
+        writer.invalidate("abc")
+        other.set("abc", stale)
+        assert writer.get("abc") is None
+        assert other.get("abc") is None
+    finally:
+        other.close()